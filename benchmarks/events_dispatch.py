@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2026 agent <agent@local>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''Compare handler lookup in :py:class:`qubesadmin.events.EventsDispatcher`:
+fnmatch against every registered pattern (as done before the dispatch index)
+against the dispatch index.
+
+Run from the source tree::
+
+    PYTHONPATH=. python3 benchmarks/events_dispatch.py [--events 300000]
+'''
+
+import argparse
+import fnmatch
+import time
+import types
+
+import qubesadmin.events
+
+#: handler patterns, like those registered by qubes-manager and widgets
+PATTERNS = (
+    ['domain-start', 'domain-pre-start', 'domain-start-failed',
+     'domain-paused', 'domain-unpaused', 'domain-shutdown',
+     'domain-pre-shutdown', 'domain-shutdown-failed', 'domain-add',
+     'domain-delete', 'domain-spawn', 'domain-feature-set:updates-available',
+     'domain-feature-delete:updates-available', 'property-set:netvm',
+     'property-set:label', 'property-set:name', 'connection-established'] +
+    ['property-set:*', 'property-reset:*', 'property-del:*',
+     'domain-feature-set:*', 'domain-feature-delete:*',
+     'domain-tag-add:*', 'domain-tag-delete:*', 'device-attach:*',
+     'device-detach:*', 'device-assign:*', 'device-unassign:*',
+     'device-list-change:*', '*'] +
+    ['domain-*-failed', 'property-*:label', 'device-*:pci']
+)
+
+#: event names to dispatch, cycled through
+EVENT_NAMES = (
+    'domain-start', 'property-set:label', 'property-set:memory',
+    'domain-feature-set:gui', 'device-attach:pci', 'domain-stats',
+)
+
+
+def make_dispatcher():
+    '''Create dispatcher with a handler registered for each pattern'''
+    app = types.SimpleNamespace(cache_enabled=False)
+    dispatcher = qubesadmin.events.EventsDispatcher(app, enable_cache=False)
+    for pattern in PATTERNS:
+        dispatcher.add_handler(pattern, lambda *args, **kwargs: None)
+    return dispatcher
+
+
+def lookup_fnmatch(dispatcher, event):
+    '''Find handlers for *event* the way it was done before'''
+    return [h_func for h_name, h_func_set in dispatcher.handlers.items()
+            for h_func in h_func_set
+            if fnmatch.fnmatch(event, h_name)]
+
+
+def lookup_index(dispatcher, event):
+    '''Find handlers for *event* through the dispatch index'''
+    # pylint: disable=protected-access
+    return dispatcher._get_handlers(event)
+
+
+def measure(name, dispatcher, count, lookup):
+    '''Dispatch *count* events, print time and throughput'''
+    events = [EVENT_NAMES[n % len(EVENT_NAMES)] for n in range(count)]
+    start = time.perf_counter()
+    for event in events:
+        lookup(dispatcher, event)
+    elapsed = time.perf_counter() - start
+    print('{:<20} {:8.3f}s {:10.0f} events/s'.format(
+        name, elapsed, count / elapsed))
+
+
+def main(args=None):
+    '''Run the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=300000,
+        help='number of events to dispatch (default: %(default)s)')
+    args = parser.parse_args(args)
+    dispatcher = make_dispatcher()
+    assert len(dispatcher.handlers) == len(PATTERNS)
+    for event in EVENT_NAMES:
+        assert len(lookup_fnmatch(dispatcher, event)) == \
+            len(lookup_index(dispatcher, event))
+    print('{} patterns, {} events of {} distinct names'.format(
+        len(PATTERNS), args.events, len(EVENT_NAMES)))
+    measure('fnmatch', dispatcher, args.events, lookup_fnmatch)
+    measure('dispatch index', dispatcher, args.events, lookup_index)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# -*- encoding: utf-8 -*-
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2026 agent <agent@local>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''Compare events stream parsing throughput: per-field
+:py:meth:`asyncio.StreamReader.readuntil` (as used before
+:py:class:`qubesadmin.events.EventsParser`) against
+:py:class:`qubesadmin.events.EventsParser` fed with chunks.
+
+Run from the source tree::
+
+    PYTHONPATH=. python3 benchmarks/events_parser.py [--events 100000]
+'''
+
+import argparse
+import asyncio
+import time
+
+import qubesadmin.events
+
+#: sample events, like those sent by qubesd
+SAMPLE_EVENTS = (
+    b'1\0vm{n}\0property-set:label\0name\0label\0newvalue\0red\0'
+    b'oldvalue\0blue\0\0',
+    b'1\0vm{n}\0domain-start\0start_guid\0True\0\0',
+    b'1\0\0domain-add\0vm\0vm{n}\0\0',
+)
+
+
+def make_stream_data(count):
+    '''Build events stream with *count* events'''
+    return b''.join(
+        SAMPLE_EVENTS[n % len(SAMPLE_EVENTS)].replace(
+            b'{n}', str(n).encode())
+        for n in range(count))
+
+
+def make_reader(data, chunk_size):
+    '''Create :py:class:`asyncio.StreamReader` fed with *data* in chunks'''
+    reader = asyncio.StreamReader()
+    for offset in range(0, len(data), chunk_size):
+        reader.feed_data(data[offset:offset + chunk_size])
+    reader.feed_eof()
+    return reader
+
+
+async def parse_readuntil(reader):
+    '''Parse events reading each field with readuntil()'''
+    count = 0
+    while not reader.at_eof():
+        try:
+            await reader.readuntil(b'\0')
+            (await reader.readuntil(b'\0'))[:-1].decode('utf-8')
+            (await reader.readuntil(b'\0'))[:-1].decode('utf-8')
+            kwargs = {}
+            while True:
+                key = (await reader.readuntil(b'\0'))[:-1].decode('utf-8')
+                if not key:
+                    break
+                kwargs[key] = \
+                    (await reader.readuntil(b'\0'))[:-1].decode('utf-8')
+        except asyncio.IncompleteReadError:
+            break
+        count += 1
+    return count
+
+
+async def parse_chunks(reader, read_size):
+    '''Parse events with :py:class:`qubesadmin.events.EventsParser`'''
+    count = 0
+    parser = qubesadmin.events.EventsParser()
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            parser.feed_eof()
+            break
+        for _subject, _event, raw_kwargs in parser.feed(data):
+            parser.decode_kwargs(raw_kwargs)
+            count += 1
+    return count
+
+
+def measure(name, data, chunk_size, parse):
+    '''Run a single parser over *data*, print time and throughput'''
+    async def run():
+        reader = make_reader(data, chunk_size)
+        start = time.perf_counter()
+        count = await parse(reader)
+        return count, time.perf_counter() - start
+
+    count, elapsed = asyncio.run(run())
+    print('{:<20} {:8.3f}s {:10.0f} events/s'.format(
+        name, elapsed, count / elapsed))
+
+
+def main(args=None):
+    '''Run the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000,
+        help='number of events to parse (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=4096,
+        help='size of data chunks fed to the stream '
+             '(default: %(default)s)')
+    args = parser.parse_args(args)
+    data = make_stream_data(args.events)
+    measure('readuntil()', data, args.chunk_size, parse_readuntil)
+    measure('EventsParser', data, args.chunk_size,
+            lambda reader: parse_chunks(
+                reader, qubesadmin.events.EventsDispatcher.READ_SIZE))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- encoding: utf-8 -*-
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2026 agent <agent@local>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program; if not, see <http://www.gnu.org/licenses/>.
+
+'''Measure time and memory needed to create
+:py:class:`qubesadmin.vm.QubesVM` objects, as done when listing qubes.
+
+No Admin API calls are made, a stub app object is used. Memory is measured
+with :py:mod:`tracemalloc`. Each run uses new qube names, so per-qube objects
+kept by other modules (like loggers) are included. To get numbers for an
+older version, run the same script against its checkout::
+
+    git worktree add /tmp/qubesadmin-old <commit>
+    PYTHONPATH=/tmp/qubesadmin-old python3 benchmarks/vm_objects.py
+
+Run from the source tree::
+
+    PYTHONPATH=. python3 benchmarks/vm_objects.py [--runs 10] [1000 10000]
+'''
+
+import argparse
+import gc
+import itertools
+import time
+import tracemalloc
+import types
+
+import qubesadmin.vm
+
+#: counter making qube names unique across runs
+_run_ids = itertools.count()
+
+
+def create_vms(app, count):
+    '''Create *count* qube objects, return them with time it took'''
+    prefix = 'vm{}-'.format(next(_run_ids))
+    start = time.perf_counter()
+    vms = [qubesadmin.vm.QubesVM(app, prefix + str(n), klass='AppVM',
+                                 power_state='Halted')
+           for n in range(count)]
+    return vms, time.perf_counter() - start
+
+
+def measure(app, count, runs):
+    '''Create *count* qube objects *runs* times, print best time per qube
+    and memory per qube'''
+    best_time = None
+    best_memory = None
+    for _ in range(runs):
+        gc.collect()
+        _, elapsed = create_vms(app, count)
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        vms, _ = create_vms(app, count)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del vms
+        if best_memory is None or memory < best_memory:
+            best_memory = memory
+    print('{:>6} qubes: {:8.2f} us {:8.0f} B per qube'.format(
+        count, best_time / count * 1e6, best_memory / count))
+
+
+def main(args=None):
+    '''Run the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10,
+        help='number of runs for each size, the best one is reported '
+             '(default: %(default)s)')
+    parser.add_argument('sizes', type=int, nargs='*', default=[1000, 10000],
+        help='numbers of qubes to create (default: 1000 10000)')
+    args = parser.parse_args(args)
+    app = types.SimpleNamespace(cache_enabled=False)
+    for count in args.sizes:
+        measure(app, count, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,5 +30,7 @@ DEFAULT = qubesadmin.base.DEFAULT
 
 if os.path.exists('/etc/qubes-release'):
     Qubes = qubesadmin.app.QubesLocal
+    AsyncQubes = qubesadmin.app.AsyncQubesLocal
 else:
     Qubes = qubesadmin.app.QubesRemote
+    AsyncQubes = qubesadmin.app.AsyncQubesRemote
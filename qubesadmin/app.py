@@ -22,11 +22,14 @@
 """
 Main Qubes() class and related classes.
 """
+import asyncio
+import concurrent.futures
+import functools
 import grp
 import io
 import os
+import re
 import shlex
-import socket
 import shutil
 import subprocess
 import sys
@@ -39,6 +42,8 @@ from typing import IO, TypeVar
 from collections.abc import Generator, Iterable
 
 import qubesadmin.base
+import qubesadmin.connection
+import qubesadmin.devices
 import qubesadmin.exc
 import qubesadmin.label
 import qubesadmin.storage
@@ -61,17 +66,56 @@ except ImportError:
 # but can be extended
 DeviceClass = str
 
+#: single Admin API call for :py:meth:`QubesBase.qubesd_call_many`:
+#: (dest, method, arg, payload), trailing arguments can be omitted
+QubesdRequest: typing.TypeAlias = tuple
+#: batch of independent calls made by :py:meth:`QubesBase.prefetch`, with
+#: callbacks receiving successful responses
+PrefetchStep: typing.TypeAlias = tuple[
+    list[QubesdRequest], list[typing.Callable[[bytes], None]]]
+
+
+class VMListEntry(typing.NamedTuple):
+    """Single entry of admin.vm.List response"""
+    #: VM class
+    klass: Klass | None
+    #: power state, None if not known (or caching is disabled)
+    state: PowerState | None = None
+    #: VM UUID, if reported by qubesd
+    uuid: str | None = None
+
+
+#: placeholder for VMs missing in :py:attr:`VMCollection._vm_dict`
+_NO_VM_ENTRY = VMListEntry(None)
+
 
 class VMCollection:
     """Collection of VMs objects"""
 
     def __init__(self, app: "QubesBase"):
         self.app = app
-        # TODO we should properly document what's in / the
-        #  purpose of _vm_dict and _vm_objects
-        self._vm_dict: dict[str, dict[str, str]] = {}
+        #: cached admin.vm.List response: VM names and their basic info
+        self._vm_dict: dict[str, VMListEntry] = {}
+        #: VM objects already created, reused as long as the VM exists
         self._vm_objects: dict[str, QubesVM] = {}
         self._vm_dict_initialized: bool = False
+        #: generation of each VM name, see :py:meth:`generation`
+        self._generations: dict[str, int] = {}
+
+    def generation(self, name: str) -> int:
+        """Get generation of a VM name: a counter increased each time the
+        qube with that name is found to be removed, created or re-created.
+
+        Compare it with :py:attr:`qubesadmin.vm.QubesVM.generation` to check
+        whether a VM object (and anything cached for it) still refers to the
+        same qube.
+        """
+        return self._generations.get(name, 0)
+
+    def _forget(self, name: str) -> None:
+        """Drop cached object of a VM that was removed or re-created"""
+        self._generations[name] = self.generation(name) + 1
+        self._vm_objects.pop(name, None)
 
     def clear_cache(self, invalidate_name: str | None=None) -> None:
         """Clear cached list of VMs
@@ -81,44 +125,119 @@ class VMCollection:
         self._vm_dict_initialized = False
         self._vm_dict = {}
         if invalidate_name:
-            self._vm_objects.pop(invalidate_name, None)
+            self._forget(invalidate_name)
+
+    #: admin.vm.List response line in the format qubesd uses
+    _VM_LIST_RE = re.compile(
+        r"^([^ \n]+) class=([^ \n]*) state=([^ \n]*)(?: uuid=([^ \n]*))?$",
+        re.M)
+
+    def _parse_vm_list(self, vm_list_data: bytes) -> dict[str, VMListEntry]:
+        """Parse admin.vm.List response"""
+        text = vm_list_data.decode("ascii")
+        # if cache not enabled, drop power state
+        keep_state = self.app.cache_enabled
+        matches = self._VM_LIST_RE.findall(text)
+        lines = text.count("\n") + (not text.endswith("\n") and bool(text))
+        if len(matches) == lines:
+            return {
+                vm_name: VMListEntry(
+                    typing.cast(Klass, klass),
+                    typing.cast(PowerState, state) if keep_state else None,
+                    uuid or None)
+                for vm_name, klass, state, uuid in matches}
+        # other fields or a different order - parse each property
+        new_vm_dict = {}
+        for vm_data in text.splitlines():
+            vm_name, _, props = vm_data.partition(" ")
+            props_dict = dict(
+                vm_prop.split("=", 1) for vm_prop in props.split(" "))
+            new_vm_dict[vm_name] = VMListEntry(
+                typing.cast(Klass | None, props_dict.get("class")),
+                typing.cast(PowerState | None, props_dict.get("state"))
+                if keep_state else None,
+                props_dict.get("uuid"))
+        return new_vm_dict
 
     def refresh_cache(self, force: bool=False) -> None:
         """Refresh cached list of VMs"""
         if not force and self._vm_dict_initialized:
             return
         vm_list_data = self.app.qubesd_call("dom0", "admin.vm.List")
-        new_vm_dict = {}
-        # FIXME: this will probably change
-        for vm_data in vm_list_data.splitlines():
-            vm_name, props = vm_data.decode("ascii").split(" ", 1)
-            vm_name = str(vm_name)
-            props = props.split(" ")
-            new_vm_dict[vm_name] = dict(
-                [vm_prop.split("=", 1) for vm_prop in props]
-            )
-            # if cache not enabled, drop power state
-            if not self.app.cache_enabled:
-                try:
-                    del new_vm_dict[vm_name]["state"]
-                except KeyError:
-                    pass
+        self._store_vm_list(vm_list_data)
 
-        self._vm_dict = new_vm_dict
+    def _store_vm_list(self, vm_list_data: bytes) -> None:
+        """Replace cached list of VMs with admin.vm.List response, drop
+        objects of VMs that no longer exist"""
+        self._vm_dict = self._parse_vm_list(vm_list_data)
+        # pylint: disable=protected-access
         for name, vm in list(self._vm_objects.items()):
             if vm.name not in self._vm_dict:
                 # VM no longer exists
-                del self._vm_objects[name]
-            elif vm.klass != self._vm_dict[vm.name]["class"]:
+                self._forget(name)
+            elif vm._uuid is not None and \
+                    self._vm_dict[vm.name].uuid not in (None, vm._uuid):
+                # VM was removed and created again with the same name
+                self._forget(name)
+            elif vm.klass != self._vm_dict[vm.name].klass:
                 # VM class have changed
-                del self._vm_objects[name]
-            # TODO: some generation ID, to detect VM re-creation
+                self._forget(name)
             elif name != vm.name:
                 # renamed
                 self._vm_objects[vm.name] = vm
                 del self._vm_objects[name]
         self._vm_dict_initialized = True
 
+    def add_to_cache(self, name: str) -> None:
+        """Add a newly created VM to the cached list of VMs, without
+        listing all of them again. A cached object of a VM with the same
+        name is dropped, unless it has the same UUID.
+
+        This is used by :py:class:`qubesadmin.events.EventsDispatcher` on
+        `domain-add` event.
+        """
+        if not self._vm_dict_initialized:
+            self._forget(name)
+            return
+        try:
+            vm_list_data = self.app.qubesd_call(name, "admin.vm.List")
+            vm_data = self._parse_vm_list(vm_list_data)[name]
+        except (qubesadmin.exc.QubesVMNotFoundError,
+                qubesadmin.exc.QubesDaemonAccessError):
+            # already removed, or not visible to us
+            self._forget(name)
+            return
+        except (qubesadmin.exc.QubesException, KeyError, ValueError):
+            # can't tell what happened - list all VMs on the next access
+            self._forget(name)
+            self.clear_cache()
+            return
+        vm = self._vm_objects.get(name)
+        # pylint: disable=protected-access
+        if vm is None or vm._uuid is None or \
+                vm._uuid != vm_data.uuid:
+            self._forget(name)
+        self._vm_dict[name] = vm_data
+
+    def remove_from_cache(self, name: str) -> None:
+        """Remove a VM from the cached list of VMs, without listing all of
+        them again.
+
+        This is used by :py:class:`qubesadmin.events.EventsDispatcher` on
+        `domain-delete` event.
+        """
+        self._forget(name)
+        self._vm_dict.pop(name, None)
+
+    def rename_in_cache(self, old_name: str, new_name: str) -> None:
+        """Update the cached list of VMs after renaming a VM.
+
+        This is used by :py:class:`qubesadmin.events.EventsDispatcher` on
+        `property-set:name` event.
+        """
+        self.remove_from_cache(old_name)
+        self.add_to_cache(new_name)
+
     def __getitem__(self, item: str | QubesVM) -> QubesVM:
         if isinstance(item, QubesVM):
             item = item.name
@@ -137,13 +256,15 @@ class VMCollection:
             # enabled
             klass: Klass | None = None
             power_state: PowerState | None = None
+            uuid: str | None = None
             if item in self._vm_dict:
-                klass = typing.cast(Klass | None, self._vm_dict[item]["class"])
-                power_state = typing.cast(PowerState | None,
-                                          self._vm_dict[item].get("state"))
-            self._vm_objects[item] = QubesVM(
-                self.app, item, klass=klass, power_state=power_state
+                klass, power_state, uuid = self._vm_dict[item]
+            vm = QubesVM(
+                self.app, item, klass=klass, power_state=power_state,
+                uuid=uuid
             )
+            vm.generation = self.generation(item)
+            self._vm_objects[item] = vm
         return self._vm_objects[item]
 
     T = TypeVar("T")
@@ -214,6 +335,14 @@ class QubesBase(qubesadmin.base.PropertyHolder):
     blind_mode: bool = False
     #: cache retrieved properties values
     cache_enabled: bool = False
+    #: pool of qubesd connections, used by :py:class:`QubesLocal` if set
+    connection_pool: qubesadmin.connection.ConnectionPool | None = None
+    #: persistent Admin API channel, used by :py:class:`QubesRemote` if set
+    qrexec_channel: qubesadmin.connection.QrexecChannel | None = None
+    #: data that can be retrieved with :py:meth:`prefetch`
+    PREFETCH_ALL = frozenset({"properties", "features", "tags",
+                              "power_state", "current_state", "volumes",
+                              "devices"})
 
     def __init__(self) -> None:
         super().__init__(self, "admin.property.", "dom0")
@@ -226,6 +355,9 @@ class QubesBase(qubesadmin.base.PropertyHolder):
         )
         #: cache for available storage pool drivers and options to create them
         self._pool_drivers: dict[str, list[str]] | None = None
+        #: property types for each property methods prefix, see
+        #: :py:meth:`qubesadmin.base.PropertyHolder._property_schema`
+        self._property_schemas: dict[str, dict[str, bytes]] = {}
         self.log = logging.getLogger("app")
         self._local_name = None
 
@@ -678,6 +810,282 @@ class QubesBase(qubesadmin.base.PropertyHolder):
             "class: qubesadmin.Qubes()"
         )
 
+    async def qubesd_call_async(
+        self, dest: str | None, method: str, arg: str | None=None,
+            payload: bytes | None=None
+    ) -> bytes:
+        """
+        Execute Admin API method asynchronously.
+
+        This implementation runs :py:meth:`qubesd_call` in a separate thread.
+        Use :py:class:`AsyncQubesLocal` or :py:class:`AsyncQubesRemote` for
+        native asyncio implementation.
+
+        This is coroutine.
+
+        :param dest: Destination VM name
+        :param method: Full API method name ('admin...')
+        :param arg: Method argument (if any)
+        :param payload: Payload send to the method
+        :return: Data returned by qubesd (string)
+        """
+        return await asyncio.to_thread(
+            self.qubesd_call, dest, method, arg, payload
+        )
+
+    def qubesd_call_many(
+        self, requests: Iterable[QubesdRequest],
+            concurrency: int | None=None
+    ) -> list[bytes | Exception]:
+        """
+        Execute many independent Admin API methods at once.
+
+        Calls are issued concurrently, each one over its own connection (or
+        its own qrexec-client-vm process, when running in a VM), with at most
+        *concurrency* of them in flight at any time. There is no ordering
+        guarantee between the calls, so do not use it for calls depending on
+        each other.
+
+        >>> app.qubesd_call_many([
+        >>>     ('vm1', 'admin.vm.property.GetAll'),
+        >>>     ('vm2', 'admin.vm.property.GetAll'),
+        >>>     ('vm1', 'admin.vm.feature.Get', 'os'),
+        >>> ])
+
+        :param requests: list of (dest, method, arg, payload) tuples,
+            trailing elements can be omitted (default to None)
+        :param concurrency: maximum number of calls in flight,
+            :py:data:`qubesadmin.config.QUBESD_CALL_CONCURRENCY` if not given
+        :return: list of results in the same order as *requests* - data
+            returned by qubesd, or an exception instance if the call failed
+        """
+        requests = list(requests)
+        if concurrency is None:
+            concurrency = qubesadmin.config.QUBESD_CALL_CONCURRENCY
+
+        def call(request: QubesdRequest) -> bytes | Exception:
+            try:
+                return self.qubesd_call(*request)
+            except Exception as e:  # pylint: disable=broad-except
+                return e
+
+        if concurrency <= 1 or len(requests) <= 1:
+            return [call(request) for request in requests]
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(concurrency, len(requests))
+        ) as executor:
+            return list(executor.map(call, requests))
+
+    def prefetch(
+        self, domains: Iterable[QubesVM | str] | None=None,
+            what: Iterable[str] | None=None,
+            concurrency: int | None=None
+    ) -> None:
+        """
+        Retrieve state of many qubes at once and save it in the cache.
+
+        Instead of fetching data lazily, on the first access to each VM
+        attribute, issue all the needed Admin API calls upfront, concurrently
+        (see :py:meth:`qubesd_call_many`). This requires
+        :py:attr:`cache_enabled` to be set, otherwise this method does
+        nothing. Cached data is kept
+        up to date by :py:class:`qubesadmin.events.EventsDispatcher`, if one is
+        running, or used as a snapshot otherwise. Memory usage
+        (`current_state`) changes all the time, without events, so it
+        answers only the first read, later ones retrieve it again.
+
+        Failed calls are ignored - relevant data will be retrieved (and
+        errors reported) on access, as if it wasn't prefetched.
+
+        :param domains: qubes (objects or names) to fetch data of, all of
+            them if not given
+        :param what: data to fetch, a subset of :py:attr:`PREFETCH_ALL`;
+            everything if not given
+        :param concurrency: maximum number of calls in flight, see
+            :py:meth:`qubesd_call_many`
+        """
+        # pylint: disable=protected-access
+        if not self.cache_enabled:
+            return
+        what = self.PREFETCH_ALL if what is None else set(what)
+        unknown = set(what).difference(self.PREFETCH_ALL)
+        if unknown:
+            raise ValueError(
+                "Unknown data to prefetch: " + ", ".join(sorted(unknown)))
+        if "power_state" in what:
+            # admin.vm.List includes power state of all the qubes
+            self.domains.refresh_cache(force=True)
+        if domains is None:
+            vms = list(self.domains)
+        else:
+            vms = [self.domains[vm] for vm in domains]
+        devclasses = self.list_deviceclass() if "devices" in what else []
+        for requests, callbacks in self._prefetch_steps(vms, what, devclasses):
+            self._prefetch_run(requests, callbacks, concurrency)
+
+    def _prefetch_steps(
+        self, vms: list[QubesVM], what: Iterable[str],
+            devclasses: list[DeviceClass]
+    ) -> Generator[PrefetchStep, None, None]:
+        """Build batches of calls for :py:meth:`prefetch`.
+
+        Calls of a batch can be made only after callbacks of the previous
+        one were called.
+
+        :param vms: qubes to fetch data of
+        :param what: data to fetch, see :py:meth:`prefetch`
+        :param devclasses: device classes, if fetching devices
+        """
+        # pylint: disable=protected-access
+        requests: list[QubesdRequest] = []
+        callbacks: list[typing.Callable[[bytes], None]] = []
+
+        def add(request: QubesdRequest,
+                callback: typing.Callable[[bytes], None]) -> None:
+            requests.append(request)
+            callbacks.append(callback)
+
+        def store_volumes(vm: QubesVM, volumes_list: bytes) -> None:
+            vm._volumes = {
+                volname: qubesadmin.storage.Volume(
+                    self, vm=vm.name, vm_name=volname)
+                for volname in volumes_list.decode("ascii").splitlines()
+                if volname
+            }
+
+        def store_features_list(vm: QubesVM, features_list: bytes) -> None:
+            vm.features._values_cache = {}
+            vm.features._names_cache = \
+                features_list.decode("utf-8").splitlines()
+
+        def store_feature(vm: QubesVM, feature: str, value: bytes) -> None:
+            vm.features._values_cache[feature] = value.decode("utf-8")
+
+        def store_tags(vm: QubesVM, tags_list: bytes) -> None:
+            vm.tags._cache = set(tags_list.decode("utf-8").splitlines())
+
+        def store_power_state(vm: QubesVM, response: bytes) -> None:
+            vm._power_state_cache = typing.cast(
+                PowerState,
+                vm._parse_current_state(response)["power_state"])
+
+        def store_current_state(vm: QubesVM, response: bytes) -> None:
+            vm._current_state_cache = vm._parse_current_state(response)
+            if "power_state" in vm._current_state_cache:
+                vm._power_state_cache = typing.cast(
+                    PowerState, vm._current_state_cache["power_state"])
+
+        for vm in vms:
+            if "properties" in what:
+                add((vm.name, "admin.vm.property.GetAll"),
+                    functools.partial(self._store_prefetched_properties, vm))
+            if "features" in what:
+                add((vm.name, "admin.vm.feature.List"),
+                    functools.partial(store_features_list, vm))
+            if "tags" in what:
+                add((vm.name, "admin.vm.tag.List"),
+                    functools.partial(store_tags, vm))
+            if "power_state" in what:
+                state = self.domains._vm_dict.get(vm.name, _NO_VM_ENTRY).state
+                if state:
+                    vm._power_state_cache = typing.cast(PowerState, state)
+                else:
+                    add((vm.name, "admin.vm.CurrentState"),
+                        functools.partial(store_power_state, vm))
+            if "current_state" in what and \
+                    vm._power_state_cache != "Halted":
+                add((vm.name, "admin.vm.CurrentState"),
+                    functools.partial(store_current_state, vm))
+            if "volumes" in what:
+                add((vm.name, "admin.vm.volume.List"),
+                    functools.partial(store_volumes, vm))
+            for devclass in devclasses:
+                collection = vm.devices[devclass]
+                add((vm.name, f"admin.vm.device.{devclass}.Assigned"),
+                    functools.partial(
+                        self._store_prefetched_devices, collection,
+                        "_assignment_cache"))
+                add((vm.name, f"admin.vm.device.{devclass}.Attached"),
+                    functools.partial(
+                        self._store_prefetched_devices, collection,
+                        "_attachment_cache"))
+                if vm._power_state_cache != "Halted":
+                    add((vm.name, f"admin.vm.device.{devclass}.Available"),
+                        functools.partial(
+                            self._store_prefetched_devices, collection,
+                            "_dev_cache"))
+        yield requests, callbacks
+
+        # features values and volumes info can be retrieved only after
+        # listing them
+        requests = []
+        callbacks = []
+        if "features" in what:
+            for vm in vms:
+                for feature in vm.features._names_cache or []:
+                    add((vm.name, "admin.vm.feature.Get", feature),
+                        functools.partial(store_feature, vm, feature))
+        if "volumes" in what:
+            for vm in vms:
+                for volume in (vm._volumes or {}).values():
+                    add((vm.name, "admin.vm.volume.Info", volume.name),
+                        functools.partial(
+                            self._store_prefetched_volume, volume))
+        yield requests, callbacks
+
+    def _prefetch_run(self, requests: list[QubesdRequest],
+                      callbacks: list[typing.Callable[[bytes], None]],
+                      concurrency: int | None) -> None:
+        """Issue calls for :py:meth:`prefetch` and pass successful results
+        to the matching callbacks."""
+        if not requests:
+            return
+        results = self.qubesd_call_many(requests, concurrency=concurrency)
+        self._prefetch_store(requests, callbacks, results)
+
+    def _prefetch_store(self, requests: list[QubesdRequest],
+                        callbacks: list[typing.Callable[[bytes], None]],
+                        results: list[bytes | Exception]) -> None:
+        """Pass successful results of :py:meth:`prefetch` calls to the
+        matching callbacks."""
+        for request, callback, result in zip(requests, callbacks, results):
+            if isinstance(result, Exception):
+                self.log.debug("Failed to prefetch %s for %s: %s",
+                               request[1], request[0], result)
+                continue
+            callback(result)
+
+    @staticmethod
+    def _store_prefetched_properties(vm: QubesVM, properties: bytes) -> None:
+        """Save prefetched properties of a VM"""
+        # pylint: disable=protected-access
+        vm._properties_cache = {}
+        vm._store_all_properties(properties)
+
+    @staticmethod
+    def _store_prefetched_volume(volume: qubesadmin.storage.Volume,
+                                 info: bytes) -> None:
+        """Save prefetched volume info"""
+        # pylint: disable=protected-access
+        volume._store_info(info)
+        volume._info_prefetched = True
+
+    @staticmethod
+    def _store_prefetched_devices(
+            collection: qubesadmin.devices.DeviceCollection,
+            cache: str, response: bytes) -> None:
+        """Save prefetched devices list in the given cache of the device
+        collection"""
+        # pylint: disable=protected-access
+        if cache == "_dev_cache":
+            collection._dev_cache = {
+                dev.port_id: dev
+                for dev in collection._parse_exposed_devices(response)}
+            collection._dev_cache_complete = True
+        else:
+            setattr(collection, cache,
+                    collection._parse_assignments(response))
+
     def run_service(
         self,
         dest: str,
@@ -760,8 +1168,9 @@ class QubesBase(qubesadmin.base.PropertyHolder):
         directly, before calling other handlers.
 
         It handles both VM and global properties.
-        Note: even if the new value is given in the event arguments, it is
-        ignored because it comes without type information.
+        If the new value is given in the event arguments and the property
+        type is already known, the value is stored in the cache directly,
+        otherwise the cached value is dropped.
 
         :param subject: either VM object or None
         :param event: name of the event
@@ -774,8 +1183,13 @@ class QubesBase(qubesadmin.base.PropertyHolder):
         else:
             subject_or_self = subject
 
+        # pylint: disable=protected-access
+        if self.cache_enabled and event.startswith('property-set:') and \
+                'newvalue' in kwargs and \
+                subject_or_self._apply_property_value(name,
+                                                      kwargs['newvalue']):
+            return
         try:
-            # pylint: disable=protected-access
             del subject_or_self._properties_cache[name]
         except KeyError:
             pass
@@ -822,6 +1236,75 @@ class QubesBase(qubesadmin.base.PropertyHolder):
 
         # pylint: disable=protected-access
         subject._power_state_cache = power_state
+        subject._current_state_cache = None
+
+    def _update_features_cache(self, subject: QubesVM,
+                               event: str, **kwargs) -> None:
+        """Update cached VM features.
+
+        This method is designed to be hooked as an event handler for:
+        - domain-feature-set:*
+        - domain-feature-delete:*
+
+        This is done in :py:class:`qubesadmin.events.EventsDispatcher` class
+        directly, before calling other handlers.
+
+        :param subject: a VM object
+        :param event: name of the event
+        :param kwargs: other arguments
+        :return: none
+        """
+        # pylint: disable=protected-access
+        if not self.cache_enabled:
+            return
+        event_name, _, feature = event.partition(":")
+        if event_name == "domain-feature-set" and "value" in kwargs:
+            subject.features._cache_set(feature, kwargs["value"])
+        else:
+            subject.features._cache_delete(feature)
+            if event_name != "domain-feature-delete":
+                # new value unknown, but the feature is there
+                subject.features._names_cache = None
+
+    def _update_tags_cache(self, subject: QubesVM,
+                           event: str, **kwargs) -> None:
+        """Update cached VM tags.
+
+        This method is designed to be hooked as an event handler for:
+        - domain-tag-add:*
+        - domain-tag-delete:*
+
+        This is done in :py:class:`qubesadmin.events.EventsDispatcher` class
+        directly, before calling other handlers.
+
+        :param subject: a VM object
+        :param event: name of the event
+        :param kwargs: other arguments
+        :return: none
+        """  # pylint: disable=unused-argument
+        # pylint: disable=protected-access
+        if not self.cache_enabled:
+            return
+        event_name, _, tag = event.partition(":")
+        if event_name == "domain-tag-add":
+            subject.tags._cache_add(tag)
+        else:
+            subject.tags._cache_delete(tag)
+
+    @staticmethod
+    def _invalidate_volumes_cache(subject: QubesVM) -> None:
+        """Drop volumes info retrieved by :py:meth:`prefetch`.
+
+        Volume usage and state may change when a VM is started or stopped,
+        without any event for the volume itself. This is done in
+        :py:class:`qubesadmin.events.EventsDispatcher` class on VM power state
+        change.
+
+        :param subject: a VM object
+        """
+        # pylint: disable=protected-access
+        for volume in (subject._volumes or {}).values():
+            volume._info_prefetched = False
 
     def _invalidate_cache_all(self) -> None:
         """Invalidate all cached data
@@ -842,10 +1325,127 @@ class QubesBase(qubesadmin.base.PropertyHolder):
         for vm in self.domains._vm_objects.values():
             assert isinstance(vm, qubesadmin.vm.QubesVM)
             vm._power_state_cache = None
+            vm._current_state_cache = None
             vm._properties_cache = {}
-            vm.devices.clear_cache()
+            vm._clear_helpers_cache()
+            self._invalidate_volumes_cache(vm)
         self._properties_cache = {}
 
+    def _revalidate_cache_all(self) -> None:
+        """Revalidate all cached data
+
+        This method is designed to be hooked as an event handler
+        for 'connection-established', instead of
+        :py:meth:`_invalidate_cache_all`. This is done in
+        :py:class:`qubesadmin.events.EventsDispatcher` class directly, if
+        enabled there, in two steps (see :py:meth:`_mark_cache_stale` and
+        :py:meth:`_refetch_cache`), so that only the first one blocks
+        processing of events.
+
+        Events could be missed before this point, so cached data can't be
+        trusted. Instead of dropping it and re-fetching each piece on first
+        access, re-fetch the list of qubes with their power state (a single
+        call), drop objects of qubes that no longer exist and re-fetch in
+        bulk (see :py:meth:`prefetch`) only the data that was cached before.
+        Prefetched memory usage is dropped, not re-fetched.
+
+        :return: none
+        """
+        stale = self._mark_cache_stale()
+        if stale is not None:
+            self._refetch_cache(stale)
+
+    def _mark_cache_stale(
+            self) -> tuple[dict[str, list[QubesVM]], bool] | None:
+        """Invalidate all cached data, remembering what was cached
+
+        Until :py:meth:`_refetch_cache` is called with the returned value,
+        data is retrieved on access, as with :py:meth:`_invalidate_cache_all`.
+
+        :return: qubes with cached data, for each kind of data
+            (see :py:meth:`prefetch`) and whether global properties were
+            cached; None if cache is disabled
+        """
+        # pylint: disable=protected-access
+        if not self.cache_enabled:
+            self._invalidate_cache_all()
+            return None
+        cached: dict[str, list[QubesVM]] = {
+            "properties": [], "features": [], "tags": [], "devices": []}
+        for vm in self.domains._vm_objects.values():
+            # do not create helper objects (see QubesVM) just to check them
+            features = vm.__dict__.get("features")
+            tags = vm.__dict__.get("tags")
+            devices = vm.__dict__.get("devices", {})
+            if vm._properties_cache:
+                cached["properties"].append(vm)
+            if features is not None and (
+                    features._names_cache is not None or
+                    features._values_cache):
+                cached["features"].append(vm)
+            if tags is not None and tags._cache is not None:
+                cached["tags"].append(vm)
+            if any(collection._assignment_cache is not None or
+                   collection._attachment_cache is not None or
+                   collection._dev_cache
+                   for collection in devices.values()):
+                cached["devices"].append(vm)
+        app_properties_cached = bool(self._properties_cache)
+
+        self._invalidate_cache_all()
+        return cached, app_properties_cached
+
+    def _refetch_cache(
+            self, stale: tuple[dict[str, list[QubesVM]], bool]) -> None:
+        """Re-fetch data invalidated by :py:meth:`_mark_cache_stale`
+
+        :param stale: value returned by :py:meth:`_mark_cache_stale`
+        """
+        for requests, callbacks in self._refetch_cache_steps(stale):
+            self._prefetch_run(requests, callbacks, None)
+
+    def _refetch_cache_steps(
+            self, stale: tuple[dict[str, list[QubesVM]], bool]
+    ) -> Generator[PrefetchStep, None, None]:
+        """Build batches of calls for :py:meth:`_refetch_cache`, like
+        :py:meth:`_prefetch_steps`.
+
+        Only callbacks and building of the batches access cached data, so
+        calls can be made in another thread, as long as the rest is done
+        in the thread using this object.
+
+        :param stale: value returned by :py:meth:`_mark_cache_stale`
+        """
+        # pylint: disable=protected-access
+        cached, app_properties_cached = stale
+        vm_list: list[bytes] = []
+        yield [("dom0", "admin.vm.List")], [vm_list.append]
+        if not vm_list:
+            return
+        self.domains._store_vm_list(vm_list[0])
+        for vm in list(self.domains._vm_objects.values()):
+            state = self.domains._vm_dict.get(vm.name, _NO_VM_ENTRY).state
+            if state:
+                vm._power_state_cache = typing.cast(PowerState, state)
+        devclasses: list[DeviceClass] = []
+        if cached["devices"]:
+            devclasses_list: list[bytes] = []
+            yield [("dom0", "admin.deviceclass.List")], \
+                [devclasses_list.append]
+            if devclasses_list:
+                devclasses = sorted(devclasses_list[0].decode().splitlines())
+        for what, vms in cached.items():
+            # skip qubes removed (or re-created) in the meantime
+            vms = [vm for vm in vms
+                   if self.domains._vm_objects.get(vm.name) is vm]
+            if what == "devices" and not devclasses:
+                continue
+            if vms:
+                yield from self._prefetch_steps(vms, [what], devclasses)
+        if app_properties_cached:
+            yield [("dom0", self._method_prefix + "GetAll")], \
+                [self._store_all_properties]
+
 
 class QubesLocal(QubesBase):
     """Application object communicating through local socket.
@@ -902,23 +1502,17 @@ class QubesLocal(QubesBase):
             )
             return self._parse_qubesd_response(stdout)
 
-        try:
-            client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            client_socket.connect(qubesadmin.config.QUBESD_SOCKET)
-        except (IOError, OSError) as e:
-            raise qubesadmin.exc.QubesDaemonCommunicationError(
-                "Failed to connect to qubesd service: %s", str(e)
-            )
-
         call_header = "{}+{} dom0 name {}\0".format(method, arg or "", dest)
-        client_socket.sendall(call_header.encode("ascii"))
+        request = call_header.encode("ascii")
         if payload is not None:
-            client_socket.sendall(payload)
-
-        client_socket.shutdown(socket.SHUT_WR)
+            request += payload
 
-        return_data = client_socket.makefile("rb").read()
-        client_socket.close()
+        if self.connection_pool is not None:
+            return_data = self.connection_pool.call(request)
+        else:
+            return_data = qubesadmin.connection.socket_call(
+                qubesadmin.connection.connect_qubesd(), request
+            )
         return self._parse_qubesd_response(return_data)
 
     def run_service(
@@ -1038,6 +1632,54 @@ class QubesLocal(QubesBase):
         return proc
 
 
+class AsyncQubesLocal(QubesLocal):
+    """Application object communicating through local socket, with native
+    asyncio implementation of :py:meth:`qubesd_call_async`.
+
+    Asynchronous calls don't need a thread each, so it is suitable for
+    managing many qubes concurrently, for example using
+    :py:meth:`qubesadmin.vm.QubesVM.start_async`. It can share the event
+    loop with :py:class:`qubesadmin.events.EventsDispatcher`.
+
+    Used when running in dom0.
+    """
+
+    async def qubesd_call_async(
+        self, dest: str | None, method: str, arg: str | None=None,
+            payload: bytes | None=None
+    ) -> bytes:
+        """
+        Execute Admin API method asynchronously.
+
+        This is coroutine.
+
+        :param dest: Destination VM name
+        :param method: Full API method name ('admin...')
+        :param arg: Method argument (if any)
+        :param payload: Payload send to the method
+        :return: Data returned by qubesd (string)
+        """
+        try:
+            reader, writer = await asyncio.open_unix_connection(
+                qubesadmin.config.QUBESD_SOCKET
+            )
+        except (IOError, OSError) as e:
+            raise qubesadmin.exc.QubesDaemonCommunicationError(
+                "Failed to connect to qubesd service: %s", str(e)
+            )
+
+        call_header = "{}+{} dom0 name {}\0".format(method, arg or "", dest)
+        try:
+            writer.write(call_header.encode("ascii"))
+            if payload is not None:
+                writer.write(payload)
+            writer.write_eof()
+            return_data = await reader.read()
+        finally:
+            writer.close()
+        return self._parse_qubesd_response(return_data)
+
+
 class QubesRemote(QubesBase):
     """Application object communicating through qrexec services.
 
@@ -1069,6 +1711,12 @@ class QubesRemote(QubesBase):
         assert dest is not None
         if arg is not None:
             service_name += "+" + arg
+        if self.qrexec_channel is not None and not payload_stream:
+            return_data = self.qrexec_channel.call(dest, service_name, payload)
+            # None means the channel is not supported, fallback to a
+            # separate call
+            if return_data is not None:
+                return self._parse_qubesd_response(return_data)
         command = [qubesadmin.config.QREXEC_CLIENT_VM, dest, service_name]
         if payload_stream:
             (p, stdout, stderr) = self._call_with_stream(
@@ -1162,3 +1810,48 @@ class QubesRemote(QubesBase):
             **kwargs,
         )
         return proc
+
+
+class AsyncQubesRemote(QubesRemote):
+    """Application object communicating through qrexec services, with native
+    asyncio implementation of :py:meth:`qubesd_call_async`.
+
+    See :py:class:`AsyncQubesLocal` for details.
+
+    Used when running in VM.
+    """
+
+    async def qubesd_call_async(
+        self, dest: str | None, method: str, arg: str | None=None,
+            payload: bytes | None=None
+    ) -> bytes:
+        """
+        Execute Admin API method asynchronously.
+
+        This is coroutine.
+
+        :param dest: Destination VM name
+        :param method: Full API method name ('admin...')
+        :param arg: Method argument (if any)
+        :param payload: Payload send to the method
+        :return: Data returned by qubesd (string)
+        """
+        service_name = method
+        assert dest is not None
+        if arg is not None:
+            service_name += "+" + arg
+        proc = await asyncio.create_subprocess_exec(
+            qubesadmin.config.QREXEC_CLIENT_VM,
+            dest,
+            service_name,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate(payload)
+        if proc.returncode != 0:
+            raise qubesadmin.exc.QubesDaemonAccessError(
+                "Service call error: %s", stderr.decode()
+            )
+
+        return self._parse_qubesd_response(stdout)
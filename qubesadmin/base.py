@@ -21,9 +21,10 @@
 '''Base classes for managed objects'''
 from __future__ import annotations
 
+import re
 import typing
 from typing import BinaryIO, Any, TypeAlias, TypeVar, Generic
-from collections.abc import Generator
+from collections.abc import Callable, Generator
 
 import qubesadmin.exc
 
@@ -37,6 +38,30 @@ DEFAULT = object()
 # is too complex for type checkers otherwise
 VMProperty: TypeAlias = Any  # noqa: ANN401
 
+#: property value parsers, by `type=...` part of qubesd response: value
+#: returned for an empty value, and a function converting a non-empty one
+_PROPERTY_TYPES: dict[bytes, tuple[VMProperty,
+                                   Callable[[PropertyHolder, str],
+                                            VMProperty]]] = {
+    b'type=str': ('', lambda holder, value: value),
+    b'type=bool': (AttributeError, lambda holder, value: value == 'True'),
+    b'type=int': (AttributeError, lambda holder, value: int(value)),
+    b'type=vm': (None,
+                 lambda holder, value: holder.app.domains.get_blind(value)),
+    b'type=label': (None,
+                    lambda holder, value: holder.app.labels.get_blind(value)),
+}
+
+#: escaped character in (prefix).property.GetAll response
+_ESCAPE_RE = re.compile(rb'\\(.?)', re.S)
+
+
+def _unescape_char(match: re.Match) -> bytes:
+    """Decode a single escaped character, see :py:data:`_ESCAPE_RE`"""
+    char = match.group(1)
+    assert char in (b'n', b'\\')
+    return b'\n' if char == b'n' else char
+
 
 class PropertyHolder:
     '''A base class for object having properties retrievable using mgmt API.
@@ -83,6 +108,30 @@ class PropertyHolder:
         :param payload_stream: file-like object to read payload from
         :return: Data returned by qubesd (string)
         '''
+        # have the actual implementation at Qubes() instance
+        return self.app.qubesd_call(self._call_dest(dest), method, arg,
+            payload, payload_stream)
+
+    async def qubesd_call_async(self, dest: str | None, method: str,
+                                arg: str | None=None,
+                                payload: bytes | None=None) -> bytes:
+        '''
+        Call into qubesd asynchronously. Works like :py:meth:`qubesd_call`,
+        but without support for `payload_stream`.
+
+        This is coroutine.
+
+        :param dest: Destination VM name
+        :param method: Full API method name ('admin...')
+        :param arg: Method argument (if any)
+        :param payload: Payload send to the method
+        :return: Data returned by qubesd (string)
+        '''
+        return await self.app.qubesd_call_async(self._call_dest(dest),
+            method, arg, payload)
+
+    def _call_dest(self, dest: str | None) -> str:
+        '''Resolve destination of an API call made on this object'''
         dest: str = dest or self._method_dest
         if (
             getattr(self, "_redirect_dispvm_calls", False)
@@ -102,10 +151,7 @@ class PropertyHolder:
                         "required when target is @dispvm", self.app.local_name
                     )
                 dest = dest.name
-
-        # have the actual implementation at Qubes() instance
-        return self.app.qubesd_call(dest, method, arg, payload,
-            payload_stream)
+        return dest
 
     @staticmethod
     def _parse_qubesd_response(response_data: bytes) -> bytes:
@@ -198,7 +244,7 @@ class PropertyHolder:
         except (qubesadmin.exc.QubesDaemonAccessError,
                 qubesadmin.exc.QubesVMNotFoundError):
             raise qubesadmin.exc.QubesPropertyAccessError(item)
-        is_default, value = self._deserialize_property(property_str)
+        is_default, value = self._deserialize_property(property_str, item)
         if self.app.cache_enabled:
             self._properties_cache[item] = (is_default, value)
         return is_default
@@ -268,27 +314,150 @@ class PropertyHolder:
         except (qubesadmin.exc.QubesDaemonNoResponseError,
                 qubesadmin.exc.QubesVMNotFoundError):
             raise qubesadmin.exc.QubesPropertyAccessError(item)
-        is_default, value = self._deserialize_property(property_str)
+        is_default, value = self._deserialize_property(property_str, item)
         if self.app.cache_enabled:
             self._properties_cache[item] = (is_default, value)
         if value is AttributeError:
             raise AttributeError(item)
         return value
 
-    def _deserialize_property(self, api_response: bytes) \
+    async def property_get_async(self, item: str) -> VMProperty:
+        '''
+        Get property value asynchronously. Works like plain attribute
+        access, including use of the properties cache.
+
+        This is coroutine.
+
+        :param str item: name of property
+        :return: property value
+        '''
+        if item.startswith('_'):
+            raise AttributeError(item)
+        # pre-fill cache if enabled
+        if self.app.cache_enabled and not self._properties_cache:
+            await self._fetch_all_properties_async()
+        if item in self._properties_cache:
+            value = self._properties_cache[item][1]
+        else:
+            # cached properties list
+            if self._properties is not None and item not in self._properties:
+                raise AttributeError(item)
+            try:
+                property_str = await self.qubesd_call_async(
+                    self._method_dest,
+                    self._method_prefix + 'Get',
+                    item,
+                    None)
+            except (qubesadmin.exc.QubesDaemonNoResponseError,
+                    qubesadmin.exc.QubesVMNotFoundError):
+                raise qubesadmin.exc.QubesPropertyAccessError(item)
+            is_default, value = self._deserialize_property(property_str,
+                                                           item)
+            if self.app.cache_enabled:
+                self._properties_cache[item] = (is_default, value)
+        if value is AttributeError:
+            raise AttributeError(item)
+        return value
+
+    async def property_set_async(self, key: str, value: VMProperty) -> None:
+        '''
+        Set property value asynchronously. Works like plain attribute
+        assignment, use :py:obj:`qubesadmin.DEFAULT` to reset the property.
+
+        This is coroutine.
+
+        :param str key: name of property
+        :param value: new value
+        '''
+        if key.startswith('_') or key in self._local_properties():
+            raise AttributeError(key)
+        method, payload = self._property_set_call(value)
+        try:
+            await self.qubesd_call_async(
+                self._method_dest,
+                self._method_prefix + method,
+                key,
+                payload)
+        except (qubesadmin.exc.QubesDaemonNoResponseError,
+                qubesadmin.exc.QubesVMNotFoundError):
+            raise qubesadmin.exc.QubesPropertyAccessError(key)
+
+    @staticmethod
+    def _property_set_call(value: VMProperty) -> tuple[str, bytes | None]:
+        '''
+        Get API method suffix and payload for setting property to *value*.
+
+        :return: tuple(method suffix, payload)
+        '''
+        if value is qubesadmin.DEFAULT:
+            return 'Reset', None
+        # Dynamic import because qubesadmin.vm imports base.py
+        from qubesadmin.vm import QubesVM
+        if isinstance(value, QubesVM):
+            value = value.name
+        if value is None:
+            value = ''
+        return 'Set', str(value).encode('utf-8')
+
+    def _deserialize_property(self, api_response: bytes,
+                              name: str | None=None) \
             -> tuple[bool, VMProperty]:
         """
         Deserialize property.Get response format
         :param api_response: bytes, as retrieved from qubesd
+        :param name: property name, if given its type is saved in
+            :py:meth:`_property_schema`
         :return: tuple(is_default, value)
         """
         (default, prop_type, value) = api_response.split(b' ', 2)
         assert default.startswith(b'default=')
-        is_default_str = default.split(b'=')[1]
-        is_default = is_default_str.decode('ascii') == "True"
+        is_default = default == b'default=True'
         value = self._parse_type_value(prop_type, value)
+        if name is not None:
+            self._property_schema()[name] = prop_type
         return is_default, value
 
+    def _property_schema(self) -> dict[str, bytes]:
+        """
+        Get known property types (as `type=...` part of qubesd response),
+        shared by all objects using the same Admin API methods. Types are
+        saved whenever a property value is retrieved.
+
+        :return: dict of property name -> type
+        """
+        # pylint: disable=protected-access
+        return self.app._property_schemas.setdefault(self._method_prefix, {})
+
+    def _apply_property_value(self, name: str, value: str) -> bool:
+        """
+        Update cached property value with *value* from a `property-set:*`
+        event. Nothing is done if no property value is cached.
+
+        Event arguments are plain strings, without type information, so the
+        property type needs to be known already (see
+        :py:meth:`_property_schema`). Values that can't be parsed
+        unambiguously (empty ones and `None`, as qubesd sends None this way)
+        are not applied.
+
+        :param name: property name
+        :param value: new value, as sent in the event
+        :return: True if the value was applied
+        """
+        if not self._properties_cache:
+            # not retrieved yet, keep it for GetAll
+            return False
+        prop_type = self._property_schema().get(name)
+        if prop_type is None or value in ('', 'None'):
+            return False
+        if prop_type == b'type=bool' and value not in ('True', 'False'):
+            return False
+        try:
+            parsed = self._parse_type_value(prop_type, value.encode())
+        except (ValueError, qubesadmin.exc.QubesDaemonCommunicationError):
+            return False
+        self._properties_cache[name] = (False, parsed)
+        return True
+
     def _parse_type_value(self, prop_type: bytes, value: bytes) -> VMProperty:
         '''
         Parse `type=... ...` qubesd response format. Return a value of
@@ -302,33 +471,19 @@ class PropertyHolder:
         :param bytes value: 'value' part of the response
         :return: parsed value
         '''
-        # pylint: disable=too-many-return-statements
-        prop_type: str = prop_type.decode('ascii')
-        if not prop_type.startswith('type='):
+        try:
+            empty_value, parse = _PROPERTY_TYPES[prop_type]
+        except KeyError:
+            prop_type_str = prop_type.decode('ascii')
+            if not prop_type_str.startswith('type='):
+                raise qubesadmin.exc.QubesDaemonCommunicationError(
+                    'Invalid type prefix received: {}'.format(prop_type_str))
             raise qubesadmin.exc.QubesDaemonCommunicationError(
-                'Invalid type prefix received: {}'.format(prop_type))
-        (_, prop_type) = prop_type.split('=', 1)
-        value: str = value.decode()
-        if prop_type == 'str':
-            return str(value)
-        if prop_type == 'bool':
-            if value == '':
-                return AttributeError
-            return value == "True"
-        if prop_type == 'int':
-            if value == '':
-                return AttributeError
-            return int(value)
-        if prop_type == 'vm':
-            if value == '':
-                return None
-            return self.app.domains.get_blind(value)
-        if prop_type == 'label':
-            if value == '':
-                return None
-            return self.app.labels.get_blind(value)
-        raise qubesadmin.exc.QubesDaemonCommunicationError(
-            'Received invalid value type: {}'.format(prop_type))
+                'Received invalid value type: {}'.format(
+                    prop_type_str.split('=', 1)[1]))
+        if not value:
+            return empty_value
+        return parse(self, value.decode())
 
     def _fetch_all_properties(self) -> None:
         """
@@ -339,39 +494,52 @@ class PropertyHolder:
 
         :return: None
         """
+        try:
+            properties_str = self.qubesd_call(
+                self._method_dest,
+                self._method_prefix + 'GetAll',
+                None,
+                None)
+        except qubesadmin.exc.QubesDaemonNoResponseError:
+            return
+        self._store_all_properties(properties_str)
 
-        def unescape(line: bytes) -> Generator[int]:
-            """Handle \\-escaped values, generates a list of character codes"""
-            escaped = False
-            for char in line:
-                if escaped:
-                    assert char in (ord('n'), ord('\\'))
-                    if char == ord('n'):
-                        yield ord('\n')
-                    elif char == ord('\\'):
-                        yield char
-                    escaped = False
-                elif char == ord('\\'):
-                    escaped = True
-                else:
-                    yield char
-            assert not escaped
+    async def _fetch_all_properties_async(self) -> None:
+        """
+        Asynchronous version of :py:meth:`_fetch_all_properties`.
 
+        :return: None
+        """
         try:
-            properties_str = self.qubesd_call(
+            properties_str = await self.qubesd_call_async(
                 self._method_dest,
                 self._method_prefix + 'GetAll',
                 None,
                 None)
         except qubesadmin.exc.QubesDaemonNoResponseError:
             return
+        self._store_all_properties(properties_str)
+
+    def _store_all_properties(self, properties_str: bytes) -> None:
+        """
+        Parse (prefix).property.GetAll response and save retrieved values in
+        the properties cache.
+
+        :param properties_str: response data, as retrieved from qubesd
+        :return: None
+        """
+        schema = self._property_schema()
         for line in properties_str.splitlines():
             # decode newlines
-            line_bytes = bytes(list(unescape(line)))
-            name, property_str = line_bytes.split(b' ', 1)
-            name = name.decode()
-            is_default, value = self._deserialize_property(property_str)
-            self._properties_cache[name] = (is_default, value)
+            if b'\\' in line:
+                line = _ESCAPE_RE.sub(_unescape_char, line)
+            name_bytes, default, prop_type, value = line.split(b' ', 3)
+            assert default.startswith(b'default=')
+            name = name_bytes.decode()
+            schema[name] = prop_type
+            self._properties_cache[name] = (
+                default == b'default=True',
+                self._parse_type_value(prop_type, value))
         self._properties = list(self._properties_cache.keys())
 
     @classmethod
@@ -395,32 +563,16 @@ class PropertyHolder:
     def __setattr__(self, key: str, value: typing.Any) -> None:  # noqa: ANN401
         if key.startswith('_') or key in self._local_properties():
             return super().__setattr__(key, value)
-        if value is qubesadmin.DEFAULT:
-            try:
-                self.qubesd_call(
-                    self._method_dest,
-                    self._method_prefix + 'Reset',
-                    key,
-                    None)
-            except (qubesadmin.exc.QubesDaemonNoResponseError,
-                    qubesadmin.exc.QubesVMNotFoundError):
-                raise qubesadmin.exc.QubesPropertyAccessError(key)
-        else:
-            # Dynamic import because qubesadmin.vm imports base.py
-            from qubesadmin.vm import QubesVM
-            if isinstance(value, QubesVM):
-                value = value.name
-            if value is None:
-                value = ''
-            try:
-                self.qubesd_call(
-                    self._method_dest,
-                    self._method_prefix + 'Set',
-                    key,
-                    str(value).encode('utf-8'))
-            except (qubesadmin.exc.QubesDaemonNoResponseError,
-                    qubesadmin.exc.QubesVMNotFoundError):
-                raise qubesadmin.exc.QubesPropertyAccessError(key)
+        method, payload = self._property_set_call(value)
+        try:
+            self.qubesd_call(
+                self._method_dest,
+                self._method_prefix + method,
+                key,
+                payload)
+        except (qubesadmin.exc.QubesDaemonNoResponseError,
+                qubesadmin.exc.QubesVMNotFoundError):
+            raise qubesadmin.exc.QubesPropertyAccessError(key)
 
     def __delattr__(self, name: str) -> None:
         if name.startswith('_') or name in self._local_properties():
@@ -24,8 +24,20 @@
 QUBESD_SOCKET = '/var/run/qubesd.sock'
 QREXEC_CLIENT = '/usr/lib/qubes/qrexec-client'
 QREXEC_CLIENT_VM = '/usr/bin/qrexec-client-vm'
+#: initial delay before reconnecting events connection (in seconds), doubled
+#: after each attempt that did not receive any event
 QUBESD_RECONNECT_DELAY = 1.0
+#: maximum delay before reconnecting events connection (in seconds)
+QUBESD_RECONNECT_MAX_DELAY = 60.0
+#: default number of idle connections kept by
+#: :py:class:`qubesadmin.connection.ConnectionPool`
+QUBESD_POOL_SIZE = 4
+#: default number of calls in flight for
+#: :py:meth:`qubesadmin.app.QubesBase.qubesd_call_many`
+QUBESD_CALL_CONCURRENCY = 8
 QREXEC_SERVICES_DIR = '/etc/qubes-rpc'
+#: qrexec service used by :py:class:`qubesadmin.connection.QrexecChannel`
+QREXEC_CHANNEL_SERVICE = 'admin.Channel'
 
 defaults = {
     'template_label': 'black',
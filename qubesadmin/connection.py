@@ -0,0 +1,397 @@
+# -*- encoding: utf-8 -*-
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2026 agent <agent@local>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Low level connections to qubesd, locally or through qrexec."""
+from __future__ import annotations
+
+import collections
+import socket
+import struct
+import subprocess
+import threading
+import typing
+
+import qubesadmin.config
+import qubesadmin.exc
+
+
+def connect_qubesd(path: str | None = None) -> socket.socket:
+    """Open a new connection to qubesd socket.
+
+    :param path: socket path, :py:data:`qubesadmin.config.QUBESD_SOCKET` if
+        not given
+    :raises QubesDaemonCommunicationError: when qubesd is not reachable
+    """
+    client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client_socket.connect(path or qubesadmin.config.QUBESD_SOCKET)
+    except (IOError, OSError) as e:
+        client_socket.close()
+        raise qubesadmin.exc.QubesDaemonCommunicationError(
+            "Failed to connect to qubesd service: %s", str(e)
+        )
+    return client_socket
+
+
+def socket_call(client_socket: socket.socket, request: bytes) -> bytes:
+    """Send a single request over an already connected socket and read
+    the whole response. The socket is closed afterwards.
+
+    :param client_socket: socket connected to qubesd
+    :param request: full request (call header and payload)
+    :return: raw response, to be parsed by
+        :py:meth:`qubesadmin.base.PropertyHolder._parse_qubesd_response`
+    """
+    try:
+        client_socket.sendall(request)
+        client_socket.shutdown(socket.SHUT_WR)
+        with client_socket.makefile("rb") as response:
+            return response.read()
+    finally:
+        client_socket.close()
+
+
+class ConnectionPool:
+    """Bounded pool of connections to qubesd, established ahead of time.
+
+    qubesd handles exactly one request per connection: the client sends the
+    request, half-closes the socket and reads the response until EOF. A
+    connection therefore can not be reused for a second call, but it can be
+    opened before it is needed, so qubesd accepts it while the client is still
+    busy with the previous response. The pool keeps up to *size* such idle
+    connections and refills itself after each call. When the pool is empty,
+    or an idle connection was already closed by qubesd (for example because
+    it was restarted), a fresh one-shot connection is used instead.
+
+    Attach it to an application object to use it for all Admin API calls:
+
+    >>> app = qubesadmin.Qubes()
+    >>> app.connection_pool = qubesadmin.connection.ConnectionPool(size=8)
+
+    Note that each idle connection closed without sending any request (see
+    :py:meth:`close`) is reported by qubesd as an invalid request.
+    """
+
+    def __init__(self, size: int | None = None, path: str | None = None):
+        """
+        :param size: maximum number of idle connections kept open,
+            :py:data:`qubesadmin.config.QUBESD_POOL_SIZE` if not given
+        :param path: qubesd socket path,
+            :py:data:`qubesadmin.config.QUBESD_SOCKET` if not given
+        """
+        if size is None:
+            size = qubesadmin.config.QUBESD_POOL_SIZE
+        if size < 0:
+            raise ValueError("Pool size must not be negative")
+        self.size = size
+        self.path = path
+        self._idle: collections.deque[socket.socket] = collections.deque()
+        self._lock = threading.Lock()
+        self._stats: collections.Counter[str] = collections.Counter()
+        self._closed = False
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Pool statistics:
+
+         - `calls` - number of calls made through the pool
+         - `pooled` - calls that used an idle, pre-connected socket
+         - `oneshot` - calls that needed a fresh connection
+         - `stale` - idle connections found closed by qubesd and dropped
+         - `connects` - total number of connections opened
+         - `idle` - number of currently idle connections
+        """
+        with self._lock:
+            stats = {key: self._stats[key] for key in
+                     ("calls", "pooled", "oneshot", "stale", "connects")}
+            stats["idle"] = len(self._idle)
+        return stats
+
+    @staticmethod
+    def _is_alive(client_socket: socket.socket) -> bool:
+        """Check if an idle connection is still usable. qubesd never sends
+        anything before receiving the full request, so any readable data (or
+        EOF) means the connection is gone."""
+        try:
+            client_socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _connect(self) -> socket.socket:
+        """Open a new connection, counting it in statistics"""
+        client_socket = connect_qubesd(self.path)
+        with self._lock:
+            self._stats["connects"] += 1
+        return client_socket
+
+    def acquire(self) -> socket.socket:
+        """Get a connected socket, preferably an idle one from the pool.
+
+        The returned socket is owned by the caller and must be used for
+        exactly one request.
+        """
+        while True:
+            with self._lock:
+                try:
+                    client_socket = self._idle.popleft()
+                except IndexError:
+                    self._stats["oneshot"] += 1
+                    break
+            if self._is_alive(client_socket):
+                with self._lock:
+                    self._stats["pooled"] += 1
+                return client_socket
+            client_socket.close()
+            with self._lock:
+                self._stats["stale"] += 1
+        return self._connect()
+
+    def fill(self) -> None:
+        """Open connections until the pool holds *size* idle ones.
+
+        Errors are not reported here - if qubesd is not reachable, the next
+        call will fail with an appropriate exception anyway.
+        """
+        while not self._closed:
+            with self._lock:
+                if len(self._idle) >= self.size:
+                    return
+            try:
+                client_socket = self._connect()
+            except qubesadmin.exc.QubesDaemonCommunicationError:
+                return
+            with self._lock:
+                if self._closed or len(self._idle) >= self.size:
+                    client_socket.close()
+                    return
+                self._idle.append(client_socket)
+
+    def call(self, request: bytes) -> bytes:
+        """Send a request to qubesd and return the raw response.
+
+        :param request: full request (call header and payload)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+        client_socket = self.acquire()
+        try:
+            return socket_call(client_socket, request)
+        finally:
+            self.fill()
+
+    def close(self) -> None:
+        """Close all idle connections and stop refilling the pool."""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for client_socket in idle:
+            client_socket.close()
+
+    def __enter__(self) -> ConnectionPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class QrexecChannel:
+    """Long-lived qrexec connection carrying many Admin API calls.
+
+    Calling each Admin API method from a VM requires a separate
+    qrexec-client-vm process, qrexec policy evaluation and vchan setup. This
+    class instead starts a single service call
+    (:py:data:`qubesadmin.config.QREXEC_CHANNEL_SERVICE`) and sends framed
+    requests over it. The dom0 side of the
+    service is responsible for evaluating qrexec policy for each forwarded
+    request, as if it was a separate call.
+
+    Framing: each frame is a 4-byte big-endian length followed by the frame
+    body. Right after the connection is established, the service sends a
+    frame with a protocol version (currently `1`). Request body is
+    `method+arg dest\\0payload`, response body is a raw qubesd response (see
+    :py:meth:`qubesadmin.base.PropertyHolder._parse_qubesd_response`). Calls
+    from multiple threads are serialized.
+
+    If the service is not available (the connection fails, or the version
+    frame is not received within *handshake_timeout*, for example because
+    the call waits for user confirmation), the channel is marked as
+    unsupported and :py:meth:`call` returns :py:obj:`None`, so the caller
+    can fall back to the regular per-call qrexec.
+
+    >>> app = qubesadmin.Qubes()
+    >>> app.qrexec_channel = qubesadmin.connection.QrexecChannel()
+    """
+
+    #: supported protocol version
+    PROTOCOL_VERSION = b"1"
+
+    def __init__(self, service: str | None = None, dest: str = "dom0",
+                 handshake_timeout: float = 10.0):
+        """
+        :param service: qrexec service to call,
+            :py:data:`qubesadmin.config.QREXEC_CHANNEL_SERVICE` if not given
+        :param dest: target of the service call
+        :param handshake_timeout: how long to wait for the version frame,
+            in seconds
+        """
+        self.service = service or qubesadmin.config.QREXEC_CHANNEL_SERVICE
+        self.dest = dest
+        self.handshake_timeout = handshake_timeout
+        #: is the channel supported by the other side (:py:obj:`None` if
+        #: not checked yet)
+        self.supported: bool | None = None
+        self._proc: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read_exactly(stream: typing.IO[bytes], size: int) -> bytes:
+        """Read exactly *size* bytes, raise EOFError on short read"""
+        data = b""
+        while len(data) < size:
+            chunk = stream.read(size - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def _read_frame(self) -> bytes:
+        """Read one frame from the service"""
+        assert self._proc is not None and self._proc.stdout is not None
+        (length,) = struct.unpack(
+            ">I", self._read_exactly(self._proc.stdout, 4))
+        return self._read_exactly(self._proc.stdout, length)
+
+    def _write_frame(self, body: bytes) -> None:
+        """Write one frame to the service"""
+        assert self._proc is not None and self._proc.stdin is not None
+        self._proc.stdin.write(struct.pack(">I", len(body)) + body)
+        self._proc.stdin.flush()
+
+    def _read_version(self) -> bytes:
+        """Read the version frame, killing the service call if it does not
+        arrive within :py:attr:`handshake_timeout`
+
+        :raises TimeoutError: when the version frame was not received in time
+        """
+        assert self._proc is not None
+        proc = self._proc
+        timed_out = threading.Event()
+
+        def expire() -> None:
+            timed_out.set()
+            # makes the pending read return EOF
+            proc.kill()
+
+        timer = threading.Timer(self.handshake_timeout, expire)
+        timer.start()
+        try:
+            version = self._read_frame()
+        finally:
+            timer.cancel()
+            timer.join()
+        if timed_out.is_set():
+            raise TimeoutError()
+        return version
+
+    def _open(self) -> bool:
+        """Start the service call and check the protocol version.
+
+        :return: True if the channel is usable
+        """
+        # pylint: disable=consider-using-with
+        try:
+            self._proc = subprocess.Popen(
+                [qubesadmin.config.QREXEC_CLIENT_VM, self.dest, self.service],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            version = self._read_version()
+        except (OSError, EOFError, struct.error):
+            self._close()
+            self.supported = False
+            return False
+        if version != self.PROTOCOL_VERSION:
+            self._close()
+            self.supported = False
+            return False
+        self.supported = True
+        return True
+
+    def _close(self) -> None:
+        """Terminate the service call, if any"""
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        try:
+            if proc.stdin:
+                proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        proc.wait()
+
+    def call(self, dest: str, service_name: str,
+             payload: bytes | None = None) -> bytes | None:
+        """Send a request over the channel and return the raw response.
+
+        :param dest: destination VM name
+        :param service_name: API method name, with argument if any
+            ('admin...+arg')
+        :param payload: payload send to the method
+        :return: raw qubesd response, or :py:obj:`None` if the channel is
+            not supported and the call needs to be made the regular way
+        :raises QubesDaemonCommunicationError: when the channel was
+            interrupted during the call; it will be re-established on the
+            next call
+        """
+        with self._lock:
+            if self.supported is False:
+                return None
+            if self._proc is None and not self._open():
+                return None
+            body = "{} {}\0".format(service_name, dest).encode("ascii")
+            if payload is not None:
+                body += payload
+            try:
+                self._write_frame(body)
+                return self._read_frame()
+            except (OSError, EOFError, struct.error) as e:
+                self._close()
+                raise qubesadmin.exc.QubesDaemonCommunicationError(
+                    "Admin API channel interrupted: %s", str(e) or "EOF"
+                )
+
+    def close(self) -> None:
+        """Close the channel"""
+        with self._lock:
+            self._close()
+
+    def __enter__(self) -> QrexecChannel:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
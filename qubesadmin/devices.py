@@ -62,7 +62,11 @@ class DeviceCollection:
     def __init__(self, vm: QubesVM, class_: str):
         self._vm = vm
         self._class = class_
+        #: index of devices exposed by this vm, by `port_id`
         self._dev_cache = {}
+        #: the index holds all devices exposed by this vm (kept up to date
+        #: by events), so a missing port does not need to be looked up
+        self._dev_cache_complete = False
         #: attachments cache, `None` means "not cached (yet)",
         #: in contrast to empty list which means "cached empty list"
         self._attachment_cache = None
@@ -204,21 +208,10 @@ class DeviceCollection:
         if self._attachment_cache is not None:
             yield from self._attachment_cache
             return
-        new_cache = []
-        assignments_str = self._vm.qubesd_call(
+        new_cache = self._parse_assignments(self._vm.qubesd_call(
             None, "admin.vm.device.{}.Attached".format(self._class)
-        ).decode()
-        for assignment_str in assignments_str.splitlines():
-            head, _, untrusted_rest = assignment_str.partition(" ")
-            device = VirtualDevice.from_qarg(
-                head, self._class, self._vm.app.domains, blind=True
-            )
-
-            assignment = DeviceAssignment.deserialize(
-                untrusted_rest.encode("ascii"), expected_device=device
-            )
-            new_cache.append(assignment)
-            yield assignment
+        ))
+        yield from new_cache
 
         if self._vm.app.cache_enabled:
             self._attachment_cache = new_cache
@@ -236,20 +229,10 @@ class DeviceCollection:
                 if not required_only or assignment.required:
                     yield assignment
             return
-        new_cache = []
-        assignments_str = self._vm.qubesd_call(
+        new_cache = self._parse_assignments(self._vm.qubesd_call(
             None, "admin.vm.device.{}.Assigned".format(self._class)
-        ).decode()
-        for assignment_str in assignments_str.splitlines():
-            head, _, untrusted_rest = assignment_str.partition(" ")
-            device = VirtualDevice.from_qarg(
-                head, self._class, self._vm.app.domains, blind=True
-            )
-
-            assignment = DeviceAssignment.deserialize(
-                untrusted_rest.encode("ascii"), expected_device=device
-            )
-            new_cache.append(assignment)
+        ))
+        for assignment in new_cache:
             if not required_only or assignment.required:
                 yield assignment
 
@@ -263,12 +246,41 @@ class DeviceCollection:
         devices: bytes = self._vm.qubesd_call(
             None, "admin.vm.device.{}.Available".format(self._class)
         )
-        for dev_serialized in devices.splitlines():
-            yield DeviceInfo.deserialize(
+        parsed = self._parse_exposed_devices(devices)
+        if self._vm.app.cache_enabled:
+            self._dev_cache = {dev.port_id: dev for dev in parsed}
+            self._dev_cache_complete = True
+        yield from parsed
+
+    def _parse_assignments(self, assignments: bytes) -> list[DeviceAssignment]:
+        """
+        Parse admin.vm.device.*.Assigned/Attached response.
+        """
+        result = []
+        for assignment_str in assignments.decode().splitlines():
+            head, _, untrusted_rest = assignment_str.partition(" ")
+            device = VirtualDevice.from_qarg(
+                head, self._class, self._vm.app.domains, blind=True
+            )
+
+            assignment = DeviceAssignment.deserialize(
+                untrusted_rest.encode("ascii"), expected_device=device
+            )
+            result.append(assignment)
+        return result
+
+    def _parse_exposed_devices(self, devices: bytes) -> list[DeviceInfo]:
+        """
+        Parse admin.vm.device.*.Available response.
+        """
+        return [
+            DeviceInfo.deserialize(
                 serialization=dev_serialized,
                 expected_backend_domain=self._vm,
                 expected_devclass=self._class,
             )
+            for dev_serialized in devices.splitlines()
+        ]
 
     def update_assignment(
             self, device: VirtualDevice, required: AssignmentMode
@@ -297,6 +309,7 @@ class DeviceCollection:
         Clear cache of available devices.
         """
         self._dev_cache.clear()
+        self._dev_cache_complete = False
         self._assignment_cache = None
         self._attachment_cache = None
 
@@ -313,11 +326,13 @@ class DeviceCollection:
         # fist, check if we have cached device info
         if item in self._dev_cache:
             return self._dev_cache[item]
-        # then look for available devices
-        for dev in self.get_exposed_devices():
-            if dev.port_id == item:
-                self._dev_cache[item] = dev
-                return dev
+        # then look for available devices, unless the index is known to
+        # hold all of them
+        if not self._dev_cache_complete:
+            for dev in self.get_exposed_devices():
+                if dev.port_id == item:
+                    self._dev_cache[item] = dev
+                    return dev
         # if still nothing, return UnknownDevice instance for the reason
         # explained in docstring, but don't cache it
         if not isinstance(item, str | None):
@@ -21,10 +21,18 @@
 '''Event handling implementation, require Python >=3.5.2 for asyncio.'''
 
 import asyncio
+import collections
+import concurrent.futures
 import fnmatch
+import functools
+import inspect
+import itertools
+import random
+import re
 import subprocess
+import time
 import typing
-from typing import Callable, Any
+from typing import Callable, Any, Iterator
 from asyncio import StreamWriter, StreamReader
 
 import qubesadmin.config
@@ -35,35 +43,318 @@ from qubesadmin.vm import QubesVM
 
 Handler: typing.TypeAlias\
     = Callable[[QubesVM | None, str, ...], Any]  # noqa: ANN401
+#: exact event names, (prefix, pattern) pairs and (matcher, pattern) pairs
+_DispatchIndex: typing.TypeAlias = tuple[
+    frozenset[str],
+    list[tuple[str, str]],
+    list[tuple[Callable[[str], Any], str]]]
+
+
+def _index_patterns(patterns: typing.Iterable[str]) -> _DispatchIndex:
+    '''Classify event name patterns: exact event names, prefixes (`foo*`,
+    including plain `*`) and other wildcards, which are compiled to regular
+    expressions'''
+    exact = set()
+    prefixes = []
+    wildcards = []
+    for pattern in patterns:
+        if not any(char in pattern for char in '*?['):
+            exact.add(pattern)
+        elif pattern.endswith('*') and \
+                not any(char in pattern[:-1] for char in '*?['):
+            prefixes.append((pattern[:-1], pattern))
+        else:
+            wildcards.append(
+                (re.compile(fnmatch.translate(pattern)).match, pattern))
+    return frozenset(exact), prefixes, wildcards
+
+
+def _match_patterns(index: _DispatchIndex, event: str) -> set[str]:
+    '''Get patterns from the index matching given event name'''
+    exact, prefixes, wildcards = index
+    matched = set()
+    if event in exact:
+        matched.add(event)
+    matched.update(pattern for prefix, pattern in prefixes
+                   if event.startswith(prefix))
+    matched.update(pattern for match, pattern in wildcards
+                   if match(event))
+    return matched
+
+class EventsParser:
+    '''Incremental parser of the events stream.
+
+    Each event is sent as a series of NUL-terminated fields: `1` (event
+    marker), subject name (empty for events not related to any VM), event
+    name, then key-value pairs of event arguments, closed by an empty key.
+
+    Data is fed in chunks of arbitrary size, complete events are split out of
+    it in one pass and incomplete trailing data is kept until the next chunk.
+    Only the subject and event name are decoded, arguments are returned as
+    raw fields - see :py:meth:`decode_kwargs`.
+    '''
+    def __init__(self) -> None:
+        self._buffer = b''
+
+    def feed(self, data: bytes) -> Iterator[tuple[str, str, list[bytes]]]:
+        '''Add data to the buffer and iterate over complete events
+
+        :param data: data read from the events connection
+        :return: iterator of (subject name, event name, raw arguments)
+        '''
+        if self._buffer:
+            data = self._buffer + data
+            self._buffer = b''
+        fields = data.split(b'\0')
+        # the last field is not terminated (yet)
+        count = len(fields) - 1
+        start = 0
+        while start + 3 < count:
+            if fields[start] != b'1':
+                raise qubesadmin.exc.QubesDaemonCommunicationError(
+                    'Non-event received on events connection: '
+                    + repr(fields[start] + b'\0'))
+            end = start + 3
+            while end < count and fields[end]:
+                end += 2
+            if end >= count:
+                break
+            yield (fields[start + 1].decode('utf-8'),
+                   fields[start + 2].decode('utf-8'),
+                   fields[start + 3:end])
+            start = end + 1
+        self._buffer = b'\0'.join(fields[start:])
+
+    def feed_eof(self) -> None:
+        '''Signal end of the stream
+
+        :raises QubesDaemonCommunicationError: when the stream ended in the
+            middle of an event
+        '''
+        if self._buffer:
+            partial, self._buffer = self._buffer, b''
+            raise qubesadmin.exc.QubesDaemonCommunicationError(
+                'Incomplete event received on events connection: '
+                + repr(partial))
+
+    @staticmethod
+    def decode_kwargs(fields: list[bytes]) -> dict[str, str]:
+        '''Decode raw event arguments returned by :py:meth:`feed`'''
+        return {key.decode('utf-8'): value.decode('utf-8')
+                for key, value in zip(fields[::2], fields[1::2])}
+
+
+class JournalEntry(typing.NamedTuple):
+    '''Event recorded in :py:class:`EventJournal`'''
+    #: sequence number
+    seq: int
+    #: time of receiving the event, see :py:func:`time.monotonic`
+    timestamp: float
+    #: subject name, None for events not related to any VM
+    subject: str | None
+    #: event name
+    event: str
+    #: event arguments, as received
+    kwargs: dict[str, str]
+
+
+class EventJournal:
+    '''Bounded in-memory journal of received events.
+
+    Each event gets a sequence number, one higher than the previous one. A
+    consumer can remember the number of the last event it processed and get
+    all the events after it later, as long as the journal still keeps them.
+
+    qubesd does not number events, so the journal can't be used to resume
+    the events connection itself. Events may be missed before each
+    `connection-established` entry.
+    '''
+    def __init__(self, size: int):
+        '''
+        :param size: maximum number of events kept
+        '''
+        self._entries: collections.deque[JournalEntry] = \
+            collections.deque(maxlen=size)
+        #: sequence number of the last recorded event, 0 if none
+        self.last_seq = 0
+
+    def append(self, subject: str | None, event: str,
+               kwargs: dict[str, str]) -> JournalEntry:
+        '''Record an event'''
+        self.last_seq += 1
+        entry = JournalEntry(self.last_seq, time.monotonic(), subject, event,
+                             dict(kwargs))
+        self._entries.append(entry)
+        return entry
+
+    def since(self, seq: int) -> list[JournalEntry] | None:
+        '''Get events recorded after the one with sequence number *seq*
+
+        :param seq: sequence number of the last processed event, 0 to get
+            all of them
+        :return: list of entries, or None if some of them are not kept
+            anymore
+        '''
+        if seq >= self.last_seq:
+            return []
+        if not self._entries or self._entries[0].seq > seq + 1:
+            return None
+        return list(itertools.islice(
+            self._entries, seq + 1 - self._entries[0].seq, None))
+
 
 class EventsDispatcher:
     ''' Events dispatcher, responsible for receiving events and calling
     appropriate handlers'''
+    # pylint: disable=too-many-instance-attributes
+    #: maximum amount of data read from the events connection at once
+    READ_SIZE = 64 * 1024
+    #: maximum number of event names with resolved handlers kept
+    DISPATCH_CACHE_SIZE = 4096
+    #: time window (in seconds) for events rate in :py:attr:`stats`
+    STATS_WINDOW = 60
+    #: events changing power state of a VM
+    POWER_STATE_EVENTS = ('domain-pre-start', 'domain-start', 'domain-shutdown',
+                          'domain-paused', 'domain-unpaused',
+                          'domain-start-failed')
+    #: events always used to keep VM list and devices cache up to date
+    CACHE_EVENTS = ('connection-established', 'domain-add', 'domain-delete',
+                    'property-set:name', 'device-*') + POWER_STATE_EVENTS
+    #: events used to keep cache up to date when
+    #: :py:attr:`qubesadmin.app.QubesBase.cache_enabled` is set
+    CACHE_EVENTS_ENABLED = ('property-set:*', 'property-reset:*',
+                            'domain-feature-set:*', 'domain-feature-delete:*',
+                            'domain-tag-add:*', 'domain-tag-delete:*')
+
     def __init__(self, app: QubesBase, api_method: str='admin.Events',
-                 enable_cache: bool=True):
+                 enable_cache: bool=True,
+                 filtered_api_method: str | None=None,
+                 handler_workers: int=0,
+                 coalesce_delay: float | None=None,
+                 coalesce_limit: int=1024,
+                 coalesce_overflow: str='invalidate-all',
+                 journal_size: int=0,
+                 revalidate_cache: bool=False):
         """Initialize EventsDispatcher
 
         :param app :py:class:`qubesadmin.Qubes` object
         :param api_method Admin API method producing events
         :param enable_cache Enable caching (see below)
+        :param filtered_api_method Admin API method producing only events
+            matching patterns given in the payload, one per line (see
+            :py:meth:`needed_events`); used instead of *api_method* unless
+            all events are needed. Patterns are sent when connecting, so
+            handlers for events not covered yet are effective only after
+            reconnection.
+        :param handler_workers Number of threads to run synchronous handlers
+            in; 0 to call them directly (see below)
+        :param coalesce_delay Delay cache updates by this many seconds, to
+            apply them once for a burst of events (see below); None to apply
+            them immediately
+        :param coalesce_limit Maximum number of delayed cache updates
+        :param coalesce_overflow What to do when there are too many delayed
+            cache updates: 'invalidate-all' to drop them and invalidate
+            the whole cache, 'flush' to apply them right away
+        :param journal_size Keep this many received events in
+            :py:attr:`journal`; 0 to not keep them
+        :param revalidate_cache On (re)connection, revalidate cached data
+            instead of dropping it, see
+            :py:meth:`qubesadmin.app.QubesBase._revalidate_cache_all`;
+            while :py:meth:`listen_for_events` runs, calls re-fetching it
+            are made in a thread, and data is retrieved on access until they
+            finish
 
         Connecting :py:class:`EventsDispatcher` object to a
         :py:class:`qubesadmin.Qubes` implicitly enables caching. It is important
         to actually run the dispatcher (:py:meth:`listen_for_events`), otherwise
         the cache won't be updated. Alternatively, disable caching by setting
         :py:attr:`qubesadmin.Qubes.cache_enabled` property to `False`.
+
+        Coroutine handlers are started as tasks, without waiting for them to
+        finish. Synchronous handlers are called directly, blocking processing
+        of further events until they return, unless *handler_workers* is set.
+        In that case they are called in a pool of that many threads, while
+        the dispatcher keeps processing events; calls of each handler are
+        still made one at a time, in order of events. Such handlers must be
+        thread-safe. Handlers are called in threads only while
+        :py:meth:`listen_for_events` runs, :py:meth:`handle` called
+        outside of event loop calls them directly. When
+        :py:meth:`listen_for_events` exits, it waits for queued calls
+        of synchronous handlers and cancels running coroutine handlers.
+
+        With *coalesce_delay* set, cache updates caused by events (property
+        value invalidation, power state, features, tags and devices) are
+        collected for that time and applied once for each subject and
+        property, feature, tag etc. Collected updates are always applied
+        before calling any handler, so handlers see an up to date cache;
+        other code may see stale values for up to *coalesce_delay*.
         """
+        # pylint: disable=too-many-positional-arguments
         #: Qubes() object
         self.app = app
 
         self._api_method = api_method
+        self._filtered_api_method = filtered_api_method
 
         #: event handlers - dict of event -> handlers
         self.handlers = {}
+        #: handler patterns split into exact names, prefixes and other
+        #: wildcards; built on first use after handlers change
+        self._dispatch_index: _DispatchIndex | None = None
+        #: handlers resolved for each event name seen so far
+        self._dispatch_cache: dict[str, tuple[Handler, ...]] = {}
+        #: index of :py:meth:`needed_events`, and whether events needed
+        #: with :py:attr:`app` cache enabled are included in it
+        self._filter_index: _DispatchIndex | None = None
+        self._filter_cache_enabled = False
+        #: whether an event is needed at all, for each event name seen so far
+        self._filter_cache: dict[str, bool] = {}
 
         #: used to stop processing events
         self._reader_task = None
 
+        #: number of threads for synchronous handlers
+        self.handler_workers = handler_workers
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        #: calls of each handler waiting for a thread (the first one is
+        #: running)
+        self._handler_queues: dict[Handler, collections.deque] = {}
+        #: running coroutine handlers
+        self._handler_tasks: set[asyncio.Task] = set()
+        #: set when all queued calls of synchronous handlers are done,
+        #: while :py:meth:`_stop_handlers` waits for that
+        self._handler_queues_empty: asyncio.Event | None = None
+        self._handler_stats: dict[Handler, dict[str, int | float]] = {}
+
+        if coalesce_overflow not in ('invalidate-all', 'flush'):
+            raise ValueError(
+                'Invalid coalesce_overflow: {}'.format(coalesce_overflow))
+        self.coalesce_delay = coalesce_delay
+        self.coalesce_limit = coalesce_limit
+        self.coalesce_overflow = coalesce_overflow
+        #: delayed cache updates: key -> (subject, event, kwargs)
+        self._cache_updates: dict[tuple, tuple] = {}
+        self._cache_updates_timer: asyncio.TimerHandle | None = None
+
+        self._stats: collections.Counter[str] = collections.Counter()
+        #: number of received events in each second: [second, count]
+        self._events_per_second: collections.deque[list[int]] = \
+            collections.deque(maxlen=self.STATS_WINDOW)
+        self._last_event_time: float | None = None
+        self._reconnect_delay = 0.0
+        #: events other than `connection-established` received over the
+        #: current connection
+        self._connection_events = 0
+
+        #: journal of received events, if enabled
+        self.journal = EventJournal(journal_size) if journal_size else None
+        self.revalidate_cache = revalidate_cache
+        #: events received while cache is re-fetched in a thread, to apply
+        #: their cache updates again afterwards
+        self._revalidate_events: list[tuple] | None = None
+        #: task re-fetching cached data after (re)connection
+        self._revalidate_task: asyncio.Task | None = None
+
         if enable_cache:
             self.app.cache_enabled = True
 
@@ -80,6 +371,7 @@ class EventsDispatcher:
         :param event Event name, or '*' for all events
         :param handler Handler function'''
         self.handlers.setdefault(event, set()).add(handler)
+        self._invalidate_dispatch()
 
     def remove_handler(self, event: str, handler: Handler) -> None:
         '''Remove previously registered event handler
@@ -88,6 +380,73 @@ class EventsDispatcher:
         :param handler Handler function
         '''
         self.handlers[event].remove(handler)
+        if not self.handlers[event]:
+            del self.handlers[event]
+        self._invalidate_dispatch()
+        if not any(handler in h_func_set
+                   for h_func_set in self.handlers.values()):
+            self._handler_stats.pop(handler, None)
+
+    def _invalidate_dispatch(self) -> None:
+        '''Drop dispatch index after handlers change'''
+        self._dispatch_index = None
+        self._dispatch_cache.clear()
+        self._filter_index = None
+
+    def _get_handlers(self, event: str) -> tuple[Handler, ...]:
+        '''Get handlers registered for given event
+
+        Patterns are matched once per event name, the result is cached until
+        handlers change.
+        '''
+        try:
+            return self._dispatch_cache[event]
+        except KeyError:
+            pass
+        if self._dispatch_index is None:
+            self._dispatch_index = _index_patterns(self.handlers)
+        matched = _match_patterns(self._dispatch_index, event)
+        # keep order of registration
+        handlers = tuple(h_func for h_name, h_func_set in self.handlers.items()
+                         if h_name in matched
+                         for h_func in h_func_set)
+        if len(self._dispatch_cache) >= self.DISPATCH_CACHE_SIZE:
+            self._dispatch_cache.clear()
+        self._dispatch_cache[event] = handlers
+        return handlers
+
+    def needed_events(self) -> list[str]:
+        '''Get patterns of events this dispatcher needs to receive
+
+        This includes patterns of registered handlers and events used to
+        keep :py:attr:`app` caches up to date. Other events are dropped
+        as soon as their name is known. If `'*'` is included, all events
+        are needed.
+        '''
+        patterns = set(self.handlers)
+        patterns.update(self.CACHE_EVENTS)
+        if self.app.cache_enabled:
+            patterns.update(self.CACHE_EVENTS_ENABLED)
+        return sorted(patterns)
+
+    def _wants_event(self, event: str) -> bool:
+        '''Check if given event is needed by this dispatcher at all, see
+        :py:meth:`needed_events`'''
+        cache_enabled = bool(self.app.cache_enabled)
+        if self._filter_index is None or \
+                self._filter_cache_enabled != cache_enabled:
+            self._filter_index = _index_patterns(self.needed_events())
+            self._filter_cache_enabled = cache_enabled
+            self._filter_cache.clear()
+        try:
+            return self._filter_cache[event]
+        except KeyError:
+            pass
+        wanted = bool(_match_patterns(self._filter_index, event))
+        if len(self._filter_cache) >= self.DISPATCH_CACHE_SIZE:
+            self._filter_cache.clear()
+        self._filter_cache[event] = wanted
+        return wanted
 
     async def _get_events_reader(self, vm: QubesVM | None =None)\
             -> tuple[asyncio.StreamReader, Callable]:
@@ -102,12 +461,23 @@ class EventsDispatcher:
         else:
             dest = 'dom0'
 
+        api_method = self._api_method
+        payload = b''
+        if self._filtered_api_method:
+            patterns = self.needed_events()
+            if '*' not in patterns:
+                api_method = self._filtered_api_method
+                payload = ''.join(pattern + '\n'
+                                  for pattern in patterns).encode('utf-8')
+
         if self.app.qubesd_connection_type == 'socket':
             reader, writer = await asyncio.open_unix_connection(
                 qubesadmin.config.QUBESD_SOCKET)
-            writer.write(self._api_method.encode() + b'+ ')  # method+arg
+            writer.write(api_method.encode() + b'+ ')  # method+arg
             writer.write(b'dom0 ')  # source
             writer.write(b'name ' + dest.encode('ascii') + b'\0')  # dest
+            if payload:
+                writer.write(payload)
             writer.write_eof()
 
             def cleanup_func() -> None:
@@ -115,9 +485,11 @@ class EventsDispatcher:
                 writer.close()
         elif self.app.qubesd_connection_type == 'qrexec':
             proc = await asyncio.create_subprocess_exec(
-                'qrexec-client-vm', dest, self._api_method,
+                'qrexec-client-vm', dest, api_method,
                 stdin=subprocess.PIPE, stdout=subprocess.PIPE)
 
+            if payload:
+                typing.cast(StreamWriter, proc.stdin).write(payload)
             typing.cast(StreamWriter, proc.stdin).write_eof()
             reader = typing.cast(StreamReader, proc.stdout)
 
@@ -133,7 +505,9 @@ class EventsDispatcher:
         return reader, cleanup_func
 
     async def listen_for_events(self, vm: QubesVM | None=None,
-                                reconnect: bool=True) -> None:
+                                reconnect: bool=True,
+                                vms: typing.Iterable[QubesVM] | None=None)\
+            -> None:
         '''
         Listen for events and call appropriate handlers.
         This function do not exit until manually terminated.
@@ -144,28 +518,90 @@ class EventsDispatcher:
             events about all VMs and not related to any particular VM.
         :param reconnect: should reconnect to qubesd if connection is
             interrupted?
+        :param vms: Listen for events only for these VMs (and
+            `connection-established`). This uses a single connection
+            for all events, events of other VMs are dropped before parsing
+            their arguments. Can't be used together with *vm*.
         :rtype: None
         '''
-        while True:
-            try:
-                self._reader_task = asyncio.create_task(
-                    self._listen_for_events(vm))
-                await self._reader_task
-            except (OSError, qubesadmin.exc.QubesDaemonCommunicationError):
-                pass
-            except asyncio.CancelledError:
-                break
-            finally:
-                self._reader_task = None
-            if not reconnect:
-                break
-            self.app.log.warning(
-                'Connection to qubesd terminated, reconnecting in {} '
-                'seconds'.format(qubesadmin.config.QUBESD_RECONNECT_DELAY))
-            # avoid busy-loop if qubesd is dead
-            await asyncio.sleep(qubesadmin.config.QUBESD_RECONNECT_DELAY)
+        subjects = None
+        if vms is not None:
+            if vm is not None:
+                raise ValueError('vm and vms can not be used together')
+            subjects = {qube.name for qube in vms}
+        failures = 0
+        try:
+            while True:
+                self._connection_events = 0
+                self._stats['connections'] += 1
+                try:
+                    self._reader_task = asyncio.create_task(
+                        self._listen_for_events(vm, subjects))
+                    await self._reader_task
+                except (OSError, qubesadmin.exc.QubesDaemonCommunicationError):
+                    pass
+                except asyncio.CancelledError:
+                    break
+                finally:
+                    self._reader_task = None
+                if not reconnect:
+                    break
+                if self._connection_events:
+                    # the connection worked, start over with a short delay;
+                    # qubesd sends connection-established right after
+                    # accepting it, that alone doesn't count
+                    failures = 0
+                self._reconnect_delay = self._get_reconnect_delay(failures)
+                failures += 1
+                self._stats['reconnects'] += 1
+                self.app.log.warning(
+                    'Connection to qubesd terminated, reconnecting in {:.1f} '
+                    'seconds'.format(self._reconnect_delay))
+                # avoid busy-loop if qubesd is dead
+                await asyncio.sleep(self._reconnect_delay)
+        finally:
+            self.flush_cache_updates()
+            await self._stop_handlers()
+
+    async def _stop_handlers(self) -> None:
+        '''Finish handler calls when :py:meth:`listen_for_events` exits.
 
-    async def _listen_for_events(self, vm: QubesVM | None=None) -> bool:
+        Queued calls of synchronous handlers are completed, so no handler
+        misses an event already received; still running coroutine handlers
+        and cache revalidation are cancelled. The thread pool is shut down,
+        it's started again when needed.
+        '''
+        tasks = set(self._handler_tasks)
+        if self._revalidate_task is not None:
+            tasks.add(self._revalidate_task)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self._handler_queues:
+            self._handler_queues_empty = asyncio.Event()
+            await self._handler_queues_empty.wait()
+            self._handler_queues_empty = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def _get_reconnect_delay(failures: int) -> float:
+        '''Get delay before reconnecting: exponential backoff, up to
+        :py:data:`qubesadmin.config.QUBESD_RECONNECT_MAX_DELAY`, with
+        jitter, so clients do not reconnect all at once after qubesd restart
+
+        :param failures: number of previous attempts that did not receive
+            any event (other than `connection-established`)
+        '''
+        delay = min(qubesadmin.config.QUBESD_RECONNECT_MAX_DELAY,
+                    qubesadmin.config.QUBESD_RECONNECT_DELAY
+                    * 2 ** min(failures, 32))
+        return random.uniform(delay / 2, delay)
+
+    async def _listen_for_events(self, vm: QubesVM | None=None,
+                                 subjects: set[str] | None=None) -> bool:
         '''
         Listen for events and call appropriate handlers.
         This function do not exit until manually terminated.
@@ -174,49 +610,97 @@ class EventsDispatcher:
 
         :param vm: Listen for events only for this VM, use None to listen for
         events about all VMs and not related to any particular VM.
+        :param subjects: names of VMs to handle events for, use None to handle
+        all events; updated when any of them is renamed
         :return: True if any event was received, otherwise False
         :rtype: bool
         '''
 
         reader, cleanup_func = await self._get_events_reader(vm)
+        parser = EventsParser()
         try:
             some_event_received = False
-            while not reader.at_eof():
+            while True:
                 try:
-                    event_header = await reader.readuntil(b'\0')
-                    if event_header != b'1\0':
-                        raise qubesadmin.exc.QubesDaemonCommunicationError(
-                            'Non-event received on events connection: '
-                            + repr(event_header))
-                    subject = (await reader.readuntil(b'\0'))[:-1].decode(
-                        'utf-8')
-                    event = (await reader.readuntil(b'\0'))[:-1].decode(
-                        'utf-8')
-                    kwargs = {}
-                    while True:
-                        key = (await reader.readuntil(b'\0'))[:-1].decode(
-                            'utf-8')
-                        if not key:
-                            break
-                        value = (await reader.readuntil(b'\0'))[:-1].\
-                            decode('utf-8')
-                        kwargs[key] = value
+                    data = await reader.read(self.READ_SIZE)
                 except BrokenPipeError:
                     break
-                except asyncio.IncompleteReadError as err:
-                    if err.partial == b'':
-                        break
-                    raise
-
-                if not subject:
-                    subject = None
-                self.handle(subject, event, **kwargs)
-
-                some_event_received = True
+                if not data:
+                    parser.feed_eof()
+                    break
+                for subject, event, raw_kwargs in parser.feed(data):
+                    some_event_received = True
+                    self._count_event()
+                    if event != 'connection-established':
+                        self._connection_events += 1
+                    if subjects is not None and subject not in subjects \
+                            and not self._is_watched_subject(
+                                subjects, subject, event, raw_kwargs):
+                        continue
+                    if not self._wants_event(event):
+                        continue
+                    self.handle(subject or None, event,
+                                **parser.decode_kwargs(raw_kwargs))
         finally:
             cleanup_func()
         return some_event_received
 
+    def _count_event(self) -> None:
+        '''Update events statistics, see :py:attr:`stats`'''
+        now = time.monotonic()
+        self._stats['events'] += 1
+        self._last_event_time = now
+        second = int(now)
+        if self._events_per_second and \
+                self._events_per_second[-1][0] == second:
+            self._events_per_second[-1][1] += 1
+        else:
+            self._events_per_second.append([second, 1])
+
+    @property
+    def stats(self) -> dict[str, int | float | None]:
+        '''Events connection statistics:
+
+         - `connections` - number of connection attempts
+         - `reconnects` - number of reconnections after the connection was
+           terminated (or failed)
+         - `reconnect_delay` - delay before the last reconnection, in seconds
+         - `events` - total number of received events
+         - `events_per_second` - rate of received events over the last
+           :py:attr:`STATS_WINDOW` seconds
+         - `last_event_age` - seconds since the last received event, None if
+           there was none yet
+         - `handler_errors` - number of handler calls that raised an
+           exception
+        '''
+        now = time.monotonic()
+        recent = sum(count for second, count in self._events_per_second
+                     if second > now - self.STATS_WINDOW)
+        stats: dict[str, int | float | None] = {
+            key: self._stats[key] for key in
+            ('connections', 'reconnects', 'events', 'handler_errors')}
+        stats['reconnect_delay'] = self._reconnect_delay
+        stats['events_per_second'] = recent / self.STATS_WINDOW
+        stats['last_event_age'] = None if self._last_event_time is None \
+            else now - self._last_event_time
+        return stats
+
+    @staticmethod
+    def _is_watched_subject(subjects: set[str], subject: str, event: str,
+                            raw_kwargs: list[bytes]) -> bool:
+        '''Check if an event of subject not in *subjects* should be handled
+        anyway: `connection-established`, and rename of a watched VM (in
+        which case *subjects* is updated with the new name)'''
+        if not subject:
+            return event == 'connection-established'
+        if event == 'property-set:name':
+            kwargs = EventsParser.decode_kwargs(raw_kwargs)
+            if kwargs.get('oldvalue') in subjects:
+                subjects.discard(kwargs['oldvalue'])
+                subjects.add(subject)
+                return True
+        return False
+
     def stop(self) -> None:
         """Stop currently running dispatcher"""
         if self._reader_task:
@@ -225,68 +709,56 @@ class EventsDispatcher:
     def handle(self, subject_name: str | None, event: str, **kwargs) -> None:
         """Call handlers for given event"""
         # pylint: disable=protected-access
+        if self.journal is not None:
+            self.journal.append(subject_name or None, event, kwargs)
         if subject_name:
-            if event in ['property-set:name']:
-                self.app.domains.clear_cache()
+            if event == 'property-set:name':
+                if kwargs.get('oldvalue'):
+                    self.app.domains.rename_in_cache(
+                        kwargs['oldvalue'], subject_name)
+                else:
+                    self.app.domains.clear_cache()
             try:
                 subject = self.app.domains.get_blind(subject_name)
             except KeyError:
                 return
         else:
             # handle cache refreshing on best-effort basis
-            if event in ['domain-add', 'domain-delete']:
-                vm = kwargs['vm']
-                self.app.domains.clear_cache(invalidate_name=str(vm))
+            if event == 'domain-add':
+                self.app.domains.add_to_cache(str(kwargs['vm']))
+            elif event == 'domain-delete':
+                self.app.domains.remove_from_cache(str(kwargs['vm']))
             subject = None
         # invalidate cache if needed; call it before other handlers
         # as those may want to use cached value
-        if event.startswith('property-set:') or \
-                event.startswith('property-reset:'):
-            self.app._invalidate_cache(subject, event, **kwargs)
-        elif event in ('domain-pre-start', 'domain-start', 'domain-shutdown',
-                       'domain-paused', 'domain-unpaused',
-                       'domain-start-failed'):
-            assert subject is not None
-            self.app._update_power_state_cache(subject, event, **kwargs)
-            subject.devices.clear_cache()
-        elif event == 'connection-established':
+        if event == 'connection-established':
             # on (re)connection, clear cache completely - we don't have
             # guarantee about not missing any events before this point
-            self.app._invalidate_cache_all()
-        elif event.split(":")[0] in (
-            "device-assign",
-            "device-unassign",
-            "device-assignment-changed"
-        ):
-            assert subject is not None
-            devclass = event.split(":")[1]
-            subject.devices[devclass]._assignment_cache = None
-        elif event.split(":")[0] in (
-            "device-attach",
-            "device-detach",
-            "device-removed"
-        ):
-            assert subject is not None
-            devclass = event.split(":")[1]
-            subject.devices[devclass]._attachment_cache = None
-        if event.split(":")[0] in ("device-removed",):
-            assert subject is not None
-            devclass = event.split(":")[1]
-            port_id = kwargs.get("port", ":").split(":")[1]
-            try:
-                del subject.devices[devclass]._dev_cache[port_id]
-            except KeyError:
-                pass
+            self._drop_cache_updates()
+            if self.revalidate_cache:
+                self._revalidate_cache()
+            else:
+                self.app._invalidate_cache_all()
+        else:
+            if self._revalidate_events is not None:
+                self._revalidate_events.append((subject, event, kwargs))
+            key = None
+            if self.coalesce_delay is not None:
+                key = self._cache_update_key(subject_name, event, kwargs)
+            if key is not None:
+                self._queue_cache_update(key, subject, event, kwargs)
+            else:
+                self._update_cache(subject, event, kwargs)
 
-        handlers = [h_func for h_name, h_func_set in self.handlers.items()
-                    for h_func in h_func_set
-                    if fnmatch.fnmatch(event, h_name)]
+        handlers = self._get_handlers(event)
 
         # skip deserializing parameters (which may make further Admin API calls)
         # if no handler is registered for the event
         if not handlers:
             return
 
+        self.flush_cache_updates()
+
         # deserialize known attributes
         if event.startswith('device-'):
             try:
@@ -316,9 +788,341 @@ class EventsDispatcher:
                 pass
 
         for handler in handlers:
+            self._call_handler(handler, subject, event, kwargs)
+
+    def _revalidate_cache(self) -> None:
+        '''Revalidate cached data after (re)connection.
+
+        Cached data is invalidated right away, but re-fetching it makes
+        many blocking Admin API calls, so when running in event loop only
+        these calls are made in a thread, without stalling events
+        processing; responses are stored in the event loop. Cache updates
+        of events received in the meantime are applied again afterwards,
+        as re-fetched data may predate them.
+        '''
+        # pylint: disable=protected-access
+        if self._revalidate_task is not None:
+            # data re-fetched by it may be stale already
+            self._revalidate_task.cancel()
+            self._revalidate_task = None
+        stale = self.app._mark_cache_stale()
+        if stale is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.app._refetch_cache(stale)
+            return
+        events: list[tuple] = []
+        self._revalidate_events = events
+        self._revalidate_task = loop.create_task(
+            self._refetch_cache(stale))
+        self._revalidate_task.add_done_callback(
+            functools.partial(self._revalidate_cache_done, events))
+
+    async def _refetch_cache(self, stale: tuple) -> None:
+        '''Re-fetch cached data, making Admin API calls in a thread'''
+        # pylint: disable=protected-access
+        loop = asyncio.get_running_loop()
+        for requests, callbacks in self.app._refetch_cache_steps(stale):
+            if not requests:
+                continue
+            results = await loop.run_in_executor(
+                None, self.app.qubesd_call_many, requests)
+            self.app._prefetch_store(requests, callbacks, results)
+
+    def _revalidate_cache_done(self, events: list[tuple],
+                               task: asyncio.Task) -> None:
+        '''Finish revalidation started by :py:meth:`_revalidate_cache`'''
+        if self._revalidate_task is task:
+            self._revalidate_task = None
+        if self._revalidate_events is events:
+            self._revalidate_events = None
+        if not task.cancelled() and task.exception() is not None:
+            self.app.log.error('Failed to revalidate cache',
+                               exc_info=task.exception())
+        for subject, event, kwargs in events:
+            if subject is None or event == 'property-set:name':
+                # domain-add, domain-delete, rename - re-fetched list of
+                # qubes may miss it
+                self.app.domains.clear_cache()
+            else:
+                self._update_cache(subject, event, kwargs)
+
+    def _update_cache(self, subject: QubesVM | None, event: str,
+                      kwargs: dict[str, str]) -> None:
+        '''Update cached data according to the event'''
+        # pylint: disable=protected-access
+        if event.startswith('property-set:') or \
+                event.startswith('property-reset:'):
+            self.app._invalidate_cache(subject, event, **kwargs)
+        elif event in self.POWER_STATE_EVENTS:
+            assert subject is not None
+            self.app._update_power_state_cache(subject, event, **kwargs)
+            self.app._invalidate_volumes_cache(subject)
+            subject._clear_helpers_cache("devices")
+        elif event.startswith('domain-feature-set:') or \
+                event.startswith('domain-feature-delete:'):
+            assert subject is not None
+            self.app._update_features_cache(subject, event, **kwargs)
+        elif event.startswith('domain-tag-add:') or \
+                event.startswith('domain-tag-delete:'):
+            assert subject is not None
+            self.app._update_tags_cache(subject, event, **kwargs)
+        elif event.split(":")[0] in (
+            "device-assign",
+            "device-unassign",
+            "device-assignment-changed"
+        ):
+            assert subject is not None
+            devclass = event.split(":")[1]
+            subject.devices[devclass]._assignment_cache = None
+        elif event.split(":")[0] == "device-added":
+            assert subject is not None
+            self._update_device_index(subject, event, kwargs)
+        elif event.split(":")[0] in (
+            "device-attach",
+            "device-detach",
+            "device-removed"
+        ):
+            assert subject is not None
+            devclass = event.split(":")[1]
+            subject.devices[devclass]._attachment_cache = None
+        if event.split(":")[0] in ("device-removed",):
+            assert subject is not None
+            devclass = event.split(":")[1]
+            port_id = kwargs.get("port", ":").split(":")[1]
             try:
-                handler(subject, event, **kwargs)
-            except:  # pylint: disable=bare-except
-                self.app.log.exception(
-                    'Failed to handle event: %s, %s, %s',
-                    subject, event, kwargs)
+                del subject.devices[devclass]._dev_cache[port_id]
+            except KeyError:
+                pass
+
+    def _update_device_index(self, subject: QubesVM, event: str,
+                             kwargs: dict[str, str]) -> None:
+        '''Update index of devices exposed by *subject* on `device-added`.
+
+        The event carries only device identity, so a new device needs to be
+        looked up on the next access; other entries of the index stay valid.
+        '''
+        # pylint: disable=protected-access
+        devclass = event.split(":", 1)[1]
+        collection = subject.devices[devclass]
+        try:
+            device = VirtualDevice.from_str(
+                kwargs["device"], devclass, self.app.domains, blind=True)
+        except (KeyError, ValueError):
+            collection._dev_cache_complete = False
+            return
+        cached = collection._dev_cache.get(device.port_id)
+        if cached is None or cached.device_id != device.device_id:
+            collection._dev_cache.pop(device.port_id, None)
+            collection._dev_cache_complete = False
+
+    @staticmethod
+    def _cache_update_key(subject_name: str | None, event: str,
+                          kwargs: dict[str, str]) -> tuple | None:
+        '''Get key identifying cache entries updated by the event: a later
+        event with the same key supersedes it. Return None for events that
+        can't be coalesced.'''
+        group, _, name = event.partition(':')
+        if group in ('property-set', 'property-reset'):
+            return subject_name, 'property', name
+        if group in ('domain-feature-set', 'domain-feature-delete'):
+            return subject_name, 'feature', name
+        if group in ('domain-tag-add', 'domain-tag-delete'):
+            return subject_name, 'tag', name
+        if event in EventsDispatcher.POWER_STATE_EVENTS:
+            return subject_name, 'power'
+        if group.startswith('device-'):
+            return subject_name, event, \
+                kwargs.get('port', kwargs.get('device'))
+        return None
+
+    def _queue_cache_update(self, key: tuple, subject: QubesVM | None,
+                            event: str, kwargs: dict[str, str]) -> None:
+        '''Delay cache update, see *coalesce_delay*'''
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._update_cache(subject, event, kwargs)
+            return
+        if key not in self._cache_updates and \
+                len(self._cache_updates) >= self.coalesce_limit:
+            if self.coalesce_overflow == 'flush':
+                self.flush_cache_updates()
+            else:
+                self.app.log.warning(
+                    'Too many cache updates queued, invalidating whole cache')
+                self._drop_cache_updates()
+                # pylint: disable=protected-access
+                self.app._invalidate_cache_all()
+                return
+        # keep only the latest update for the key
+        self._cache_updates.pop(key, None)
+        self._cache_updates[key] = (subject, event, dict(kwargs))
+        if self._cache_updates_timer is None:
+            self._cache_updates_timer = loop.call_later(
+                self.coalesce_delay, self.flush_cache_updates)
+
+    def _drop_cache_updates(self) -> None:
+        '''Drop delayed cache updates, without applying them'''
+        if self._cache_updates_timer is not None:
+            self._cache_updates_timer.cancel()
+            self._cache_updates_timer = None
+        self._cache_updates.clear()
+
+    def flush_cache_updates(self) -> None:
+        '''Apply delayed cache updates now, see *coalesce_delay*'''
+        updates = list(self._cache_updates.values())
+        self._drop_cache_updates()
+        for subject, event, kwargs in updates:
+            self._update_cache(subject, event, kwargs)
+
+    @property
+    def handler_stats(self) -> dict[Handler, dict[str, int | float]]:
+        '''Statistics of each registered handler that was called:
+
+         - `calls` - number of finished calls
+         - `errors` - calls that raised an exception
+         - `pending` - calls not finished yet (queued or running)
+         - `max_pending` - highest number of pending calls seen
+         - `latency` - total time from receiving an event to finishing
+           the call, in seconds
+         - `max_latency` - the longest such time, in seconds
+        '''
+        return {handler: dict(stats)
+                for handler, stats in self._handler_stats.items()}
+
+    def _call_handler(self, handler: Handler, subject: QubesVM | None,
+                      event: str, kwargs: dict[str, Any]) -> None:
+        '''Call a single handler, directly, as a task or in the thread pool
+        '''
+        stats = self._handler_stats.get(handler)
+        if stats is None:
+            stats = self._handler_stats[handler] = dict.fromkeys(
+                ('calls', 'errors', 'pending', 'max_pending',
+                 'latency', 'max_latency'), 0)
+        stats['pending'] += 1
+        stats['max_pending'] = max(stats['max_pending'], stats['pending'])
+        received = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None and self.handler_workers and \
+                not inspect.iscoroutinefunction(handler):
+            queue = self._handler_queues.setdefault(handler,
+                                                    collections.deque())
+            queue.append((received, subject, event, kwargs))
+            if len(queue) == 1:
+                self._submit_handler(loop, handler)
+            return
+
+        try:
+            result = handler(subject, event, **kwargs)
+        except:  # pylint: disable=bare-except
+            self._handler_done(handler, received, subject, event, kwargs,
+                               failed=True)
+            return
+        if not inspect.isawaitable(result):
+            self._handler_done(handler, received, subject, event, kwargs)
+            return
+        if loop is None:
+            if inspect.iscoroutine(result):
+                result.close()
+            self.app.log.error(
+                'Coroutine handler called without running event loop: '
+                '%s, %s, %s', subject, event, kwargs)
+            self._handler_done(handler, received, subject, event, kwargs)
+            return
+        task = loop.create_task(self._await_handler(
+            result, handler, received, subject, event, kwargs))
+        self._handler_tasks.add(task)
+        task.add_done_callback(self._handler_tasks.discard)
+
+    async def _await_handler(self, result: typing.Awaitable,
+                             handler: Handler, received: float,
+                             subject: QubesVM | None, event: str,
+                             kwargs: dict[str, Any]) -> None:
+        '''Wait for a coroutine handler to finish'''
+        try:
+            await result
+        except asyncio.CancelledError:
+            self._handler_done(handler, received, subject, event, kwargs)
+            raise
+        except:  # pylint: disable=bare-except
+            self._handler_done(handler, received, subject, event, kwargs,
+                               failed=True)
+        else:
+            self._handler_done(handler, received, subject, event, kwargs)
+
+    def _submit_handler(self, loop: asyncio.AbstractEventLoop,
+                        handler: Handler) -> None:
+        '''Run the first queued call of a handler in the thread pool'''
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.handler_workers,
+                thread_name_prefix='qubesadmin-events')
+        _received, subject, event, kwargs = \
+            self._handler_queues[handler][0]
+        future = loop.run_in_executor(
+            self._executor, self._call_in_thread,
+            handler, subject, event, kwargs)
+        future.add_done_callback(
+            functools.partial(self._handler_thread_done, loop, handler))
+
+    @staticmethod
+    def _call_in_thread(handler: Handler, subject: QubesVM | None,
+                        event: str, kwargs: dict[str, Any]) \
+            -> BaseException | None:
+        '''Call a handler in the thread pool, return exception raised by it
+        (some, like StopIteration, can't be set on a future)'''
+        try:
+            handler(subject, event, **kwargs)
+        except BaseException as exc:  # pylint: disable=broad-except
+            return exc
+        return None
+
+    def _handler_thread_done(self, loop: asyncio.AbstractEventLoop,
+                             handler: Handler, future: asyncio.Future) -> None:
+        '''Finish a handler call made in the thread pool and start the next
+        one'''
+        queue = self._handler_queues[handler]
+        received, subject, event, kwargs = queue.popleft()
+        if future.cancelled():
+            exc = None
+        else:
+            exc = future.exception() or future.result()
+        self._handler_done(handler, received, subject, event, kwargs,
+                           failed=exc is not None, exc=exc)
+        if queue:
+            self._submit_handler(loop, handler)
+        else:
+            del self._handler_queues[handler]
+            if not self._handler_queues and \
+                    self._handler_queues_empty is not None:
+                self._handler_queues_empty.set()
+
+    def _handler_done(self, handler: Handler, received: float,
+                      subject: QubesVM | None, event: str,
+                      kwargs: dict[str, Any], failed: bool=False,
+                      exc: BaseException | None=None) -> None:
+        '''Update statistics after a handler call, log its failure'''
+        if failed:
+            self._stats['handler_errors'] += 1
+            self.app.log.error(
+                'Failed to handle event: %s, %s, %s',
+                subject, event, kwargs,
+                exc_info=exc if exc is not None else True)
+        latency = time.monotonic() - received
+        stats = self._handler_stats.get(handler)
+        if stats is None:
+            # handler removed in the meantime
+            return
+        stats['pending'] -= 1
+        stats['calls'] += 1
+        if failed:
+            stats['errors'] += 1
+        stats['latency'] += latency
+        stats['max_latency'] = max(stats['max_latency'], latency)
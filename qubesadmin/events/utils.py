@@ -59,4 +59,4 @@ async def wait_for_domain_shutdown(vms: Iterable[QubesVM]) -> None:
         functools.partial(interrupt_on_vm_shutdown, vms, events))
     events.add_handler('connection-established',
         functools.partial(interrupt_on_vm_shutdown, vms, events))
-    await events.listen_for_events()
+    await events.listen_for_events(vms=vms)
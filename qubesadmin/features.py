@@ -25,6 +25,8 @@ import typing
 from typing import TypeVar
 from collections.abc import Iterator, Generator
 
+import qubesadmin.exc
+
 if typing.TYPE_CHECKING:
     from qubesadmin.vm import QubesVM
 
@@ -45,34 +47,98 @@ class Features:
     def __init__(self, vm: QubesVM):
         super().__init__()
         self.vm = vm
+        #: features values cache, maintained when
+        #: :py:attr:`qubesadmin.app.QubesBase.cache_enabled` is set
+        self._values_cache: dict[str, str] = {}
+        #: features list cache, `None` means "not cached (yet)",
+        #: in contrast to empty list which means "cached empty list"
+        self._names_cache: list[str] | None = None
 
     def __delitem__(self, key: str) -> None:
         self.vm.qubesd_call(self.vm.name, 'admin.vm.feature.Remove', key)
+        self._cache_delete(key)
 
     def __setitem__(self, key: str, value: object) -> None:
         if isinstance(value, bool):
             # False value needs to be serialized as empty string
-            self.vm.qubesd_call(self.vm.name, 'admin.vm.feature.Set', key,
-                b'1' if value else b'')
+            value = '1' if value else ''
         else:
-            self.vm.qubesd_call(self.vm.name, 'admin.vm.feature.Set', key,
-                str(value).encode())
+            value = str(value)
+        self.vm.qubesd_call(self.vm.name, 'admin.vm.feature.Set', key,
+            value.encode())
+        self._cache_set(key, value)
 
     def __getitem__(self, item: str) -> str:
-        return self.vm.qubesd_call(
+        if item in self._values_cache:
+            return self._values_cache[item]
+        if self._names_cache is not None and item not in self._names_cache:
+            raise qubesadmin.exc.QubesFeatureNotFoundError(
+                'Feature not set for domain %s: %s', str(self.vm), item)
+        value = self.vm.qubesd_call(
             self.vm.name, 'admin.vm.feature.Get', item).decode('utf-8')
+        if self.vm.app.cache_enabled:
+            self._values_cache[item] = value
+        return value
 
     def __iter__(self) -> Iterator[str]:
+        if self._names_cache is not None:
+            return iter(list(self._names_cache))
         qubesd_response = self.vm.qubesd_call(self.vm.name,
             'admin.vm.feature.List')
-        return iter(qubesd_response.decode('utf-8').splitlines())
+        names = qubesd_response.decode('utf-8').splitlines()
+        if self.vm.app.cache_enabled:
+            self._names_cache = names
+        return iter(names)
 
     keys = __iter__
 
     def items(self) -> Generator[tuple[str, str]]:
         '''Return iterable of pairs (feature, value)'''
-        for key in self:
-            yield key, self[key]
+        yield from self.get_all().items()
+
+    def get_all(self) -> dict[str, str]:
+        '''Get all features of the qube, with their values.
+
+        Values are retrieved using concurrent calls, instead of one call after
+        another. If the cache is enabled, values already cached are not
+        retrieved again.
+        '''
+        keys = list(self)
+        missing = [key for key in keys if key not in self._values_cache]
+        results = self.vm.app.qubesd_call_many(
+            (self.vm.name, 'admin.vm.feature.Get', key) for key in missing)
+        fetched = {}
+        for key, value in zip(missing, results):
+            if isinstance(value, KeyError):
+                # removed in the meantime
+                continue
+            if isinstance(value, Exception):
+                raise value
+            fetched[key] = value.decode('utf-8')
+        if self.vm.app.cache_enabled:
+            self._values_cache.update(fetched)
+        return {key: self._values_cache.get(key, fetched.get(key))
+                for key in keys
+                if key in self._values_cache or key in fetched}
+
+    def _cache_set(self, key: str, value: str) -> None:
+        '''Update cached feature value, if the cache is enabled'''
+        if not self.vm.app.cache_enabled:
+            return
+        self._values_cache[key] = value
+        if self._names_cache is not None and key not in self._names_cache:
+            self._names_cache.append(key)
+
+    def _cache_delete(self, key: str) -> None:
+        '''Remove feature from the cache'''
+        self._values_cache.pop(key, None)
+        if self._names_cache is not None and key in self._names_cache:
+            self._names_cache.remove(key)
+
+    def clear_cache(self) -> None:
+        '''Clear cached features'''
+        self._values_cache.clear()
+        self._names_cache = None
 
     NO_DEFAULT = object()
 
@@ -97,8 +163,20 @@ class Features:
     # Overloaded to handle default None return type
     def check_with_template(self, feature: str,
                             default: object = None) -> object:
-        ''' Check if the vm's template has the specified feature. '''
+        ''' Check if the vm's template has the specified feature.
+
+        When the cache is enabled, the answer is resolved locally from
+        features of the qube and its template chain (see
+        :py:meth:`get_all`). Admin API is asked directly, if some part of the
+        chain is not accessible (for example because of qrexec policy).
+        '''
         try:
+            if self.vm.app.cache_enabled:
+                try:
+                    return self._check_with_template_cached(feature)
+                except (qubesadmin.exc.QubesDaemonAccessError,
+                        qubesadmin.exc.QubesVMNotFoundError):
+                    pass
             qubesd_response = self.vm.qubesd_call(
                 self.vm.name, 'admin.vm.feature.CheckWithTemplate', feature)
             return qubesd_response.decode('utf-8')
@@ -106,3 +184,30 @@ class Features:
             if default is self.NO_DEFAULT:
                 raise
             return default
+
+    def _check_with_template_cached(self, feature: str) -> str:
+        '''Resolve feature value over the template chain, the same way
+        as admin.vm.feature.CheckWithTemplate does, but using cached
+        features.
+
+        :raises QubesFeatureNotFoundError: feature not set in the whole chain
+        :raises QubesDaemonAccessError: part of the chain is not accessible
+        '''
+        vm = self.vm
+        while True:
+            features = vm.features.get_all()
+            if feature in features:
+                return features[feature]
+            try:
+                template = vm.template
+            except AttributeError as e:
+                # QubesPropertyAccessError is an AttributeError too, but it
+                # does not mean there is no template
+                if isinstance(e, qubesadmin.exc.QubesDaemonAccessError):
+                    raise
+                template = None
+            if template is None:
+                raise qubesadmin.exc.QubesFeatureNotFoundError(
+                    'Feature not set for domain %s: %s', str(self.vm),
+                    feature)
+            vm = template
@@ -55,7 +55,11 @@ class Volume:
         self._vid = vid
         self._vm = vm
         self._vm_name = vm_name
-        self._info = None
+        self._info: dict[str, str] | None = None
+        #: self._info was retrieved by :py:meth:`QubesBase.prefetch` and
+        #: should be used even if refresh is requested, until invalidated
+        #: (by a change made through this object, or a power state event)
+        self._info_prefetched = False
 
     def _qubesd_call(self, func_name: str, payload: bytes | None = None,
                      payload_stream: IO | None = None) -> bytes:
@@ -92,13 +96,21 @@ class Volume:
 
         Populate self._info dict
 
-        :param bool force: refresh self._info, even if already populated.
+        :param bool force: refresh self._info, even if already populated
+            (unless populated by :py:meth:`QubesBase.prefetch`).
         """
-        if not force and self._info is not None:
+        if self._info is not None and (not force or self._info_prefetched):
             return
-        info = self._qubesd_call('Info')
-        info = info.decode('ascii')
-        self._info = dict([line.split('=', 1) for line in info.splitlines()])
+        self._store_info(self._qubesd_call('Info'))
+        self._info_prefetched = False
+
+    def _store_info(self, info: bytes) -> None:
+        """Parse admin.vm.volume.Info response and populate self._info
+
+        :param bytes info: response data, as retrieved from qubesd
+        """
+        self._info = dict([line.split('=', 1)
+                           for line in info.decode('ascii').splitlines()])
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, Volume):
@@ -283,6 +295,7 @@ class Volume:
                     f" Do this in a VM, not in dom0."
                     f" Then use 'qvm-volume resize --force {vol_str} {size}'")
         self._qubesd_call('Resize', str(size).encode('ascii'))
+        self._info = None
 
     @property
     def revisions(self) -> list[str]:
@@ -296,6 +309,7 @@ class Volume:
         :param str revision: Revision identifier to revert to
         """
         self._qubesd_call('Revert', revision.encode('ascii'))
+        self._info = None
 
     def import_data(self, stream: BinaryIO) -> None:
         """ Import volume data from a given file-like object.
@@ -305,6 +319,7 @@ class Volume:
         :param stream: file-like object, must support fileno()
         """
         self._qubesd_call('Import', payload_stream=stream)
+        self._info = None
 
     def import_data_with_size(self, stream: IO, size: object) -> None:
         """ Import volume data from a given file-like object, informing qubesd
@@ -319,10 +334,12 @@ class Volume:
         self._qubesd_call(
             'ImportWithSize', payload=size_line.encode(),
             payload_stream=stream)
+        self._info = None
 
     def clear_data(self) -> None:
         """ Clear existing volume content. """
         self._qubesd_call('Clear')
+        self._info = None
 
     def clone(self, source: Volume) -> None:
         """ Clone data from sane volume of another VM.
@@ -340,6 +357,7 @@ class Volume:
         token = source._qubesd_call('CloneFrom')
         # and use it to actually clone volume data
         self._qubesd_call('CloneTo', payload=token)
+        self._info = None
 
 
 class Pool:
@@ -38,14 +38,20 @@ class Tags:
     def __init__(self, vm: QubesVM):
         super().__init__()
         self.vm = vm
+        #: tags cache, maintained when
+        #: :py:attr:`qubesadmin.app.QubesBase.cache_enabled` is set;
+        #: `None` means "not cached (yet)"
+        self._cache: set[str] | None = None
 
     def remove(self, elem: str) -> None:
         '''Remove a tag'''
         self.vm.qubesd_call(self.vm.name, 'admin.vm.tag.Remove', elem)
+        self._cache_delete(elem)
 
     def add(self, elem: str) -> None:
         '''Add a tag'''
         self.vm.qubesd_call(self.vm.name, 'admin.vm.tag.Set', elem)
+        self._cache_add(elem)
 
     def update(self, *others) -> None:
         '''Add tags from iterable(s)'''
@@ -60,12 +66,40 @@ class Tags:
         except KeyError:
             pass
 
-    def __iter__(self) -> Iterator[str]:
+    def _list(self) -> list[str]:
+        '''Retrieve list of tags, save it in the cache if enabled'''
         qubesd_response = self.vm.qubesd_call(self.vm.name,
             'admin.vm.tag.List')
-        return iter(qubesd_response.decode('utf-8').splitlines())
+        tags = qubesd_response.decode('utf-8').splitlines()
+        if self.vm.app.cache_enabled:
+            self._cache = set(tags)
+        return tags
+
+    def __iter__(self) -> Iterator[str]:
+        if self._cache is not None:
+            return iter(sorted(self._cache))
+        return iter(self._list())
 
     def __contains__(self, elem: str) -> bool:
         '''Does the VM have a tag'''
+        if self._cache is not None:
+            return elem in self._cache
+        if self.vm.app.cache_enabled:
+            # one call for all the tags, instead of one for each check
+            return elem in self._list()
         response = self.vm.qubesd_call(self.vm.name, 'admin.vm.tag.Get', elem)
         return response == b'1'
+
+    def _cache_add(self, elem: str) -> None:
+        '''Add a tag to the cache, if it is populated'''
+        if self._cache is not None:
+            self._cache.add(elem)
+
+    def _cache_delete(self, elem: str) -> None:
+        '''Remove a tag from the cache, if it is populated'''
+        if self._cache is not None:
+            self._cache.discard(elem)
+
+    def clear_cache(self) -> None:
+        '''Clear cached tags'''
+        self._cache = None
@@ -20,11 +20,13 @@
 
 # pylint: disable=missing-docstring
 
+import asyncio
 import os
 import shutil
 import socket
 import subprocess
 import sys
+import threading
 import unittest
 
 import multiprocessing
@@ -187,6 +189,101 @@ class TC_00_VMCollection(qubesadmin.tests.QubesTestCase):
         self.assertIsNot(vm1, vm4)
         self.assertAllCalled()
 
+    def test_013_events_incremental(self):
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        list_call = ('dom0', 'admin.vm.List', None, None)
+        self.app.expected_calls[list_call] = \
+            b'0\x00test-vm class=AppVM state=Running\n'
+        self.app.expected_calls[('disp123', 'admin.vm.List', None, None)] = \
+            b'0\x00disp123 class=DispVM state=Halted\n'
+        self.app.expected_calls[('renamed', 'admin.vm.List', None, None)] = \
+            b'0\x00renamed class=AppVM state=Running\n'
+        self.app.expected_calls[('disp456', 'admin.vm.List', None, None)] = \
+            b'2\x00QubesVMNotFoundError\x00\x00No such domain\x00'
+        old_vm = self.app.domains['test-vm']
+        dispatcher.handle('', 'domain-add', vm='disp123')
+        self.assertEqual(sorted(self.app.domains.keys()),
+                         ['disp123', 'test-vm'])
+        self.assertEqual(self.app.domains['disp123'].klass, 'DispVM')
+        dispatcher.handle('', 'domain-delete', vm='disp123')
+        self.assertNotIn('disp123', self.app.domains)
+        # removed before the event was handled
+        dispatcher.handle('', 'domain-add', vm='disp456')
+        self.assertNotIn('disp456', self.app.domains)
+        dispatcher.handle('renamed', 'property-set:name', name='name',
+                          newvalue='renamed', oldvalue='test-vm')
+        self.assertEqual(list(self.app.domains.keys()), ['renamed'])
+        self.assertIsNot(self.app.domains['renamed'], old_vm)
+        # the full list was retrieved only once
+        self.assertEqual(self.app.actual_calls.count(list_call), 1)
+        self.assertAllCalled()
+
+    def test_014_recreated(self):
+        list_call = ('dom0', 'admin.vm.List', None, None)
+        self.app.expected_calls[list_call] = \
+            b'0\x00test-vm class=AppVM state=Running uuid=uuid1\n' \
+            b'test-vm2 class=AppVM state=Running uuid=uuid2\n'
+        vm1 = self.app.domains['test-vm']
+        vm2 = self.app.domains['test-vm2']
+        self.assertEqual(vm1.generation,
+                         self.app.domains.generation('test-vm'))
+        # test-vm removed and created again, while nobody was looking
+        self.app.expected_calls[list_call] = \
+            b'0\x00test-vm class=AppVM state=Running uuid=uuid3\n' \
+            b'test-vm2 class=AppVM state=Running uuid=uuid2\n'
+        self.app.domains.clear_cache()
+        new_vm1 = self.app.domains['test-vm']
+        self.assertIsNot(new_vm1, vm1)
+        self.assertNotEqual(vm1.generation,
+                            self.app.domains.generation('test-vm'))
+        self.assertEqual(new_vm1.generation,
+                         self.app.domains.generation('test-vm'))
+        self.assertIs(self.app.domains['test-vm2'], vm2)
+        self.assertEqual(vm2.generation,
+                         self.app.domains.generation('test-vm2'))
+        self.assertAllCalled()
+
+    def test_015_add_event_same_uuid(self):
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00test-vm class=AppVM state=Running uuid=uuid1\n'
+        self.app.expected_calls[('test-vm', 'admin.vm.List', None, None)] = \
+            b'0\x00test-vm class=AppVM state=Running uuid=uuid1\n'
+        vm = self.app.domains['test-vm']
+        generation = self.app.domains.generation('test-vm')
+        # object created just before the event is kept
+        dispatcher.handle('', 'domain-add', vm='test-vm')
+        self.assertIs(self.app.domains['test-vm'], vm)
+        self.assertEqual(self.app.domains.generation('test-vm'), generation)
+        dispatcher.handle('', 'domain-delete', vm='test-vm')
+        self.assertNotEqual(self.app.domains.generation('test-vm'),
+                            vm.generation)
+        self.assertAllCalled()
+
+    def test_016_list_parse(self):
+        # pylint: disable=protected-access
+        self.app.cache_enabled = True
+        self.assertEqual(self.app.domains._parse_vm_list(
+            b'test-vm class=AppVM state=Running\n'
+            b'test-vm2 class=DispVM state=Halted uuid=uuid2\n'), {
+            'test-vm': qubesadmin.app.VMListEntry('AppVM', 'Running', None),
+            'test-vm2': qubesadmin.app.VMListEntry('DispVM', 'Halted',
+                                                   'uuid2'),
+        })
+        # unexpected format
+        self.assertEqual(self.app.domains._parse_vm_list(
+            b'test-vm class=AppVM state=Running\n'
+            b'test-vm2 state=Halted class=DispVM other=value'), {
+            'test-vm': qubesadmin.app.VMListEntry('AppVM', 'Running', None),
+            'test-vm2': qubesadmin.app.VMListEntry('DispVM', 'Halted', None),
+        })
+        self.app.cache_enabled = False
+        self.assertEqual(self.app.domains._parse_vm_list(
+            b'test-vm class=AppVM state=Running uuid=uuid1\n'), {
+            'test-vm': qubesadmin.app.VMListEntry('AppVM', None, 'uuid1'),
+        })
+        self.assertEqual(self.app.domains._parse_vm_list(b''), {})
+
 
 class TC_10_QubesBase(qubesadmin.tests.QubesTestCase):
     def setUp(self):
@@ -290,6 +387,27 @@ class TC_10_QubesBase(qubesadmin.tests.QubesTestCase):
             self.app.get_label('green')
         self.assertAllCalled()
 
+    def test_025_qubesd_call_many(self):
+        self.app.expected_calls[('vm1', 'admin.vm.feature.Get', 'os', None)] = \
+            b'0\x00Linux'
+        self.app.expected_calls[('vm2', 'admin.vm.feature.Get', 'os', None)] = \
+            b'2\x00QubesFeatureNotFoundError\x00\x00os\x00'
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n'
+        for concurrency in (1, 4):
+            results = self.app.qubesd_call_many([
+                ('vm1', 'admin.vm.feature.Get', 'os'),
+                ('vm2', 'admin.vm.feature.Get', 'os', None),
+                ('dom0', 'admin.vm.List'),
+            ], concurrency=concurrency)
+            self.assertEqual(len(results), 3)
+            self.assertEqual(results[0], b'Linux')
+            self.assertIsInstance(results[1],
+                qubesadmin.exc.QubesFeatureNotFoundError)
+            self.assertEqual(results[2], b'vm1 class=AppVM state=Running\n')
+        self.assertEqual(self.app.qubesd_call_many([]), [])
+        self.assertAllCalled()
+
     def clone_setup_common_calls(self, src, dst):
         # have each property type with default=no, each special-cased,
         # and some with default=yes
@@ -902,12 +1020,10 @@ class TC_10_QubesBase(qubesadmin.tests.QubesTestCase):
             ('dom0', 'admin.vm.List', None, None)]
         del self.app.expected_calls[
             ('vm1', 'admin.vm.property.GetAll', None, None)]
-        self.app.expected_calls[
-            ('vm1', 'admin.vm.property.Get', 'memory', None)] = \
-            b'0\0default=False type=int 600'
         # this one is cached already
         del self.app.expected_calls[
             ('vm1', 'admin.vm.CurrentState', None, None)]
+        # new value applied from the event, no need to call qubesd
         dispatcher.handle('vm1', 'property-set:memory',
             name='memory', newvalue='600', oldvalue='500')
         self.assertEqual(vm.memory, 600)
@@ -921,6 +1037,310 @@ class TC_10_QubesBase(qubesadmin.tests.QubesTestCase):
         with self.assertRaises(ValueError):
             self.app.add_new_vm('AppVM', 'VM Name with spaces', 'red')
 
+    def test_052_prefetch(self):
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        self.app.expected_calls[
+            ('dom0', 'admin.deviceclass.List', None, None)] = b'0\0test\n'
+        for vm in ('vm1', 'vm2'):
+            self.app.expected_calls[
+                (vm, 'admin.vm.property.GetAll', None, None)] = \
+                b'0\0qid default=False type=int 1\n' \
+                b'memory default=False type=int 400\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.volume.List', None, None)] = b'0\0root\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.volume.Info', 'root', None)] = \
+                b'0\0pool=lvm\nvid=' + vm.encode() + b'-root\nsize=10\n' \
+                b'usage=5\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.device.test.Assigned', None, None)] = b'0\0'
+            self.app.expected_calls[
+                (vm, 'admin.vm.feature.List', None, None)] = b'0\0os\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.feature.Get', 'os', None)] = b'0\0Linux'
+            self.app.expected_calls[
+                (vm, 'admin.vm.tag.List', None, None)] = b'0\0tag1\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.device.test.Attached', None, None)] = \
+            (b"0\0vm2+dev1 backend_domain='vm2' port_id='dev1' "
+             b"mode='manual' devclass='test' frontend_domain='vm1'\n")
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.device.test.Attached', None, None)] = b'0\0'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.CurrentState', None, None)] = \
+            b'0\x00power_state=Running mem=409600'
+        # only running qubes can expose devices
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.device.test.Available', None, None)] = \
+            b'0\0dev2\n'
+
+        self.app.prefetch()
+        self.assertAllCalled()
+
+        # everything should be served from cache now
+        self.app.expected_calls.clear()
+        self.app.actual_calls = []
+        vm1 = self.app.domains['vm1']
+        vm2 = self.app.domains['vm2']
+        self.assertEqual(vm1.memory, 400)
+        self.assertEqual(vm1.get_power_state(), 'Running')
+        self.assertEqual(vm2.get_power_state(), 'Halted')
+        self.assertEqual(vm1.get_mem(), 409600)
+        self.assertEqual(vm1.volumes['root'].usage, 5)
+        self.assertEqual(vm2.volumes['root'].vid, 'vm2-root')
+        self.assertEqual(
+            [a.port_id for a in
+             vm1.devices['test'].get_attached_devices()],
+            ['dev1'])
+        self.assertEqual(
+            list(vm2.devices['test'].get_assigned_devices()), [])
+        self.assertEqual(vm1.devices['test']['dev2'].port_id, 'dev2')
+        self.assertEqual(list(vm1.features.items()), [('os', 'Linux')])
+        self.assertNotIn('gui', vm2.features)
+        self.assertIn('tag1', vm1.tags)
+        self.assertNotIn('tag2', vm2.tags)
+        self.assertEqual(self.app.actual_calls, [])
+
+        # memory usage changes all the time, prefetched value is used once
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.CurrentState', None, None)] = \
+            b'0\x00power_state=Running mem=512000'
+        self.assertEqual(vm1.get_mem(), 512000)
+        self.assertAllCalled()
+
+        # VM start may change volumes state
+        dispatcher.handle('vm2', 'domain-start')
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.volume.Info', 'root', None)] = \
+            b'0\0pool=lvm\nvid=vm2-root\nsize=10\nusage=7\n'
+        self.assertEqual(vm2.volumes['root'].usage, 7)
+        self.assertEqual(vm2.get_power_state(), 'Running')
+        self.assertAllCalled()
+
+    def test_053_prefetch_partial(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'2\0QubesDaemonAccessError\0\0Access denied\0'
+        self.app.prefetch(domains=['vm1'], what=['properties'])
+        self.assertAllCalled()
+        # failed prefetch falls back to regular calls
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.Get', 'memory', None)] = \
+            b'0\0default=False type=int 400'
+        self.assertEqual(self.app.domains['vm1'].memory, 400)
+        with self.assertRaises(ValueError):
+            self.app.prefetch(what=['nonexistent'])
+
+    def test_054_prefetch_no_cache(self):
+        self.app.prefetch()
+        self.assertAllCalled()
+
+    def test_055_property_set_event_value(self):
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Halted\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 1\n' \
+            b'name default=False type=str vm1\n' \
+            b'netvm default=True type=vm vm2\n' \
+            b'label default=False type=label red\n' \
+            b'include_in_backups default=False type=bool True\n' \
+            b'memory default=False type=int 400\n'
+        vm = self.app.domains['vm1']
+        self.assertEqual(vm.memory, 400)
+        self.assertAllCalled()
+        self.app.actual_calls = []
+        del self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)]
+        del self.app.expected_calls[('dom0', 'admin.vm.List', None, None)]
+        dispatcher.handle('vm1', 'property-set:netvm',
+            name='netvm', newvalue='vm1', oldvalue='vm2')
+        dispatcher.handle('vm1', 'property-set:label',
+            name='label', newvalue='blue', oldvalue='red')
+        dispatcher.handle('vm1', 'property-set:include_in_backups',
+            name='include_in_backups', newvalue='False', oldvalue='True')
+        self.assertEqual(vm.netvm, self.app.domains['vm1'])
+        self.assertFalse(vm.property_is_default('netvm'))
+        self.assertEqual(vm.label.name, 'blue')
+        self.assertIs(vm.include_in_backups, False)
+        self.assertEqual(self.app.actual_calls, [])
+        # ambiguous values and reset properties are re-fetched
+        dispatcher.handle('vm1', 'property-set:netvm',
+            name='netvm', newvalue='None', oldvalue='vm1')
+        dispatcher.handle('vm1', 'property-reset:memory',
+            name='memory', oldvalue='400')
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.Get', 'netvm', None)] = \
+            b'0\0default=False type=vm '
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.Get', 'memory', None)] = \
+            b'0\0default=True type=int 500'
+        self.assertIsNone(vm.netvm)
+        self.assertEqual(vm.memory, 500)
+        self.assertAllCalled()
+
+    def test_056_property_set_event_no_cache(self):
+        # pylint: disable=protected-access
+        self.app.cache_enabled = False
+        vm = self.app.domains.get_blind('vm1')
+        vm._property_schema()['memory'] = b'type=int'
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            enable_cache=False)
+        dispatcher.handle('vm1', 'property-set:memory',
+            name='memory', newvalue='600', oldvalue='500')
+        self.assertEqual(vm._properties_cache, {})
+
+    def test_057_revalidate_cache(self):
+        # pylint: disable=protected-access
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            revalidate_cache=True)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Halted\n' \
+            b'vm2 class=AppVM state=Running\n' \
+            b'vm3 class=AppVM state=Running\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 1\n' \
+            b'memory default=False type=int 400\n'
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.tag.List', None, None)] = \
+            b'0\0tag1\n'
+        vm1 = self.app.domains['vm1']
+        vm2 = self.app.domains['vm2']
+        vm3 = self.app.domains['vm3']
+        self.assertEqual(vm1.memory, 400)
+        self.assertEqual(list(vm2.tags), ['tag1'])
+        self.assertEqual(vm3.get_power_state(), 'Running')
+        self.assertAllCalled()
+
+        # vm1 started and got more memory, vm3 removed
+        self.app.actual_calls = []
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Running\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 1\n' \
+            b'memory default=False type=int 500\n'
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.tag.List', None, None)] = \
+            b'0\0tag2\n'
+        dispatcher.handle('', 'connection-established')
+        self.assertEqual(sorted(self.app.actual_calls), [
+            ('dom0', 'admin.vm.List', None, None),
+            ('vm1', 'admin.vm.property.GetAll', None, None),
+            ('vm2', 'admin.vm.tag.List', None, None),
+        ])
+        self.app.actual_calls = []
+        self.assertEqual(vm1.get_power_state(), 'Running')
+        self.assertEqual(vm1.memory, 500)
+        self.assertEqual(list(vm2.tags), ['tag2'])
+        self.assertNotIn('vm3', self.app.domains._vm_objects)
+        self.assertEqual(self.app.actual_calls, [])
+
+    def test_058_revalidate_cache_async(self):
+        # pylint: disable=protected-access
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            revalidate_cache=True)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 1\n' \
+            b'memory default=False type=int 400\n'
+        vm1 = self.app.domains['vm1']
+        self.assertEqual(vm1.memory, 400)
+
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 1\n' \
+            b'memory default=False type=int 500\n'
+        refetch_started, refetch_continue, call_many = \
+            self.gated_qubesd_call_many()
+
+        async def run():
+            with mock.patch.object(self.app, 'qubesd_call_many', call_many):
+                dispatcher.handle('', 'connection-established')
+                # re-fetching does not block events processing
+                await asyncio.get_running_loop().run_in_executor(
+                    None, refetch_started.wait, 5)
+                dispatcher.handle('vm1', 'property-set:memory',
+                    name='memory', newvalue='600', oldvalue='500')
+                refetch_continue.set()
+                while dispatcher._revalidate_events is not None:
+                    await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        self.app.actual_calls = []
+        # value from the event is newer than the re-fetched one
+        self.assertEqual(vm1.memory, 600)
+        self.assertEqual(self.app.actual_calls, [])
+
+    def gated_qubesd_call_many(self):
+        """qubesd_call_many() replacement waiting for an event before
+        the first calls"""
+        started = threading.Event()
+        resume = threading.Event()
+        orig_call_many = self.app.qubesd_call_many
+
+        def call_many(requests, concurrency=None):
+            if not started.is_set():
+                started.set()
+                resume.wait(5)
+            return orig_call_many(requests, concurrency)
+        return started, resume, call_many
+
+    def test_059_revalidate_cache_domain_add(self):
+        # pylint: disable=protected-access
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            revalidate_cache=True)
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.tag.List', None, None)] = b'0\0tag1\n'
+        vm1 = self.app.domains['vm1']
+        self.assertEqual(list(vm1.tags), ['tag1'])
+        refetch_started, refetch_continue, call_many = \
+            self.gated_qubesd_call_many()
+
+        async def run():
+            with mock.patch.object(self.app, 'qubesd_call_many', call_many), \
+                    mock.patch.object(self.app.log, 'error') as log_error:
+                dispatcher.handle('', 'connection-established')
+                await asyncio.get_running_loop().run_in_executor(
+                    None, refetch_started.wait, 5)
+                # qube added while the list of qubes is re-fetched
+                dispatcher.handle('', 'domain-add', vm='vm2')
+                dispatcher.handle('vm2', 'domain-start')
+                refetch_continue.set()
+                while dispatcher._revalidate_events is not None:
+                    await asyncio.sleep(0.01)
+            self.assertFalse(log_error.called)
+
+        asyncio.run(run())
+        self.assertEqual(list(vm1.tags), ['tag1'])
+        # re-fetched list of qubes may miss the new one, it's listed again
+        self.app.expected_calls[('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Running\n'
+        self.assertIn('vm2', self.app.domains)
+        self.assertIs(self.app.domains['vm1'], vm1)
+        self.assertAllCalled()
+
 
 class TC_20_QubesLocal(unittest.TestCase):
     def setUp(self):
@@ -1120,6 +1540,30 @@ class TC_20_QubesLocal(unittest.TestCase):
         )
 
 
+    def test_020_qubesd_call_async(self):
+        self.listen_and_send(b'0\0return-value')
+        app = qubesadmin.app.AsyncQubesLocal()
+        value = asyncio.run(app.qubesd_call_async(
+            'test-vm', 'some.method', 'arg1', b'payload'))
+        self.assertEqual(value, b'return-value')
+        self.assertEqual(self.get_request(),
+            b'some.method+arg1 dom0 name test-vm\0payload')
+
+    def test_021_qubesd_call_async_error(self):
+        self.listen_and_send(
+            b'2\0QubesVMNotStartedError\0\0Domain is powered off\0')
+        app = qubesadmin.app.AsyncQubesLocal()
+        with self.assertRaises(qubesadmin.exc.QubesVMNotStartedError):
+            asyncio.run(app.domains.get_blind('test-vm').kill_async())
+        self.assertEqual(self.get_request(),
+            b'admin.vm.Kill+ dom0 name test-vm\0')
+
+    def test_022_qubesd_call_async_no_qubesd(self):
+        app = qubesadmin.app.AsyncQubesLocal()
+        with self.assertRaises(qubesadmin.exc.QubesDaemonCommunicationError):
+            asyncio.run(app.qubesd_call_async('test-vm', 'some.method'))
+
+
 class TC_30_QubesRemote(unittest.TestCase):
     def setUp(self):
         super().setUp()
@@ -1313,3 +1757,31 @@ class TC_30_QubesRemote(unittest.TestCase):
             stdin=subprocess.PIPE, stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
+
+    def test_020_qubesd_call_async(self):
+        app = qubesadmin.app.AsyncQubesRemote()
+        proc = mock.Mock(returncode=0)
+        proc.communicate = mock.AsyncMock(
+            return_value=(b'0\x00return-value', b''))
+        with mock.patch('asyncio.create_subprocess_exec',
+                        mock.AsyncMock(return_value=proc)) as mock_exec:
+            value = asyncio.run(app.qubesd_call_async(
+                'test-vm', 'some.method', 'arg1', b'payload'))
+        self.assertEqual(value, b'return-value')
+        mock_exec.assert_called_once_with(
+            qubesadmin.config.QREXEC_CLIENT_VM, 'test-vm',
+            'some.method+arg1',
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        proc.communicate.assert_called_once_with(b'payload')
+        # the regular one should not be used
+        self.assertFalse(self.proc_mock.called)
+
+    def test_021_qubesd_call_async_error(self):
+        app = qubesadmin.app.AsyncQubesRemote()
+        proc = mock.Mock(returncode=1)
+        proc.communicate = mock.AsyncMock(return_value=(b'', b'Denied'))
+        with mock.patch('asyncio.create_subprocess_exec',
+                        mock.AsyncMock(return_value=proc)):
+            with self.assertRaises(qubesadmin.exc.QubesDaemonAccessError):
+                asyncio.run(app.qubesd_call_async('test-vm', 'some.method'))
@@ -0,0 +1,253 @@
+# -*- encoding: utf-8 -*-
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2026 agent <agent@local>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program; if not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+
+import io
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import qubesadmin.app
+import qubesadmin.config
+import qubesadmin.connection
+import qubesadmin.exc
+
+
+class FakeQubesd:
+    '''Minimal qubesd mock: accepts connections, reads a request until EOF
+    and echoes it back as a successful response.'''
+    def __init__(self, path):
+        self.requests = []
+        self.accepted = []
+        #: set when the first connection is accepted
+        self.accepted_event = threading.Event()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(16)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted.append(conn)
+            self.accepted_event.set()
+            threading.Thread(target=self.handle, args=(conn,),
+                daemon=True).start()
+
+    def handle(self, conn):
+        with conn.makefile('rb') as request_f:
+            request = request_f.read()
+        if request:
+            self.requests.append(request)
+            conn.sendall(b'0\0' + request)
+        conn.close()
+
+    def close(self):
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+        self.thread.join()
+
+
+class TC_00_ConnectionPool(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.socket_dir)
+        self.path = os.path.join(self.socket_dir, 'sock')
+        self.qubesd = FakeQubesd(self.path)
+        self.addCleanup(self.qubesd.close)
+
+    def test_000_oneshot(self):
+        pool = qubesadmin.connection.ConnectionPool(size=0, path=self.path)
+        self.assertEqual(pool.call(b'request'), b'0\0request')
+        self.assertEqual(pool.stats, {
+            'calls': 1, 'pooled': 0, 'oneshot': 1, 'stale': 0,
+            'connects': 1, 'idle': 0})
+
+    def test_001_pooled(self):
+        pool = qubesadmin.connection.ConnectionPool(size=2, path=self.path)
+        self.addCleanup(pool.close)
+        pool.fill()
+        self.assertEqual(pool.stats['idle'], 2)
+        self.assertEqual(pool.call(b'request1'), b'0\0request1')
+        self.assertEqual(pool.call(b'request2'), b'0\0request2')
+        stats = pool.stats
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['pooled'], 2)
+        self.assertEqual(stats['oneshot'], 0)
+        self.assertEqual(stats['idle'], 2)
+        self.assertEqual(stats['connects'], 4)
+
+    def test_002_stale(self):
+        pool = qubesadmin.connection.ConnectionPool(size=1, path=self.path)
+        self.addCleanup(pool.close)
+        pool.fill()
+        # qubesd restarted - drop the connection from the server side
+        self.assertTrue(self.qubesd.accepted_event.wait(5))
+        self.qubesd.accepted[0].shutdown(socket.SHUT_RDWR)
+        self.assertEqual(pool.call(b'request'), b'0\0request')
+        stats = pool.stats
+        self.assertEqual(stats['stale'], 1)
+        self.assertEqual(stats['oneshot'], 1)
+        self.assertEqual(stats['pooled'], 0)
+
+    def test_003_close(self):
+        pool = qubesadmin.connection.ConnectionPool(size=2, path=self.path)
+        pool.fill()
+        pool.close()
+        self.assertEqual(pool.stats['idle'], 0)
+        # still usable, but without pre-connecting
+        self.assertEqual(pool.call(b'request'), b'0\0request')
+        self.assertEqual(pool.stats['idle'], 0)
+
+    def test_004_connect_error(self):
+        pool = qubesadmin.connection.ConnectionPool(
+            size=1, path=self.path + '-missing')
+        with self.assertRaises(qubesadmin.exc.QubesDaemonCommunicationError):
+            pool.call(b'request')
+
+    def test_010_app(self):
+        orig_sock = qubesadmin.config.QUBESD_SOCKET
+        qubesadmin.config.QUBESD_SOCKET = self.path
+        self.addCleanup(setattr, qubesadmin.config, 'QUBESD_SOCKET',
+            orig_sock)
+        app = qubesadmin.app.QubesLocal()
+        app.connection_pool = qubesadmin.connection.ConnectionPool(size=1)
+        self.addCleanup(app.connection_pool.close)
+        self.assertEqual(
+            app.qubesd_call('test-vm', 'some.method', 'arg1', b'payload'),
+            b'some.method+arg1 dom0 name test-vm\0payload')
+        self.assertEqual(
+            app.qubesd_call('test-vm', 'some.method'),
+            b'some.method+ dom0 name test-vm\0')
+        self.assertEqual(app.connection_pool.stats['pooled'], 1)
+
+
+def frame(body):
+    return struct.pack('>I', len(body)) + body
+
+
+class TC_10_QrexecChannel(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.proc = mock.Mock()
+        self.proc.stdin = io.BytesIO()
+        self.proc.stdin.close = lambda: None
+        self.popen_patch = mock.patch('subprocess.Popen',
+            return_value=self.proc)
+        self.popen_mock = self.popen_patch.start()
+        self.addCleanup(self.popen_patch.stop)
+
+    def set_responses(self, *frames):
+        self.proc.stdout = io.BytesIO(b''.join(frames))
+
+    def test_000_call(self):
+        self.set_responses(frame(b'1'), frame(b'0\0value1'),
+            frame(b'0\0value2'))
+        channel = qubesadmin.connection.QrexecChannel()
+        self.assertEqual(channel.call('test-vm', 'some.method+arg1',
+            b'payload'), b'0\0value1')
+        self.assertEqual(channel.call('dom0', 'other.method'), b'0\0value2')
+        self.assertTrue(channel.supported)
+        self.popen_mock.assert_called_once_with(
+            [qubesadmin.config.QREXEC_CLIENT_VM, 'dom0',
+             qubesadmin.config.QREXEC_CHANNEL_SERVICE],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+        self.assertEqual(self.proc.stdin.getvalue(),
+            frame(b'some.method+arg1 test-vm\0payload') +
+            frame(b'other.method dom0\0'))
+
+    def test_001_unsupported(self):
+        # service refused - no version frame
+        self.set_responses()
+        channel = qubesadmin.connection.QrexecChannel()
+        self.assertIsNone(channel.call('test-vm', 'some.method'))
+        self.assertIs(channel.supported, False)
+        # do not retry
+        self.assertIsNone(channel.call('test-vm', 'some.method'))
+        self.assertEqual(self.popen_mock.call_count, 1)
+
+    def test_002_unsupported_version(self):
+        self.set_responses(frame(b'2'))
+        channel = qubesadmin.connection.QrexecChannel()
+        self.assertIsNone(channel.call('test-vm', 'some.method'))
+        self.assertIs(channel.supported, False)
+
+    def test_003_interrupted(self):
+        self.set_responses(frame(b'1'), b'\0\0')
+        channel = qubesadmin.connection.QrexecChannel()
+        with self.assertRaises(qubesadmin.exc.QubesDaemonCommunicationError):
+            channel.call('test-vm', 'some.method')
+        self.assertTrue(self.proc.kill.called)
+        # reconnect on the next call
+        self.set_responses(frame(b'1'), frame(b'0\0value'))
+        self.assertEqual(channel.call('test-vm', 'some.method'),
+            b'0\0value')
+        self.assertEqual(self.popen_mock.call_count, 2)
+
+    def test_004_handshake_timeout(self):
+        # service call accepted, but the version frame never comes (e.g.
+        # waiting for user confirmation)
+        read_fd, write_fd = os.pipe()
+        self.proc.stdout = os.fdopen(read_fd, 'rb')
+        self.addCleanup(self.proc.stdout.close)
+        write_pipe = os.fdopen(write_fd, 'wb')
+        self.proc.kill.side_effect = write_pipe.close
+        channel = qubesadmin.connection.QrexecChannel(handshake_timeout=0.1)
+        self.assertIsNone(channel.call('test-vm', 'some.method'))
+        self.assertIs(channel.supported, False)
+        self.assertTrue(self.proc.kill.called)
+
+    def test_010_app(self):
+        self.set_responses(frame(b'1'), frame(b'0\0value'))
+        app = qubesadmin.app.QubesRemote()
+        app.qrexec_channel = qubesadmin.connection.QrexecChannel()
+        self.assertEqual(app.qubesd_call('test-vm', 'some.method', 'arg1'),
+            b'value')
+        self.assertEqual(self.popen_mock.call_count, 1)
+
+    def test_011_app_fallback(self):
+        self.set_responses()
+        app = qubesadmin.app.QubesRemote()
+        app.qrexec_channel = qubesadmin.connection.QrexecChannel()
+        self.proc.configure_mock(**{
+            'returncode': 0,
+            '__enter__': mock.Mock(return_value=self.proc),
+            '__exit__': mock.Mock(return_value=False),
+            'communicate.return_value': (b'0\0value', b''),
+        })
+        self.assertEqual(app.qubesd_call('test-vm', 'some.method', 'arg1'),
+            b'value')
+        self.assertEqual(self.popen_mock.call_args_list[-1],
+            mock.call([qubesadmin.config.QREXEC_CLIENT_VM, 'test-vm',
+                'some.method+arg1'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE))
@@ -468,3 +468,38 @@ class TC_00_DeviceCollection(qubesadmin.tests.QubesTestCase):
             "8765:4321:0123456789:?*******",
         )
         self.assertAllCalled()
+
+    def test_101_device_index(self):
+        dispatcher = EventsDispatcher(self.app)
+        handler = mock.Mock()
+        dispatcher.add_handler("device-*", handler)
+        available = ("test-vm", "admin.vm.device.test.Available", None, None)
+        self.app.expected_calls[available] = (
+            serialized_test_device
+            + b"device_id='1234:5678:0123456789:?*******'\n"
+        )
+        vm = self.app.domains.get("test-vm")
+        # populate the index
+        list(vm.devices["test"])
+        self.assertEqual(self.app.actual_calls.count(available), 1)
+        # removed device is not looked up again
+        dispatcher.handle("test-vm", "device-removed:test",
+                          port="test-vm:dev1")
+        self.assertIsInstance(vm.devices["test"]["dev1"], UnknownDevice)
+        self.assertEqual(self.app.actual_calls.count(available), 1)
+        # new device needs one lookup, then the index is complete again
+        dispatcher.handle(
+            "test-vm",
+            "device-added:test",
+            device="test-vm:dev1:1234:5678:0123456789:?*******",
+        )
+        self.assertEqual(self.app.actual_calls.count(available), 2)
+        self.assertNotIsInstance(
+            handler.mock_calls[-1].kwargs["device"], UnknownDevice)
+        self.assertIsInstance(vm.devices["test"]["dev2"], UnknownDevice)
+        self.assertEqual(self.app.actual_calls.count(available), 2)
+        # backend restart invalidates the index
+        dispatcher.handle("test-vm", "domain-shutdown")
+        self.assertIsInstance(vm.devices["test"]["dev2"], UnknownDevice)
+        self.assertEqual(self.app.actual_calls.count(available), 3)
+        self.assertAllCalled()
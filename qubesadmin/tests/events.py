@@ -24,6 +24,8 @@
 import socket
 import subprocess
 import asyncio
+import threading
+import time
 import unittest
 import unittest.mock
 
@@ -98,6 +100,233 @@ class TC_00_Events(qubesadmin.tests.QubesTestCase):
         handler.assert_called_once_with(None, 'some-event', arg1='value1')
         handler2.assert_called_once_with(None, 'some-event', arg1='value1')
 
+    def test_004_handler_patterns(self):
+        exact = unittest.mock.Mock()
+        prefix = unittest.mock.Mock()
+        wildcard = unittest.mock.Mock()
+        self.dispatcher.add_handler('property-set:name', exact)
+        self.dispatcher.add_handler('property-set:*', prefix)
+        self.dispatcher.add_handler('domain-[ps]*-start', wildcard)
+        self.dispatcher.add_handler('?roperty-set:label', wildcard)
+        self.dispatcher.handle('', 'property-set:name')
+        exact.assert_called_once_with(None, 'property-set:name')
+        prefix.assert_called_once_with(None, 'property-set:name')
+        self.assertFalse(wildcard.called)
+        self.dispatcher.handle('', 'property-set:label')
+        prefix.assert_called_with(None, 'property-set:label')
+        wildcard.assert_called_once_with(None, 'property-set:label')
+        self.dispatcher.handle('test-vm', 'domain-pre-start')
+        wildcard.assert_called_with(
+            self.app.domains.get_blind('test-vm'), 'domain-pre-start')
+        self.dispatcher.handle('test-vm', 'domain-start')
+        self.assertEqual(wildcard.call_count, 2)
+        self.assertEqual(exact.call_count, 1)
+        self.assertEqual(prefix.call_count, 2)
+
+    def test_005_handler_change(self):
+        handler = unittest.mock.Mock()
+        handler2 = unittest.mock.Mock()
+        self.dispatcher.add_handler('some-*', handler)
+        self.dispatcher.handle('', 'some-event')
+        self.assertEqual(handler.call_count, 1)
+        # resolved handlers are cached, but updated on change
+        self.dispatcher.add_handler('some-event', handler2)
+        self.dispatcher.handle('', 'some-event')
+        self.assertEqual(handler.call_count, 2)
+        handler2.assert_called_once_with(None, 'some-event')
+        self.dispatcher.remove_handler('some-*', handler)
+        self.dispatcher.handle('', 'some-event')
+        self.assertEqual(handler.call_count, 2)
+        self.assertEqual(handler2.call_count, 2)
+        self.assertEqual(list(self.dispatcher.handlers), ['some-event'])
+
+    def test_006_handler_async(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        calls = []
+        release = asyncio.Event()
+
+        async def handler(subject, event, **kwargs):
+            await release.wait()
+            calls.append((subject, event, kwargs))
+            if kwargs.get('fail'):
+                raise AssertionError
+
+        self.dispatcher.add_handler('some-event', handler)
+
+        async def run():
+            self.dispatcher.handle('', 'some-event', arg1='value1')
+            self.dispatcher.handle('', 'some-event', fail='1')
+            # not awaited inline
+            self.assertEqual(calls, [])
+            self.assertEqual(
+                self.dispatcher.handler_stats[handler]['pending'], 2)
+            release.set()
+            await asyncio.gather(*self.dispatcher._handler_tasks)
+
+        loop.run_until_complete(run())
+        self.assertEqual(calls, [(None, 'some-event', {'arg1': 'value1'}),
+                                 (None, 'some-event', {'fail': '1'})])
+        stats = self.dispatcher.handler_stats[handler]
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['max_pending'], 2)
+        loop.close()
+
+    def test_007_handler_threads(self):
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            handler_workers=2)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stream = asyncio.StreamReader()
+        self.dispatcher._get_events_reader = \
+            lambda vm=None: self.mock_get_events_reader(stream,
+                unittest.mock.Mock(), None, vm)
+        calls = []
+        release = threading.Event()
+
+        def slow_handler(_subject, _event, **kwargs):
+            release.wait()
+            calls.append(kwargs['n'])
+
+        fast_handler = unittest.mock.Mock(
+            side_effect=[None, AssertionError, StopIteration])
+        self.dispatcher.add_handler('some-event', slow_handler)
+        self.dispatcher.add_handler('some-event', fast_handler)
+
+        async def run():
+            listen = asyncio.ensure_future(
+                self.dispatcher.listen_for_events(reconnect=False))
+            for num in range(3):
+                stream.feed_data(
+                    b'1\0\0some-event\0n\0' + str(num).encode() + b'\0\0')
+                await asyncio.sleep(0)
+            while self.dispatcher.handler_stats.get(
+                    fast_handler, {}).get('calls', 0) < 3:
+                await asyncio.sleep(0.01)
+            # slow handler does not block the dispatcher
+            self.assertEqual(
+                self.dispatcher.handler_stats[slow_handler]['pending'], 3)
+            stream.feed_eof()
+            release.set()
+            # queued calls are finished before listen_for_events() exits
+            await listen
+
+        loop.run_until_complete(run())
+        # called one at a time, in order
+        self.assertEqual(calls, ['0', '1', '2'])
+        self.assertEqual(fast_handler.call_count, 3)
+        slow_stats = self.dispatcher.handler_stats[slow_handler]
+        self.assertEqual(slow_stats['calls'], 3)
+        self.assertEqual(slow_stats['errors'], 0)
+        self.assertEqual(slow_stats['pending'], 0)
+        self.assertEqual(slow_stats['max_pending'], 3)
+        self.assertGreater(slow_stats['max_latency'], 0)
+        fast_stats = self.dispatcher.handler_stats[fast_handler]
+        self.assertEqual(fast_stats['errors'], 2)
+        self.assertEqual(fast_stats['pending'], 0)
+        loop.close()
+
+    def test_008_coalesce(self):
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            coalesce_delay=0.05)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        handler = unittest.mock.Mock()
+        self.dispatcher.add_handler('some-event', handler)
+        vm = self.app.domains.get_blind('test-vm')
+
+        async def run():
+            for value in ('red', 'green', 'blue'):
+                self.dispatcher.handle('test-vm', 'property-set:label',
+                    name='label', newvalue=value)
+            self.dispatcher.handle('test-vm', 'property-set:netvm',
+                name='netvm', newvalue='')
+            self.dispatcher.handle('test-vm', 'domain-pre-start')
+            self.dispatcher.handle('test-vm', 'domain-start')
+            self.assertEqual(self.app._invalidate_cache.mock_calls, [])
+            self.assertEqual(
+                self.app._update_power_state_cache.mock_calls, [])
+            # applied before calling handlers
+            self.dispatcher.handle('test-vm', 'some-event')
+            self.assertEqual(self.app._invalidate_cache.mock_calls, [
+                unittest.mock.call(vm, 'property-set:label',
+                    name='label', newvalue='blue'),
+                unittest.mock.call(vm, 'property-set:netvm',
+                    name='netvm', newvalue=''),
+            ])
+            self.assertEqual(
+                self.app._update_power_state_cache.mock_calls, [
+                    unittest.mock.call(vm, 'domain-start')])
+            handler.assert_called_once_with(vm, 'some-event')
+            # and after the delay
+            self.dispatcher.handle('test-vm', 'property-set:label',
+                name='label', newvalue='red')
+            await asyncio.sleep(0.1)
+            self.assertEqual(self.app._invalidate_cache.call_count, 3)
+
+        loop.run_until_complete(run())
+        loop.close()
+
+    def test_009_coalesce_overflow(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        async def run(policy):
+            self.app.reset_mock()
+            self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+                coalesce_delay=10, coalesce_limit=2,
+                coalesce_overflow=policy)
+            for prop in ('label', 'netvm', 'label', 'kernel'):
+                self.dispatcher.handle('test-vm', 'property-set:' + prop,
+                    name=prop)
+            return [call[1][1] for call in
+                    self.app._invalidate_cache.mock_calls]
+
+        self.assertEqual(loop.run_until_complete(run('invalidate-all')), [])
+        self.app._invalidate_cache_all.assert_called_once_with()
+        self.assertEqual(self.dispatcher._cache_updates, {})
+        self.assertEqual(loop.run_until_complete(run('flush')),
+            ['property-set:netvm', 'property-set:label'])
+        self.assertFalse(self.app._invalidate_cache_all.called)
+        self.assertEqual(list(self.dispatcher._cache_updates),
+            [('test-vm', 'property', 'kernel')])
+        self.dispatcher._drop_cache_updates()
+        with self.assertRaises(ValueError):
+            qubesadmin.events.EventsDispatcher(self.app,
+                coalesce_overflow='invalid')
+        loop.close()
+
+    def test_040_journal(self):
+        journal = qubesadmin.events.EventJournal(3)
+        self.assertEqual(journal.since(0), [])
+        for num in range(4):
+            entry = journal.append('test-vm', 'some-event', {'num': str(num)})
+        self.assertEqual(entry.seq, 4)
+        self.assertEqual(journal.last_seq, 4)
+        self.assertEqual([e.kwargs['num'] for e in journal.since(2)],
+            ['2', '3'])
+        self.assertEqual(journal.since(4), [])
+        # the first one is gone already
+        self.assertIsNone(journal.since(0))
+        self.assertEqual(len(journal.since(1)), 3)
+
+    def test_041_dispatcher_journal(self):
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            journal_size=10, revalidate_cache=True)
+        self.dispatcher.handle('', 'connection-established')
+        self.dispatcher.handle('test-vm', 'some-event', arg1='value1')
+        self.assertEqual(
+            [(e.seq, e.subject, e.event, e.kwargs)
+             for e in self.dispatcher.journal.since(0)],
+            [(1, None, 'connection-established', {}),
+             (2, 'test-vm', 'some-event', {'arg1': 'value1'})])
+        self.app._mark_cache_stale.assert_called_once_with()
+        self.app._refetch_cache.assert_called_once_with(
+            self.app._mark_cache_stale.return_value)
+        self.assertFalse(self.app._invalidate_cache_all.called)
+
     async def mock_get_events_reader(self, stream, cleanup_func, expected_vm,
             vm=None):
         self.assertEqual(expected_vm, vm)
@@ -140,6 +369,223 @@ class TC_00_Events(qubesadmin.tests.QubesTestCase):
         cleanup_func.assert_called_once_with()
         loop.close()
 
+    def test_011_listen_for_events_split(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stream = asyncio.StreamReader()
+        cleanup_func = unittest.mock.Mock()
+        self.dispatcher._get_events_reader = \
+            lambda vm=None: self.mock_get_events_reader(stream, cleanup_func,
+                None, vm)
+        handler = unittest.mock.Mock()
+        self.dispatcher.add_handler('some-event', handler)
+        data = (b'1\0\0some-event\0arg1\0value1\0\0'
+                b'1\0some-vm\0some-event\0arg_without_value\0\0'
+                b'arg2\0value\0\0')
+        # feed one byte at a time
+        events = [data[i:i + 1] for i in range(len(data))]
+        asyncio.ensure_future(self.send_events(stream, events))
+        loop.run_until_complete(self.dispatcher.listen_for_events(
+            reconnect=False))
+        self.assertEqual(handler.mock_calls, [
+            unittest.mock.call(None, 'some-event', arg1='value1'),
+            unittest.mock.call(
+                self.app.domains.get_blind('some-vm'), 'some-event',
+                arg_without_value='', arg2='value'),
+        ])
+        cleanup_func.assert_called_once_with()
+        loop.close()
+
+    def test_012_listen_for_events_incomplete(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stream = asyncio.StreamReader()
+        cleanup_func = unittest.mock.Mock()
+        self.dispatcher._get_events_reader = \
+            lambda vm=None: self.mock_get_events_reader(stream, cleanup_func,
+                None, vm)
+        handler = unittest.mock.Mock()
+        self.dispatcher.add_handler('some-event', handler)
+        events = [
+            b'1\0\0some-event\0arg1\0value1\0\0',
+            b'1\0some-vm\0some-event\0arg1\0',
+        ]
+        asyncio.ensure_future(self.send_events(stream, events))
+        loop.run_until_complete(self.dispatcher.listen_for_events(
+            reconnect=False))
+        handler.assert_called_once_with(None, 'some-event', arg1='value1')
+        cleanup_func.assert_called_once_with()
+        loop.close()
+
+    def test_013_parser(self):
+        parser = qubesadmin.events.EventsParser()
+        self.assertEqual(list(parser.feed(b'1\0some-vm\0some-ev')), [])
+        self.assertEqual(list(parser.feed(b'ent\0arg1\0\0arg2')), [])
+        events = list(parser.feed(b'\0value2\0\0' b'1\0\0other-event\0\0'
+                                  b'1\0'))
+        self.assertEqual(events, [
+            ('some-vm', 'some-event', [b'arg1', b'', b'arg2', b'value2']),
+            ('', 'other-event', []),
+        ])
+        self.assertEqual(parser.decode_kwargs(events[0][2]),
+            {'arg1': '', 'arg2': 'value2'})
+        with self.assertRaises(qubesadmin.exc.QubesDaemonCommunicationError):
+            parser.feed_eof()
+        # buffer is reset
+        parser.feed_eof()
+
+    def test_014_parser_non_event(self):
+        parser = qubesadmin.events.EventsParser()
+        with self.assertRaises(qubesadmin.exc.QubesDaemonCommunicationError):
+            list(parser.feed(b'0\0\0some-event\0\0'))
+
+    def test_015_listen_for_events_filtered(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stream = asyncio.StreamReader()
+        cleanup_func = unittest.mock.Mock()
+        self.dispatcher._get_events_reader = \
+            lambda vm=None: self.mock_get_events_reader(stream, cleanup_func,
+                None, vm)
+        self.app.cache_enabled = False
+        self.dispatcher.add_handler('domain-shutdown', unittest.mock.Mock())
+        self.dispatcher.handle = unittest.mock.Mock()
+        events = [
+            b'1\0some-vm\0property-set:label\0name\0label\0\0',
+            b'1\0some-vm\0property-set:name\0name\0name\0\0',
+            b'1\0some-vm\0domain-feature-set:gui\0name\0gui\0\0',
+            b'1\0some-vm\0domain-shutdown\0\0',
+            b'1\0\0domain-add\0vm\0other-vm\0\0',
+        ]
+        asyncio.ensure_future(self.send_events(stream, events))
+        loop.run_until_complete(self.dispatcher.listen_for_events(
+            reconnect=False))
+        self.assertEqual(self.dispatcher.handle.mock_calls, [
+            unittest.mock.call('some-vm', 'property-set:name', name='name'),
+            unittest.mock.call('some-vm', 'domain-shutdown'),
+            unittest.mock.call(None, 'domain-add', vm='other-vm'),
+        ])
+        loop.close()
+
+    def test_016_needed_events(self):
+        self.dispatcher.add_handler('domain-shutdown', unittest.mock.Mock())
+        self.app.cache_enabled = False
+        needed = self.dispatcher.needed_events()
+        self.assertIn('domain-shutdown', needed)
+        self.assertIn('domain-add', needed)
+        self.assertIn('property-set:name', needed)
+        self.assertNotIn('property-set:*', needed)
+        self.assertFalse(self.dispatcher._wants_event('property-set:label'))
+        self.app.cache_enabled = True
+        self.assertIn('property-set:*', self.dispatcher.needed_events())
+        self.assertTrue(self.dispatcher._wants_event('property-set:label'))
+        self.assertFalse(self.dispatcher._wants_event('some-event'))
+        self.dispatcher.add_handler('some-*', unittest.mock.Mock())
+        self.assertTrue(self.dispatcher._wants_event('some-event'))
+
+    def test_017_listen_for_events_vms(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stream = asyncio.StreamReader()
+        cleanup_func = unittest.mock.Mock()
+        self.dispatcher._get_events_reader = \
+            lambda vm=None: self.mock_get_events_reader(stream, cleanup_func,
+                None, vm)
+        handler = unittest.mock.Mock()
+        self.dispatcher.add_handler('*', handler)
+        vm1 = unittest.mock.Mock()
+        vm1.name = 'vm1'
+        vm2 = unittest.mock.Mock()
+        vm2.name = 'vm2'
+        events = [
+            b'1\0\0connection-established\0\0',
+            b'1\0vm1\0some-event\0\0',
+            b'1\0other-vm\0some-event\0\0',
+            b'1\0\0domain-add\0vm\0new-vm\0\0',
+            b'1\0vm2\0some-event\0\0',
+            b'1\0other-vm\0property-set:name\0name\0name\0'
+            b'newvalue\0other-vm\0oldvalue\0some-vm\0\0',
+            b'1\0vm3\0property-set:name\0name\0name\0'
+            b'newvalue\0vm3\0oldvalue\0vm1\0\0',
+            b'1\0vm3\0some-event\0\0',
+            b'1\0vm1\0some-event\0\0',
+        ]
+        asyncio.ensure_future(self.send_events(stream, events))
+        loop.run_until_complete(self.dispatcher.listen_for_events(
+            reconnect=False, vms=[vm1, vm2]))
+        get_blind = self.app.domains.get_blind
+        self.assertEqual(handler.mock_calls, [
+            unittest.mock.call(None, 'connection-established'),
+            unittest.mock.call(get_blind('vm1'), 'some-event'),
+            unittest.mock.call(get_blind('vm2'), 'some-event'),
+            unittest.mock.call(get_blind('vm3'), 'property-set:name',
+                name='name', newvalue='vm3', oldvalue='vm1'),
+            unittest.mock.call(get_blind('vm3'), 'some-event'),
+        ])
+        loop.close()
+
+    def test_018_listen_for_events_vm_and_vms(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        vm1 = unittest.mock.Mock()
+        with self.assertRaises(ValueError):
+            loop.run_until_complete(self.dispatcher.listen_for_events(
+                vm=vm1, vms=[vm1]))
+        loop.close()
+
+    def test_019_listen_for_events_backoff(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        attempts = []
+
+        async def get_events_reader(vm=None):
+            attempts.append(vm)
+            if len(attempts) in (1, 2, 3, 5):
+                raise OSError('qubesd not running')
+            if len(attempts) == 4:
+                stream = asyncio.StreamReader()
+                asyncio.ensure_future(self.send_events(stream, [
+                    b'1\0\0connection-established\0\0',
+                    b'1\0test-vm\0some-event\0\0',
+                ]))
+                return stream, unittest.mock.Mock()
+            if len(attempts) in (6, 7):
+                # qubesd accepts the connection and drops it right away
+                stream = asyncio.StreamReader()
+                asyncio.ensure_future(self.send_events(stream, [
+                    b'1\0\0connection-established\0\0',
+                ]))
+                return stream, unittest.mock.Mock()
+            raise asyncio.CancelledError()
+
+        self.dispatcher._get_events_reader = get_events_reader
+        handler = unittest.mock.Mock(side_effect=ValueError)
+        self.dispatcher.add_handler('some-event', handler)
+        self.assertIsNone(self.dispatcher.stats['last_event_age'])
+        delays = []
+        with unittest.mock.patch('qubesadmin.config.QUBESD_RECONNECT_DELAY',
+                0.001), \
+                unittest.mock.patch(
+                    'qubesadmin.config.QUBESD_RECONNECT_MAX_DELAY', 0.006), \
+                unittest.mock.patch('random.uniform',
+                    lambda a, b: delays.append((a, b)) or b):
+            loop.run_until_complete(self.dispatcher.listen_for_events())
+        # doubled, then back to initial delay after a working connection;
+        # connection-established alone does not reset it, doubled up to the
+        # limit
+        self.assertEqual(delays, [(0.0005, 0.001), (0.001, 0.002),
+            (0.002, 0.004), (0.0005, 0.001), (0.001, 0.002),
+            (0.002, 0.004), (0.003, 0.006)])
+        stats = self.dispatcher.stats
+        self.assertEqual(stats['connections'], 8)
+        self.assertEqual(stats['reconnects'], 7)
+        self.assertEqual(stats['events'], 4)
+        self.assertEqual(stats['handler_errors'], 1)
+        self.assertEqual(stats['reconnect_delay'], 0.006)
+        self.assertGreater(stats['events_per_second'], 0)
+        self.assertGreaterEqual(stats['last_event_age'], 0)
+        loop.close()
+
     def mock_open_unix_connection(self, expected_path, sock, path):
         self.assertEqual(expected_path, path)
         return asyncio.open_connection(sock=sock)
@@ -200,9 +646,90 @@ class TC_00_Events(qubesadmin.tests.QubesTestCase):
         loop.run_forever()
         loop.close()
 
+    def test_024_get_events_reader_filtered(self):
+        self.app.qubesd_connection_type = 'socket'
+        self.app.cache_enabled = False
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            enable_cache=False, filtered_api_method='admin.EventsFiltered')
+        self.dispatcher.add_handler('domain-start', unittest.mock.Mock())
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        sock1, sock2 = socket.socketpair()
+        with unittest.mock.patch('asyncio.open_unix_connection',
+                lambda path: self.mock_open_unix_connection(
+                    qubesadmin.config.QUBESD_SOCKET, sock1, path)):
+            task = asyncio.ensure_future(self.dispatcher._get_events_reader())
+            reader = asyncio.ensure_future(loop.run_in_executor(None,
+                self.read_all, sock2))
+            loop.run_until_complete(asyncio.wait([task, reader]))
+            self.assertEqual(reader.result(),
+                b'admin.EventsFiltered+ dom0 name dom0\0' +
+                ''.join(pattern + '\n' for pattern in sorted(
+                    qubesadmin.events.EventsDispatcher.CACHE_EVENTS))
+                .encode())
+            cleanup_func = task.result()[1]
+            cleanup_func()
+            sock2.close()
+
+        # run socket cleanup functions
+        loop.stop()
+        loop.run_forever()
+        loop.close()
+
+    def test_025_get_events_reader_filtered_all(self):
+        self.app.qubesd_connection_type = 'qrexec'
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            filtered_api_method='admin.EventsFiltered')
+        self.dispatcher.add_handler('*', unittest.mock.Mock())
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        mock_proc = unittest.mock.Mock()
+        with unittest.mock.patch('asyncio.create_subprocess_exec',
+                lambda *args, **kwargs: self.mock_coroutine(mock_proc,
+                    *args, **kwargs)):
+            task = asyncio.ensure_future(self.dispatcher._get_events_reader())
+            loop.run_until_complete(task)
+            # all events needed, filtered method not used
+            self.assertEqual(mock_proc.mock_calls, [
+                unittest.mock.call('qrexec-client-vm', 'dom0',
+                    'admin.Events', stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE),
+                unittest.mock.call().stdin.write_eof()
+            ])
+
+        loop.close()
+
     async def mock_coroutine(self, mock, *args, **kwargs):
         return mock(*args, **kwargs)
 
+    def test_026_listen_for_events_handler_threads(self):
+        # handler with calls queued when listen_for_events() exits still
+        # gets events when listening again
+        self.dispatcher = qubesadmin.events.EventsDispatcher(self.app,
+            handler_workers=1)
+        calls = []
+
+        def slow_handler(_subject, _event, **kwargs):
+            time.sleep(0.01)
+            calls.append(kwargs['n'])
+
+        self.dispatcher.add_handler('some-event', slow_handler)
+        for numbers in ((b'0', b'1', b'2'), (b'3',)):
+            events = [b'1\0\0some-event\0n\0' + n + b'\0\0'
+                      for n in numbers]
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            stream = asyncio.StreamReader()
+            stream.feed_data(b''.join(events))
+            stream.feed_eof()
+            self.dispatcher._get_events_reader = \
+                lambda vm=None, stream=stream: self.mock_get_events_reader(
+                    stream, unittest.mock.Mock(), None, vm)
+            loop.run_until_complete(self.dispatcher.listen_for_events(
+                reconnect=False))
+            loop.close()
+        self.assertEqual(calls, ['0', '1', '2', '3'])
+
     def test_022_get_events_reader_remote(self):
         self.app.qubesd_connection_type = 'qrexec'
         loop = asyncio.new_event_loop()
@@ -20,6 +20,8 @@
 
 # pylint: disable=missing-docstring
 
+import qubesadmin.events
+import qubesadmin.exc
 import qubesadmin.features
 import qubesadmin.tests
 
@@ -93,3 +95,139 @@ class TC_00_Features(qubesadmin.tests.QubesTestCase):
             b'0\0'
         self.vm.features['feature1'] = False
         self.assertAllCalled()
+
+    def test_030_cache(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature1\nfeature2\n'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature1', None)] = \
+            b'0\0value1'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature2', None)] = \
+            b'0\0value2'
+        self.assertEqual(sorted(self.vm.features.items()),
+            [('feature1', 'value1'), ('feature2', 'value2')])
+        self.assertAllCalled()
+        self.app.expected_calls.clear()
+        self.app.actual_calls = []
+        self.assertEqual(self.vm.features['feature1'], 'value1')
+        self.assertEqual(self.vm.features.get('feature3', 'default'),
+            'default')
+        with self.assertRaises(qubesadmin.exc.QubesFeatureNotFoundError):
+            # pylint: disable=pointless-statement
+            self.vm.features['feature3']
+        self.assertEqual(self.app.actual_calls, [])
+
+    def test_031_cache_update(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature1\n'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Set', 'feature2', b'1')] = \
+            b'0\0'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Remove', 'feature1', None)] = \
+            b'0\0'
+        self.assertEqual(list(self.vm.features), ['feature1'])
+        self.vm.features['feature2'] = True
+        del self.vm.features['feature1']
+        self.assertEqual(list(self.vm.features), ['feature2'])
+        self.assertEqual(self.vm.features['feature2'], '1')
+        self.assertAllCalled()
+
+    def test_032_cache_events(self):
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature1\n'
+        self.assertEqual(list(self.vm.features), ['feature1'])
+        dispatcher.handle('test-vm', 'domain-feature-set:feature2',
+            feature='feature2', value='value2')
+        dispatcher.handle('test-vm', 'domain-feature-delete:feature1',
+            feature='feature1')
+        self.assertEqual(list(self.vm.features), ['feature2'])
+        self.assertEqual(self.vm.features['feature2'], 'value2')
+        dispatcher.handle(None, 'connection-established')
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature3\n'
+        self.assertEqual(list(self.vm.features), ['feature3'])
+        self.assertAllCalled()
+
+    def test_040_get_all(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature1\nfeature2\nfeature3\n'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature1', None)] = \
+            b'0\0value1'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature2', None)] = \
+            b'0\0'
+        # removed in the meantime
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature3', None)] = \
+            b'2\x00QubesFeatureNotFoundError\x00\x00feature3\x00'
+        self.assertEqual(self.vm.features.get_all(),
+            {'feature1': 'value1', 'feature2': ''})
+        self.assertAllCalled()
+
+    def test_050_check_with_template(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.CheckWithTemplate', 'feature1',
+             None)] = b'0\0value1'
+        self.assertEqual(self.vm.features.check_with_template('feature1'),
+            'value1')
+        self.assertAllCalled()
+
+    def test_051_check_with_template_cached(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature1\n'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.Get', 'feature1', None)] = \
+            b'0\0value1'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0template default=False type=vm test-vm2\n'
+        self.app.expected_calls[
+            ('test-vm2', 'admin.vm.feature.List', None, None)] = \
+            b'0\0feature2\n'
+        self.app.expected_calls[
+            ('test-vm2', 'admin.vm.feature.Get', 'feature2', None)] = \
+            b'0\0value2'
+        self.app.expected_calls[
+            ('test-vm2', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0qid default=False type=int 2\n'
+        features = self.vm.features
+        self.assertEqual(features.check_with_template('feature1'), 'value1')
+        self.assertEqual(features.check_with_template('feature2'), 'value2')
+        self.assertEqual(
+            features.check_with_template('feature3', 'default'), 'default')
+        with self.assertRaises(KeyError):
+            features.check_with_template('feature3', features.NO_DEFAULT)
+        self.assertAllCalled()
+        self.assertEqual(len(self.app.actual_calls), 7)
+
+    def test_052_check_with_template_cached_fallback(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.List', None, None)] = \
+            b'0\0'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\0template default=False type=vm test-vm2\n'
+        self.app.expected_calls[
+            ('test-vm2', 'admin.vm.feature.List', None, None)] = \
+            b'2\x00QubesDaemonAccessError\x00\x00Access denied\x00'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.feature.CheckWithTemplate', 'feature1',
+             None)] = b'0\0value1'
+        self.assertEqual(self.vm.features.check_with_template('feature1'),
+            'value1')
+        self.assertAllCalled()
@@ -141,6 +141,37 @@ class TestVMVolume(qubesadmin.tests.QubesTestCase):
         self.vol.resize(2048)
         self.assertAllCalled()
 
+    def test_032_resize_prefetched(self):
+        # pylint: disable=protected-access
+        self.app._store_prefetched_volume(self.vol,
+            b'pool=test-pool\nvid=some-id\nsize=1024\nusage=512\n')
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.volume.Resize', 'volname', b'512')] = \
+            b'0\x00'
+        self.vol.resize(512, allow_shrink=True)
+        self.expect_info()
+        call_key = list(self.app.expected_calls)[-1]
+        self.app.expected_calls[call_key] = self.app.expected_calls[
+            call_key].replace(b'size=1024\n', b'size=512\n')
+        self.assertEqual(self.vol.size, 512)
+        self.assertAllCalled()
+
+    def test_033_prefetched_until_invalidated(self):
+        # pylint: disable=protected-access
+        self.app._store_prefetched_volume(self.vol,
+            b'pool=test-pool\nvid=some-id\nsize=1024\nusage=256\n')
+        self.assertEqual(self.vol.size, 1024)
+        self.assertEqual(self.vol.usage, 256)
+        self.assertEqual(self.vol.usage, 256)
+        self.assertEqual(self.app.actual_calls, [])
+        # power state change drops prefetched data
+        vm = self.app.domains.get_blind('test-vm')
+        vm._volumes = {'volname': self.vol}
+        self.app._invalidate_volumes_cache(vm)
+        self.expect_info()
+        self.assertEqual(self.vol.usage, 512)
+        self.assertAllCalled()
+
     def test_031_revert(self):
         self.app.expected_calls[
             ('test-vm', 'admin.vm.volume.Revert', 'volname', b'snapid1')] = \
@@ -20,6 +20,7 @@
 
 # pylint: disable=missing-docstring
 
+import qubesadmin.events
 import qubesadmin.tests
 import qubesadmin.tags
 
@@ -110,3 +111,36 @@ class TC_00_Tags(qubesadmin.tests.QubesTestCase):
             b'tag1\0'
         self.tags.discard('tag1')
         self.assertAllCalled()
+
+    def test_060_cache(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.tag.List', None, None)] = \
+            b'0\0tag1\ntag2\n'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.tag.Set', 'tag3', None)] = b'0\0'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.tag.Remove', 'tag1', None)] = b'0\0'
+        self.assertIn('tag1', self.vm.tags)
+        self.assertNotIn('tag3', self.vm.tags)
+        self.vm.tags.add('tag3')
+        self.vm.tags.remove('tag1')
+        self.assertEqual(list(self.vm.tags), ['tag2', 'tag3'])
+        self.assertAllCalled()
+
+    def test_061_cache_events(self):
+        self.app.cache_enabled = True
+        dispatcher = qubesadmin.events.EventsDispatcher(self.app)
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.tag.List', None, None)] = \
+            b'0\0tag1\n'
+        self.assertIn('tag1', self.vm.tags)
+        dispatcher.handle('test-vm', 'domain-tag-add:tag2', tag='tag2')
+        dispatcher.handle('test-vm', 'domain-tag-delete:tag1', tag='tag1')
+        self.assertEqual(list(self.vm.tags), ['tag2'])
+        dispatcher.handle(None, 'connection-established')
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.tag.List', None, None)] = \
+            b'0\0tag3\n'
+        self.assertEqual(list(self.vm.tags), ['tag3'])
+        self.assertAllCalled()
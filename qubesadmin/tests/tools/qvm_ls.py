@@ -21,7 +21,11 @@
 
 # pylint: disable=missing-docstring
 
+import json
+import unittest.mock
+
 import qubesadmin
+import qubesadmin.spinner
 import qubesadmin.vm
 import qubesadmin.tools.qvm_ls
 
@@ -40,6 +44,9 @@ class TestApp:
             ]
         )
 
+    def prefetch(self, domains=None, what=None):
+        pass
+
 class TC_00_Column(qubesadmin.tests.QubesTestCase):
     def test_100_init(self):
         '''Column registers itself in Column.columns on init.'''
@@ -388,12 +395,6 @@ class TC_90_List_with_qubesd_calls(qubesadmin.tests.QubesTestCase):
             b'0\x00vm1 class=AppVM state=Running\n' \
             b'template1 class=TemplateVM state=Halted\n' \
             b'sys-net class=AppVM state=Running\n'
-        self.app.expected_calls[
-            ('vm1', 'admin.vm.CurrentState', None, None)] = \
-            b'0\x00power_state=Running'
-        self.app.expected_calls[
-            ('sys-net', 'admin.vm.CurrentState', None, None)] = \
-            b'0\x00power_state=Running'
         props = {
             'label': 'type=label green',
             'template': 'type=vm template1',
@@ -422,6 +423,176 @@ class TC_90_List_with_qubesd_calls(qubesadmin.tests.QubesTestCase):
             'vm1      Running  AppVM  green  template1  sys-net\n')
         self.assertAllCalled()
 
+    def test_102_list_disk(self):
+        self.app.expected_calls[
+            ('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        for vm in ('vm1', 'vm2'):
+            self.app.expected_calls[
+                (vm, 'admin.vm.property.GetAll', None, None)] = \
+                b'0\x00name default=False type=str ' + vm.encode() + b'\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.volume.List', None, None)] = \
+                b'0\x00root\nprivate\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.volume.Info', 'root', None)] = \
+                b'0\x00pool=lvm\nvid=' + vm.encode() + b'-root\n' \
+                b'size=10485760\nusage=5242880\n'
+            self.app.expected_calls[
+                (vm, 'admin.vm.volume.Info', 'private', None)] = \
+                b'0\x00pool=lvm\nvid=' + vm.encode() + b'-private\n' \
+                b'size=4194304\nusage=1048576\n'
+        with qubesadmin.tests.tools.StdoutBuffer() as stdout:
+            qubesadmin.tools.qvm_ls.main(['--format', 'disk'], app=self.app)
+        self.assertEqual(stdout.getvalue(),
+            'NAME  STATE    DISK  PRIV-CURR  PRIV-MAX  PRIV-USED  ROOT-CURR  '
+            'ROOT-MAX  ROOT-USED\n'
+            'vm1   Running  6     1          4         25%        5          '
+            '10        50%\n'
+            'vm2   Halted   6     1          4         25%        5          '
+            '10        50%\n')
+        self.assertAllCalled()
+        # each volume info retrieved just once
+        self.assertEqual(
+            len([call for call in self.app.actual_calls
+                 if call[1] == 'admin.vm.volume.Info']), 4)
+
+    def test_103_stream(self):
+        self.app.cache_enabled = True
+        self.app.expected_calls[
+            ('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n' \
+            b'vm3 class=AppVM state=Halted\n'
+        for vm in ('vm1', 'vm2', 'vm3'):
+            self.app.expected_calls[
+                (vm, 'admin.vm.property.GetAll', None, None)] = \
+                b'0\x00name default=False type=str ' + vm.encode() + b'\n' \
+                b'label default=False type=label red\n'
+        stdout = unittest.mock.Mock()
+        stdout.write.side_effect = \
+            lambda data: written.append(('write', data))
+        stdout.flush.side_effect = lambda: written.append(('flush',))
+        written = []
+        table = qubesadmin.tools.qvm_ls.Table(
+            list(self.app.domains), ['name', 'state', 'label', 'template'],
+            qubesadmin.spinner.DummySpinner(None))
+        table.write_stream(stdout, chunk_size=2)
+        self.assertEqual(written, [
+            ('write', '{"NAME": "vm1", "STATE": "Running", "LABEL": "red", '
+                      '"TEMPLATE": null}\n'),
+            ('write', '{"NAME": "vm2", "STATE": "Halted", "LABEL": "red", '
+                      '"TEMPLATE": null}\n'),
+            ('flush',),
+            ('write', '{"NAME": "vm3", "STATE": "Halted", "LABEL": "red", '
+                      '"TEMPLATE": null}\n'),
+            ('flush',),
+        ])
+        self.assertAllCalled()
+
+    def test_104_stream_raw(self):
+        self.app.expected_calls[
+            ('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        with qubesadmin.tests.tools.StdoutBuffer() as stdout:
+            qubesadmin.tools.qvm_ls.main(
+                ['--stream', '--raw-data', '--fields', 'class,state',
+                 '--reverse'], app=self.app)
+        self.assertEqual(stdout.getvalue(),
+            'AppVM|Halted\n'
+            'AppVM|Running\n')
+        with self.assertRaises(SystemExit):
+            with qubesadmin.tests.tools.StderrBuffer():
+                qubesadmin.tools.qvm_ls.main(
+                    ['--stream', '--sort', 'STATE'], app=self.app)
+        self.assertAllCalled()
+
+    def _setup_typed_values(self):
+        self.app.expected_calls[
+            ('dom0', 'admin.vm.List', None, None)] = \
+            b'0\x00vm1 class=AppVM state=Running\n' \
+            b'vm2 class=AppVM state=Halted\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\x00name default=False type=str vm1\n' \
+            b'qid default=False type=int 3\n' \
+            b'label default=False type=label red\n' \
+            b'include_in_backups default=True type=bool True\n' \
+            b'netvm default=True type=vm vm2\n'
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.property.GetAll', None, None)] = \
+            b'0\x00name default=False type=str vm2\n' \
+            b'qid default=False type=int 2\n' \
+            b'label default=False type=label green\n' \
+            b'include_in_backups default=False type=bool False\n' \
+            b'netvm default=True type=vm \n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.volume.List', None, None)] = \
+            b'0\x00private\n'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.volume.Info', 'private', None)] = \
+            b'0\x00pool=lvm\nvid=vm1-private\nsize=4194304\n' \
+            b'usage=1048577\n'
+        self.app.expected_calls[
+            ('vm2', 'admin.vm.volume.List', None, None)] = b'0\x00'
+        self.app.expected_calls[
+            ('vm1', 'admin.vm.CurrentState', None, None)] = \
+            b'0\x00power_state=Running mem=409600'
+        return ['--fields', 'name,qid,label,include_in_backups,netvm,memory,'
+                            'priv-curr,priv-pool,priv-used']
+
+    def test_105_format_output_json(self):
+        args = self._setup_typed_values()
+        with qubesadmin.tests.tools.StdoutBuffer() as stdout:
+            qubesadmin.tools.qvm_ls.main(
+                ['--format-output', 'json', '--sort', 'QID'] + args,
+                app=self.app)
+        self.assertEqual(json.loads(stdout.getvalue()), [
+            {'NAME': 'vm2', 'QID': 2, 'LABEL': 'green',
+             'INCLUDE-IN-BACKUPS': False, 'NETVM': None, 'MEMORY': None,
+             'PRIV-CURR': None, 'PRIV-POOL': None, 'PRIV-USED': None},
+            {'NAME': 'vm1', 'QID': 3, 'LABEL': 'red',
+             'INCLUDE-IN-BACKUPS': True, 'NETVM': 'vm2',
+             'MEMORY': 419430400, 'PRIV-CURR': 1048577, 'PRIV-POOL': 'lvm',
+             'PRIV-USED': 25},
+        ])
+        self.assertAllCalled()
+
+    def test_106_format_output_csv(self):
+        args = self._setup_typed_values()
+        with qubesadmin.tests.tools.StdoutBuffer() as stdout:
+            qubesadmin.tools.qvm_ls.main(
+                ['--format-output', 'csv'] + args, app=self.app)
+        self.assertEqual(stdout.getvalue(),
+            'NAME,QID,LABEL,INCLUDE-IN-BACKUPS,NETVM,MEMORY,PRIV-CURR,'
+            'PRIV-POOL,PRIV-USED\n'
+            'vm1,3,red,True,vm2,419430400,1048577,lvm,25\n'
+            'vm2,2,green,False,,,,,\n')
+        self.assertAllCalled()
+
+    def test_107_format_output_ndjson_stream(self):
+        args = self._setup_typed_values()
+        with qubesadmin.tests.tools.StdoutBuffer() as stdout:
+            qubesadmin.tools.qvm_ls.main(
+                ['--format-output', 'ndjson', '--stream'] + args,
+                app=self.app)
+        self.assertEqual(
+            [json.loads(line) for line in stdout.getvalue().splitlines()],
+            [{'NAME': 'vm1', 'QID': 3, 'LABEL': 'red',
+              'INCLUDE-IN-BACKUPS': True, 'NETVM': 'vm2',
+              'MEMORY': 419430400, 'PRIV-CURR': 1048577, 'PRIV-POOL': 'lvm',
+              'PRIV-USED': 25},
+             {'NAME': 'vm2', 'QID': 2, 'LABEL': 'green',
+              'INCLUDE-IN-BACKUPS': False, 'NETVM': None, 'MEMORY': None,
+              'PRIV-CURR': None, 'PRIV-POOL': None, 'PRIV-USED': None}])
+        with self.assertRaises(SystemExit):
+            with qubesadmin.tests.tools.StderrBuffer():
+                qubesadmin.tools.qvm_ls.main(
+                    ['--format-output', 'json', '--stream'], app=self.app)
+        self.assertAllCalled()
+
 class TC_100_Sort(qubesadmin.tests.QubesTestCase):
     def setUp(self):
         self.app = TestApp()
@@ -20,6 +20,7 @@
 
 # pylint: disable=missing-docstring
 
+import asyncio
 from subprocess import PIPE
 
 import qubesadmin.tests.vm
@@ -209,3 +210,31 @@ class TC_00_Actions(qubesadmin.tests.vm.VMTestCase):
              'pecial-3B-20chars',
              b''),
         ])
+
+    def test_020_async_actions(self):
+        for method in ('Start', 'Kill', 'Pause', 'Unpause', 'Suspend',
+                       'Resume'):
+            self.app.expected_calls[
+                ('test-vm', 'admin.vm.' + method, None, None)] = b'0\x00'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.Shutdown', 'force+wait', None)] = b'0\x00'
+
+        async def run():
+            await self.vm.start_async()
+            await self.vm.shutdown_async(force=True, wait=True)
+            await self.vm.kill_async()
+            await self.vm.pause_async()
+            await self.vm.unpause_async()
+            await self.vm.suspend_async()
+            await self.vm.resume_async()
+
+        asyncio.run(run())
+        self.assertAllCalled()
+
+    def test_021_async_power_state(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.CurrentState', None, None)] = \
+            b'0\x00power_state=Paused'
+        self.assertEqual(asyncio.run(self.vm.get_power_state_async()),
+            'Paused')
+        self.assertAllCalled()
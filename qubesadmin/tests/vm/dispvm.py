@@ -20,6 +20,7 @@
 
 # pylint: disable=missing-docstring
 
+import asyncio
 import subprocess
 
 import qubesadmin.tests
@@ -113,3 +114,14 @@ class TC_00_Dispvm(qubesadmin.tests.QubesTestCase):
         vm.cleanup()
         self.assertEqual(self.app.service_calls, [])
         self.assertAllCalled()
+
+    def test_020_start_async(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.CreateDisposable', None, None)] = \
+            b'0\0disp123'
+        self.app.expected_calls[
+            ('disp123', 'admin.vm.Start', None, None)] = b'0\0'
+        vm = qubesadmin.vm.DispVM.from_appvm(self.app, 'test-vm')
+        asyncio.run(vm.start_async())
+        self.assertEqual(vm.name, 'disp123')
+        self.assertAllCalled()
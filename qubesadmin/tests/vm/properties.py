@@ -20,6 +20,13 @@
 
 # pylint: disable=missing-docstring
 
+import asyncio
+
+import qubesadmin
+import qubesadmin.devices
+import qubesadmin.features
+import qubesadmin.firewall
+import qubesadmin.tags
 import qubesadmin.vm
 import qubesadmin.tests.vm
 
@@ -226,6 +233,77 @@ class TC_00_Properties(qubesadmin.tests.vm.VMTestCase):
         self.assertEqual(self.vm.qid, 3)
         self.assertAllCalled()
 
+    def test_052_get_all_schema(self):
+        # pylint: disable=protected-access
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.GetAll', None, None)] = [
+            b'0\x00netvm default=True type=vm \n'
+            b'label default=False type=label red\n'
+            b'qid default=True type=int 3\n', ]
+        self.app.cache_enabled = True
+        self.assertIsNone(self.vm.netvm)
+        self.assertEqual(self.vm._property_schema(), {
+            'netvm': b'type=vm', 'label': b'type=label', 'qid': b'type=int'})
+        # shared with other VMs
+        self.assertIs(self.app.domains.get_blind('other-vm')._property_schema(),
+                      self.vm._property_schema())
+        self.assertAllCalled()
+
+    def test_053_get_invalid_type(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Get', 'prop1', None)] = \
+            b'0\x00default=False type=dict value'
+        with self.assertRaisesRegex(
+                qubesadmin.exc.QubesDaemonCommunicationError,
+                'invalid value type'):
+            # pylint: disable=pointless-statement
+            self.vm.prop1
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Get', 'prop1', None)] = \
+            b'0\x00default=False int value'
+        with self.assertRaisesRegex(
+                qubesadmin.exc.QubesDaemonCommunicationError,
+                'Invalid type prefix'):
+            # pylint: disable=pointless-statement
+            self.vm.prop1
+        self.assertAllCalled()
+
+
+    def test_060_get_async(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Get', 'prop1', None)] = \
+            b'0\x00default=False type=int 123'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Get', 'prop2', None)] = \
+            b'0\x00default=True type=bool '
+        self.assertEqual(asyncio.run(self.vm.property_get_async('prop1')),
+            123)
+        with self.assertRaises(AttributeError):
+            asyncio.run(self.vm.property_get_async('prop2'))
+        self.assertAllCalled()
+
+    def test_061_get_async_cached(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.GetAll', None, None)] = [
+            b'0\x00name default=False type=str test-vm\n'
+            b'qid default=True type=int 3\n', ]
+        self.app.cache_enabled = True
+        self.assertEqual(asyncio.run(self.vm.property_get_async('qid')), 3)
+        self.assertEqual(asyncio.run(self.vm.property_get_async('qid')), 3)
+        self.assertEqual(self.vm.qid, 3)
+        self.assertAllCalled()
+
+    def test_062_set_async(self):
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Set', 'prop1', b'test-vm')] = \
+            b'0\x00'
+        self.app.expected_calls[
+            ('test-vm', 'admin.vm.property.Reset', 'prop2', None)] = \
+            b'0\x00'
+        asyncio.run(self.vm.property_set_async('prop1', self.vm))
+        asyncio.run(self.vm.property_set_async('prop2', qubesadmin.DEFAULT))
+        self.assertAllCalled()
+
 
 class TC_01_SpecialCases(qubesadmin.tests.vm.VMTestCase):
     def test_000_get_name(self):
@@ -313,3 +391,22 @@ class TC_01_SpecialCases(qubesadmin.tests.vm.VMTestCase):
             b"0\x00test-vm class=AppVM state=Running\n"
         self.assertEqual(vm.klass, "AppVM")
         self.assertAllCalled()
+
+    def test_021_helpers_lazy(self):
+        # pylint: disable=protected-access
+        vm = qubesadmin.vm.QubesVM(self.app, "test-vm")
+        self.assertNotIn("devices", vm.__dict__)
+        self.assertNotIn("features", vm.__dict__)
+        # nothing to clear yet
+        vm._clear_helpers_cache()
+        self.assertNotIn("devices", vm.__dict__)
+        self.assertIsInstance(vm.features, qubesadmin.features.Features)
+        self.assertIs(vm.features, vm.features)
+        self.assertIsInstance(vm.tags, qubesadmin.tags.Tags)
+        self.assertIsInstance(vm.devices, qubesadmin.devices.DeviceManager)
+        self.assertIsInstance(vm.firewall, qubesadmin.firewall.Firewall)
+        self.assertEqual(vm.log.name, "test-vm")
+        vm.features._values_cache = {"feature": "value"}
+        vm._clear_helpers_cache()
+        self.assertEqual(vm.features._values_cache, {})
+        self.assertAllCalled()
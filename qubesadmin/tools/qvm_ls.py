@@ -28,11 +28,16 @@ from __future__ import print_function
 
 import argparse
 import collections.abc
+import csv
+import json
+import os
 import sys
 import textwrap
 from collections.abc import Callable
 
 import qubesadmin
+import qubesadmin.config
+import qubesadmin.label
 import qubesadmin.spinner
 import qubesadmin.tools
 import qubesadmin.utils
@@ -46,6 +51,12 @@ class Column:
     :param str head: Column head (usually uppercase).
     :param attr: Attribute path (dotted string) or callable ``(vm) -> value``.
     :param str doc: Description of column (will be visible in --help-columns).
+    :param sources: Data needed to compute the value, retrieved for all the
+        listed qubes at once (see :py:meth:`qubesadmin.app.QubesBase.prefetch`
+        for possible values).
+    :param value_attr: Like *attr*, but for machine-readable output, where
+        values are not formatted for display (sizes are in bytes etc).
+        *attr* is used if not given.
     """
 
     #: collection of all columns
@@ -53,10 +64,14 @@ class Column:
 
     def __init__(self, head: str,
                  attr: str | Callable[[QubesVM], object],
-                 doc: str | None=None):
+                 doc: str | None=None,
+                 sources: collections.abc.Iterable[str]=(),
+                 value_attr: str | Callable[[QubesVM], object] | None=None):
         self.head = head
         self.__doc__ = doc
         self._attr = attr
+        self._value_attr = attr if value_attr is None else value_attr
+        self.sources = frozenset(sources)
         self.__class__.columns[self.head] = self
 
     def cell(self, vm, insertion=0):
@@ -94,6 +109,20 @@ class Column:
 
         return str(ret)
 
+    def value(self, vm: QubesVM) -> object:
+        '''Return the value for *vm* for machine-readable output: a string,
+        number, boolean, list of those, or ``None`` if not applicable.'''
+        try:
+            if isinstance(self._value_attr, str):
+                ret = vm
+                for attrseg in self._value_attr.split('.'):
+                    ret = getattr(ret, attrseg)
+            else:
+                ret = self._value_attr(vm)
+        except (AttributeError, ZeroDivisionError):
+            return None
+        return _plain_value(ret)
+
     def __repr__(self):
         return '{}(head={!r})'.format(self.__class__.__name__, self.head)
 
@@ -115,7 +144,8 @@ class PropertyColumn(Column):
     """
 
     def __init__(self, name):
-        super().__init__(head=name.replace('_', '-').upper(), attr=name)
+        super().__init__(head=name.replace('_', '-').upper(), attr=name,
+            sources=('properties',))
 
     def __repr__(self) -> str:
         return '{}(head={!r}'.format(self.__class__.__name__, self.head)
@@ -170,6 +200,33 @@ def _format_flags(vm: QubesVM) -> str:
     ])
 
 
+def _plain_value(value):
+    '''Convert value to a type that can be serialized as JSON'''
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (QubesVM, qubesadmin.label.Label)):
+        return value.name
+    if hasattr(value, '__iter__'):
+        return [_plain_value(item) for item in value]
+    return str(value)
+
+
+def get_volume_attr(vm, volume_name, attr):
+    ''' Get volume attribute, ``None`` if there is no such volume '''
+    try:
+        return getattr(vm.volumes[volume_name], attr)
+    except KeyError:
+        return None
+
+def calc_used_percent(vm, volume_name):
+    ''' Calculates the volume usage in percent, ``None`` if there is no such
+    volume '''
+    try:
+        volume = vm.volumes[volume_name]
+    except KeyError:
+        return None
+    return volume.usage * 100 // volume.size
+
 def calc_size(vm, volume_name):
     ''' Calculates the volume size in MiB '''
     try:
@@ -197,7 +254,8 @@ def calc_used(vm, volume_name):
 
 Column('STATE',
     attr=(lambda vm: vm.get_power_state()),
-    doc='Current power state.')
+    doc='Current power state.',
+    sources=('power_state',))
 
 Column('CLASS',
     attr=(lambda vm: vm.klass),
@@ -206,56 +264,78 @@ Column('CLASS',
 
 Column('GATEWAY',
     attr='netvm.gateway',
-    doc='Network gateway.')
+    doc='Network gateway.',
+    sources=('properties',))
 
 Column('MEMORY',
     attr=(lambda vm: vm.get_mem() // 1024 if vm.is_running() else None),
-    doc='Memory currently used by VM')
+    doc='Memory currently used by VM',
+    sources=('power_state', 'current_state'),
+    value_attr=(lambda vm: vm.get_mem() * 1024 if vm.is_running() else None))
 
 Column('DISK',
     attr=(lambda vm: vm.get_disk_utilization() // 1024 // 1024),
-    doc='Total disk utilisation.')
+    doc='Total disk utilisation.',
+    sources=('volumes',),
+    value_attr=(lambda vm: vm.get_disk_utilization()))
 
 
 Column('PRIV-CURR',
     attr=(lambda vm: calc_usage(vm, 'private')),
-    doc='Disk utilisation by private image (/home, /usr/local).')
+    doc='Disk utilisation by private image (/home, /usr/local).',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'private', 'usage')))
 
 Column('PRIV-MAX',
     attr=(lambda vm: calc_size(vm, 'private')),
-    doc='Maximum available space for private image.')
+    doc='Maximum available space for private image.',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'private', 'size')))
 
 Column('PRIV-POOL',
     attr=(lambda vm: vm.volumes['private'].pool
           if 'private' in vm.volumes.keys() else '-'),
-    doc='Storage pool of private volume.')
+    doc='Storage pool of private volume.',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'private', 'pool')))
 
 Column('PRIV-USED',
     attr=(lambda vm: calc_used(vm, 'private')),
-    doc='Disk utilisation by private image as a percentage of available space.')
+    doc='Disk utilisation by private image as a percentage of available space.',
+    sources=('volumes',),
+    value_attr=(lambda vm: calc_used_percent(vm, 'private')))
 
 
 Column('ROOT-CURR',
     attr=(lambda vm: calc_usage(vm, 'root')),
-    doc='Disk utilisation by root image (/usr, /lib, /etc, ...).')
+    doc='Disk utilisation by root image (/usr, /lib, /etc, ...).',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'root', 'usage')))
 
 Column('ROOT-MAX',
     attr=(lambda vm: calc_size(vm, 'root')),
-    doc='Maximum available space for root image.')
+    doc='Maximum available space for root image.',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'root', 'size')))
 
 Column('ROOT-POOL',
     attr=(lambda vm: vm.volumes['root'].pool
           if 'root' in vm.volumes.keys() else '-'),
-    doc='Storage pool of root volume.')
+    doc='Storage pool of root volume.',
+    sources=('volumes',),
+    value_attr=(lambda vm: get_volume_attr(vm, 'root', 'pool')))
 
 Column('ROOT-USED',
     attr=(lambda vm: calc_used(vm, 'root')),
-    doc='Disk utilisation by root image as a percentage of available space.')
+    doc='Disk utilisation by root image as a percentage of available space.',
+    sources=('volumes',),
+    value_attr=(lambda vm: calc_used_percent(vm, 'root')))
 
 
 Column('FLAGS', attr=_format_flags,
     doc='Various flags: type, power state, updateable, provides_network, '
-        'installed_by_rpm, internal, debug, autostart.')
+        'installed_by_rpm, internal, debug, autostart.',
+    sources=('properties', 'power_state'))
 
 # Sorting columns based on numeric or string (default) values
 SORT_NUMERIC = ['MEMORY', 'DISK', 'PRIV-CURR', 'PRIV-MAX', 'ROOT-CURR', 'XID',
@@ -281,6 +361,16 @@ class Table:
         self.reverse_sort = reverse_sort
         self.ignore_case = ignore_case
 
+    def get_sources(self):
+        '''Get data needed to display all the columns (see
+        :py:attr:`Column.sources`).'''
+        sources = set()
+        for col in self.columns:
+            sources.update(col.sources)
+        if self.tree_sorted:
+            sources.add('properties')
+        return sources
+
     def get_head(self):
         '''Get table head data (all column heads).'''
         return [col.head for col in self.columns]
@@ -393,6 +483,113 @@ class Table:
                 except qubesadmin.exc.QubesVMNotFoundError:
                     continue
 
+    def get_values(self, vm):
+        '''Get single row data for machine-readable output (all columns
+        for one domain), see :py:meth:`Column.value`.'''
+        ret = [col.value(vm) for col in self.columns]
+        self.spinner.update()
+        return ret
+
+    def _value_sort_key(self, value):
+        '''Sort key for values returned by :py:meth:`get_values`; numbers
+        go before strings, missing values last.'''
+        if value is None:
+            return (2, 0)
+        if isinstance(value, (int, float)):
+            return (0, value)
+        value = str(value)
+        return (1, value.upper() if self.ignore_case else value)
+
+    def _write_values(self, writer, output, row):
+        '''Write single row of values in the selected *output* format'''
+        if output == 'csv':
+            writer.writerow(
+                '' if value is None else
+                ','.join(map(str, value)) if isinstance(value, list) else
+                value
+                for value in row)
+        else:
+            writer.write(json.dumps(dict(zip(self.get_head(), row))) + '\n')
+
+    def write_data(self, stream=sys.stdout, output='json'):
+        '''Sort & write whole table to file-like object, in
+        machine-readable format.
+
+        Values are not formatted for display, see :py:meth:`Column.value`.
+        Missing values are written as `null` (or empty field for `csv`).
+
+        :param file stream: Stream to write the table to.
+        :param str output: Output format: `json` (list of objects), `ndjson`
+            (one object per line) or `csv` (with header).
+        '''
+        heads = self.get_head()
+        rows = []
+        for vm in sorted(self.domains):
+            try:
+                rows.append(self.get_values(vm))
+            except qubesadmin.exc.QubesVMNotFoundError:
+                continue
+        if self.sort_order in heads:
+            col_index = heads.index(self.sort_order)
+            rows.sort(key=lambda row: self._value_sort_key(row[col_index]),
+                      reverse=self.reverse_sort)
+
+        if output == 'json':
+            json.dump([dict(zip(heads, row)) for row in rows], stream,
+                      indent=2)
+            stream.write('\n')
+            return
+        writer = stream
+        if output == 'csv':
+            writer = csv.writer(stream, lineterminator='\n')
+            writer.writerow(heads)
+        for row in rows:
+            self._write_values(writer, output, row)
+
+    def write_stream(self, stream=sys.stdout, chunk_size=None,
+                     output='ndjson'):
+        '''Write table rows as soon as data of each qube is retrieved.
+
+        Qubes are processed in chunks of *chunk_size*: data of all qubes in
+        a chunk is retrieved at once (see :py:meth:`get_sources`), then their
+        rows are written and flushed. Rows are sorted by name only.
+
+        :param file stream: Stream to write the rows to.
+        :param int chunk_size: Number of qubes to retrieve data of at once,
+            :py:data:`qubesadmin.config.QUBESD_CALL_CONCURRENCY` if not given
+        :param str output: Output format: `ndjson`, `csv` (see
+            :py:meth:`write_data`) or `raw` (columns separated by `|`
+            character, like with *raw_data* set, without header).
+        '''
+        if chunk_size is None:
+            chunk_size = qubesadmin.config.QUBESD_CALL_CONCURRENCY
+        sources = self.get_sources()
+        domains = sorted(self.domains,
+            key=(lambda vm: vm.name.upper()) if self.ignore_case else None,
+            reverse=self.reverse_sort)
+        writer = stream
+        if output == 'csv':
+            writer = csv.writer(stream, lineterminator='\n')
+            writer.writerow(self.get_head())
+        if domains and 'power_state' in sources:
+            # this is a single call for all qubes anyway
+            domains[0].app.prefetch(domains=domains, what=['power_state'])
+            sources.discard('power_state')
+        for offset in range(0, len(domains), chunk_size):
+            chunk = domains[offset:offset + chunk_size]
+            if sources:
+                chunk[0].app.prefetch(domains=chunk, what=sources)
+            for vm in chunk:
+                try:
+                    if output == 'raw':
+                        stream.write('|'.join(self.get_row(vm)) + '\n')
+                    else:
+                        self._write_values(writer, output,
+                                           self.get_values(vm))
+                except qubesadmin.exc.QubesVMNotFoundError:
+                    continue
+            stream.flush()
+
 
 #: Available formats. Feel free to plug your own one.
 formats = {
@@ -482,6 +679,68 @@ def matches_power_states(domain, **states):
     return domain.get_power_state().lower() in requested_states
 
 
+def get_sources(args):
+    '''Get data needed to filter qubes, see
+    :py:meth:`qubesadmin.app.QubesBase.prefetch`.
+
+    Features are not included, as filters check just a few of them, which is
+    cheaper than retrieving all of them.
+    '''
+    sources = set()
+    if args.label or args.template_source or args.netvm_is or args.prefs:
+        sources.add('properties')
+    if args.tags or args.exclude_tags:
+        sources.add('tags')
+    if any(getattr(args, state) for state in DOMAIN_POWER_STATES):
+        sources.add('power_state')
+    return sources
+
+
+def check_output_args(parser, args):
+    '''Check if selected output options can be used together'''
+    if args.format_output != 'text' and (args.raw_data or args.tree):
+        parser.error('--raw-data and --tree are supported only with text '
+                     'output')
+    if args.stream and (args.tree or args.sort.upper() != 'NAME'):
+        parser.error('--stream supports sorting by NAME only')
+    if args.stream and args.format_output == 'json':
+        parser.error('--stream does not support json output, use ndjson')
+
+
+def prefetch_data(args, table, domains):
+    '''Retrieve data needed for filtering and displaying the table upfront,
+    with concurrent calls, instead of one call after another for each qube.
+    When streaming, data for display is retrieved in chunks later.'''
+    sources = get_sources(args)
+    if not args.stream:
+        sources.update(table.get_sources())
+    if sources:
+        args.app.prefetch(
+            domains=None if domains is args.app.domains else domains,
+            what=sources)
+
+
+def write_output(args, table):
+    '''Write the table to stdout, in the format selected by *args*'''
+    if not args.stream:
+        if args.format_output == 'text':
+            table.write_table(sys.stdout)
+        else:
+            table.write_data(sys.stdout, args.format_output)
+        return
+    if args.format_output == 'text':
+        output = 'raw' if args.raw_data else 'ndjson'
+    else:
+        output = args.format_output
+    try:
+        table.write_stream(sys.stdout, output=output)
+    except BrokenPipeError:
+        # output closed early (like with `qvm-ls --stream | head`),
+        # avoid another error when flushing stdout on exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+
 def get_parser():
     '''Create :py:class:`argparse.ArgumentParser` suitable for
     :program:`qvm-ls`.
@@ -520,6 +779,18 @@ def get_parser():
         help='Display specify data of specified VMs. Intended for '
              'bash-parsing.')
 
+    parser_format.add_argument('--format-output', metavar='OUTPUT',
+        action='store', choices=['text', 'json', 'ndjson', 'csv'],
+        default='text',
+        help='Output format: text (default), json, ndjson (JSON object per '
+             'line) or csv. Values other than text are not formatted for '
+             'display (sizes are in bytes, missing values are null etc).')
+
+    parser_format.add_argument('--stream', action='store_true',
+        help='Write each row as soon as data of the qube is retrieved. '
+             'Rows are sorted by name only. Output format is ndjson, unless '
+             'csv or --raw-data is selected.')
+
     # shortcuts, compatibility with Qubes 3.2
     parser_format.add_argument('--raw-list', action='store_true',
         help='Same as --raw-data --fields=name')
@@ -650,7 +921,10 @@ def main(args=None, app=None):
         if col.upper() not in Column.columns:
             PropertyColumn(col.lower())
 
-    if args.spinner and not args.raw_data:
+    check_output_args(parser, args)
+
+    if args.spinner and not args.raw_data and not args.stream \
+            and args.format_output == 'text':
         # we need Enterprise Edition™, since it's the only one that detects TTY
         # and uses dots if we are redirected somewhere else
         spinner = qubesadmin.spinner.QubesSpinnerEnterpriseEdition(sys.stderr)
@@ -674,6 +948,13 @@ def main(args=None, app=None):
         # filter only qubes to specific class(es)
         domains = [d for d in domains if d.klass in args.klass]
 
+    table = Table(domains=domains, colnames=columns, spinner=spinner,
+        raw_data=args.raw_data, tree_sorted=args.tree,
+        sort_order=args.sort.upper(), reverse_sort=args.reverse,
+        ignore_case=args.ignore_case)
+
+    prefetch_data(args, table, domains)
+
     if args.label:
         # filter only qubes with specific label(s)
         domains_labeled = []
@@ -770,11 +1051,8 @@ def main(args=None, app=None):
     domains = [d for d in domains
                if matches_power_states(d, **pwrstates)]
 
-    table = Table(domains=domains, colnames=columns, spinner=spinner,
-        raw_data=args.raw_data, tree_sorted=args.tree,
-        sort_order=args.sort.upper(), reverse_sort=args.reverse,
-        ignore_case=args.ignore_case)
-    table.write_table(sys.stdout)
+    table.domains = domains
+    write_output(args, table)
 
     return 0
 
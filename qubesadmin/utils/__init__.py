@@ -335,27 +335,30 @@ async def generic_action(
 ):
     """
     Asynchronously run action on qubes and return ones that failed.
+
+    If the qube provides a coroutine variant of the action (like
+    :py:meth:`qubesadmin.vm.QubesVM.start_async`), it is used directly,
+    otherwise the action is run in a separate thread.
     """
 
     def wrapper(qube, action):
-        func = None
+        method = None
         if isinstance(action, str):
-            func = getattr(qube, action)
+            method = action
         elif callable(action):
             method = action(qube)
-            func = getattr(qube, method)
-        if not func:
+        if not method:
             raise ValueError("Invalid action provided")
-        return func
+        func = getattr(qube, method + "_async", None)
+        if asyncio.iscoroutinefunction(func):
+            return func(*args, **kwargs)
+        return asyncio.to_thread(getattr(qube, method), *args, **kwargs)
 
     ignored_exceptions: tuple = tuple()
     if "ignored_exceptions" in kwargs:
         ignored_exceptions = kwargs.pop("ignored_exceptions")
 
-    tasks = [
-        asyncio.to_thread(wrapper(qube, action), *args, **kwargs)
-        for qube in domains
-    ]
+    tasks = [wrapper(qube, action) for qube in domains]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     failed: dict[qubesadmin.vm.QubesVM, BaseException] = {}
     for qube, res in zip(domains, results):
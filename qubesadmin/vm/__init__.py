@@ -20,6 +20,7 @@
 
 """Qubes VM objects."""
 from __future__ import annotations
+import functools
 import logging
 import shlex
 
@@ -51,24 +52,60 @@ PowerState = Literal["Transient", "Running", "Halted", "Paused",
 class QubesVM(qubesadmin.base.PropertyHolder):
     """Qubes domain."""
 
-    log: Logger
-    tags: qubesadmin.tags.Tags
-    features: qubesadmin.features.Features
-    devices: qubesadmin.devices.DeviceManager
-    firewall: qubesadmin.firewall.Firewall
+    #: generation of the VM name when this object was created, see
+    #: :py:meth:`qubesadmin.app.VMCollection.generation`
+    generation: int
 
-    def __init__(self, app, name, klass=None, power_state=None):
+    def __init__(self, app, name, klass=None, power_state=None, uuid=None):
         super().__init__(app, "admin.vm.property.", name)
         self._volumes = None
         self._klass = klass
+        # UUID as reported by admin.vm.List, used to detect VM re-creation
+        self._uuid = uuid
+        self.generation = 0
         # the cache is maintained by EventsDispatcher(),
         # through helper functions in QubesBase()
         self._power_state_cache = power_state
-        self.log = logging.getLogger(name)
-        self.tags = qubesadmin.tags.Tags(self)
-        self.features = qubesadmin.features.Features(self)
-        self.devices = qubesadmin.devices.DeviceManager(self)
-        self.firewall = qubesadmin.firewall.Firewall(self)
+        # admin.vm.CurrentState retrieved by QubesBase.prefetch(), dropped on
+        # power state change or after the first get_mem() call
+        self._current_state_cache = None
+
+    # helper objects below are created on first use, many tools need just
+    # name, class and power state of each qube
+
+    @functools.cached_property
+    def log(self) -> Logger:
+        """Logger for this qube"""
+        return logging.getLogger(self.name)
+
+    @functools.cached_property
+    def tags(self) -> qubesadmin.tags.Tags:
+        """Tags of this qube"""
+        return qubesadmin.tags.Tags(self)
+
+    @functools.cached_property
+    def features(self) -> qubesadmin.features.Features:
+        """Features of this qube"""
+        return qubesadmin.features.Features(self)
+
+    @functools.cached_property
+    def devices(self) -> qubesadmin.devices.DeviceManager:
+        """Devices of this qube, by device class"""
+        return qubesadmin.devices.DeviceManager(self)
+
+    @functools.cached_property
+    def firewall(self) -> qubesadmin.firewall.Firewall:
+        """Firewall rules of this qube"""
+        return qubesadmin.firewall.Firewall(self)
+
+    def _clear_helpers_cache(self, *names: str) -> None:
+        """Clear cache of helper objects with given names (all of devices,
+        features and tags by default), skipping those not created yet -
+        they have nothing cached."""
+        for name in names or ("devices", "features", "tags"):
+            helper = self.__dict__.get(name)
+            if helper is not None:
+                helper.clear_cache()
 
     @property
     def name(self) -> str:
@@ -113,22 +150,47 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Start")
 
-    def shutdown(self, force=False, wait=False):
+    async def start_async(self):
         """
-        Shutdown domain.
+        Start domain, asynchronously. See :py:meth:`start`.
 
-        :return:
+        This is coroutine.
         """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Start")
+
+    @staticmethod
+    def _shutdown_arg(force, wait):
+        """Argument for admin.vm.Shutdown call"""
         arg_list = []
         if force:
             arg_list.append("force")
         if wait:
             arg_list.append("wait")
-        args = "+".join(arg_list)
-        params = [self._method_dest, "admin.vm.Shutdown"]
-        if args:
-            params.append(args)
-        self.qubesd_call(*params)
+        return "+".join(arg_list) or None
+
+    def shutdown(self, force=False, wait=False):
+        """
+        Shutdown domain.
+
+        :return:
+        """
+        self.qubesd_call(
+            self._method_dest,
+            "admin.vm.Shutdown",
+            self._shutdown_arg(force, wait),
+        )
+
+    async def shutdown_async(self, force=False, wait=False):
+        """
+        Shutdown domain, asynchronously. See :py:meth:`shutdown`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(
+            self._method_dest,
+            "admin.vm.Shutdown",
+            self._shutdown_arg(force, wait),
+        )
 
     def kill(self):
         """
@@ -138,6 +200,14 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Kill")
 
+    async def kill_async(self):
+        """
+        Kill domain, asynchronously. See :py:meth:`kill`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Kill")
+
     def force_shutdown(self):
         """Deprecated alias for :py:meth:`kill`"""
         warnings.warn(
@@ -157,6 +227,14 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Pause")
 
+    async def pause_async(self):
+        """
+        Pause domain, asynchronously. See :py:meth:`pause`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Pause")
+
     def unpause(self):
         """
         Unpause domain.
@@ -167,6 +245,14 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Unpause")
 
+    async def unpause_async(self):
+        """
+        Unpause domain, asynchronously. See :py:meth:`unpause`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Unpause")
+
     def suspend(self):
         """
         Suspend domain.
@@ -177,6 +263,14 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Suspend")
 
+    async def suspend_async(self):
+        """
+        Suspend domain, asynchronously. See :py:meth:`suspend`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Suspend")
+
     def resume(self):
         """
         Resume domain (from S3).
@@ -187,6 +281,14 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         """
         self.qubesd_call(self._method_dest, "admin.vm.Resume")
 
+    async def resume_async(self):
+        """
+        Resume domain, asynchronously. See :py:meth:`resume`.
+
+        This is coroutine.
+        """
+        await self.qubesd_call_async(self._method_dest, "admin.vm.Resume")
+
     def get_power_state(self):
         """Return power state description string.
 
@@ -230,16 +332,49 @@ class QubesVM(qubesadmin.base.PropertyHolder):
         ):
             return "NA"
 
+    async def get_power_state_async(self):
+        """Return power state description string, asynchronously.
+        See :py:meth:`get_power_state`.
+
+        This is coroutine.
+        """
+        if self._power_state_cache is not None:
+            return self._power_state_cache
+        try:
+            response = await self.qubesd_call_async(
+                self._method_dest, "admin.vm.CurrentState"
+            )
+            power_state = self._parse_current_state(response)["power_state"]
+            if self.app.cache_enabled:
+                self._power_state_cache = power_state
+            return power_state
+        except (
+            qubesadmin.exc.QubesDaemonNoResponseError,
+            qubesadmin.exc.QubesVMNotFoundError,
+        ):
+            return "NA"
+
     def get_mem(self):
         """Get current memory usage from VM."""
 
+        state = self._current_state_cache
+        if state is not None:
+            # memory usage changes all the time (ballooning), use the
+            # prefetched value only once
+            self._current_state_cache = None
+            return int(state["mem"])
         return int(self._get_current_state()["mem"])
 
     def _get_current_state(self):
         """Call admin.vm.CurrentState, and return the result as a dict."""
 
-        state = {}
         response = self.qubesd_call(self._method_dest, "admin.vm.CurrentState")
+        return self._parse_current_state(response)
+
+    @staticmethod
+    def _parse_current_state(response):
+        """Parse admin.vm.CurrentState response into a dict."""
+        state = {}
         for part in response.decode("ascii").split():
             name, value = part.split("=", 1)
             state[name] = value
@@ -541,15 +676,37 @@ class DispVMWrapper(QubesVM):
             self.create_disposable()
         super().start()
 
+    async def start_async(self):
+        """Create disposable if absent and start it, asynchronously."""
+        if self._method_dest.startswith("@dispvm"):
+            await self.create_disposable_async()
+        await super().start_async()
+
+    def _create_disposable_dest(self):
+        """Destination of admin.vm.CreateDisposable call for this wrapper."""
+        if self._method_dest.startswith("@dispvm:"):
+            return self._method_dest[len("@dispvm:") :]
+        return "dom0"
+
     def create_disposable(self):
         """Create disposable."""
         if self._method_dest.startswith("@dispvm"):
-            if self._method_dest.startswith("@dispvm:"):
-                method_dest = self._method_dest[len("@dispvm:") :]
-            else:
-                method_dest = "dom0"
             dispvm = self.app.qubesd_call(
-                method_dest, "admin.vm.CreateDisposable"
+                self._create_disposable_dest(), "admin.vm.CreateDisposable"
+            )
+            dispvm = dispvm.decode("ascii")
+            self._method_dest = dispvm
+        return self
+
+    async def create_disposable_async(self):
+        """Create disposable, asynchronously.
+        See :py:meth:`create_disposable`.
+
+        This is coroutine.
+        """
+        if self._method_dest.startswith("@dispvm"):
+            dispvm = await self.app.qubesd_call_async(
+                self._create_disposable_dest(), "admin.vm.CreateDisposable"
             )
             dispvm = dispvm.decode("ascii")
             self._method_dest = dispvm